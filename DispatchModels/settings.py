@@ -147,6 +147,16 @@ STATICFILES_DIRS = [
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Directory below MEDIA_ROOT for time series and results stored as memory-mapped .npy files
+DISPATCH_ARRAY_DIRECTORY = 'arrays'
+
+# Size of the per-process cache of decoded time series in bytes, 0 disables the cache
+DISPATCH_ARRAY_CACHE_BYTES = 256 * 1024 ** 2
+
+# PRAGMAs set on every SQLite connection, merged over dispatch.sqlite.DEFAULT_PRAGMAS (WAL journal, busy timeout,
+# synchronous=NORMAL, cache and mmap size), a value of None keeps the SQLite default
+DISPATCH_SQLITE_PRAGMAS = {}
+
 # Mail Settings
 # Remember to:
 # Go to your Google Account settings, find Security -> Account permissions -> Access for less secure apps, enable this option.
@@ -164,4 +174,9 @@ ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 
 # Crispy Forms
-CRISPY_TEMPLATE_PACK = 'bootstrap4'
\ No newline at end of file
+CRISPY_TEMPLATE_PACK = 'bootstrap4'
+
+# Optimization service
+# Url of the long-running optimization service (python manage.py runoptimizationservice), e.g. 'http://127.0.0.1:8765'.
+# If None, optimization jobs are run inside the web process.
+DISPATCH_SERVICE_URL = None
@@ -17,7 +17,11 @@ class TimeSeriesIndexAdmin(admin.ModelAdmin):
 
 
 class TimeSeriesAdmin(admin.ModelAdmin):
-    pass
+    list_display = ['name', 'unit', 'length', 'user', 'last_altered']
+
+    def get_queryset(self, request):
+        # the changelist does not need the data of the time series
+        return super().get_queryset(request).for_listing()
 
 
 class ThermalPlantDispatchAdmin(admin.ModelAdmin):
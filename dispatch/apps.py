@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class DispatchConfig(AppConfig):
     name = 'dispatch'
+
+    def ready(self):
+        from .sqlite import configure_connection
+
+        connection_created.connect(configure_connection, dispatch_uid='dispatch.sqlite.configure_connection')
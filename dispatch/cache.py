@@ -0,0 +1,129 @@
+"""
+Process-local cache of decoded time series arrays.
+
+Decoding a series (decompressing its blob or chunks) happens again on every read. The cache keeps the decoded arrays
+of the most recently used series up to a total size in bytes (DISPATCH_ARRAY_CACHE_BYTES, 0 disables the cache).
+Entries are keyed on (pk, last_altered, start, end) and the entries of a series are dropped when it is saved or
+deleted. The hit and miss counters of stats() help to size the cache per worker.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+class ArrayCache:
+    """
+    Least recently used cache of numpy arrays, bounded by the sum of their sizes in bytes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        :param key:
+        :return: Cached array or None
+        """
+        with self._lock:
+            array = self._entries.get(key)
+
+            if array is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return array
+
+    def put(self, key, array):
+        """
+        Adds an array, least recently used arrays are evicted to stay below max_bytes. Cached arrays are read-only as
+        they are shared by all readers: a writable array is copied, so that the caller's array stays writable and
+        changing it does not change the cached values.
+        :param key:
+        :param array: Numpy array
+        :return: The read-only array that is cached (the array itself if it is read-only or too large to be cached).
+        """
+        if array.nbytes > self.max_bytes:
+            return array
+
+        if array.flags.writeable:
+            array = array.copy()
+            array.flags.writeable = False
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key).nbytes
+
+            self._entries[key] = array
+            self.size += array.nbytes
+
+            while self.size > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+
+        return array
+
+    def invalidate(self, pk):
+        """
+        Drops all entries of a series.
+        :param pk: Primary key (first element of the keys).
+        :return:
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == pk]:
+                self.size -= self._entries.pop(key).nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        :return: Dictionary with entries, size and max_bytes (bytes), hits, misses and evictions.
+        """
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'size': self.size,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+_array_cache = None
+
+
+def get_array_cache():
+    """
+    Returns the cache of the current process or None if it is disabled.
+    :return:
+    """
+    global _array_cache
+
+    max_bytes = getattr(settings, 'DISPATCH_ARRAY_CACHE_BYTES', DEFAULT_MAX_BYTES)
+
+    if not max_bytes:
+        return None
+
+    if _array_cache is None:
+        _array_cache = ArrayCache(max_bytes)
+
+    _array_cache.max_bytes = max_bytes
+
+    return _array_cache
@@ -0,0 +1,136 @@
+"""
+Presolve of the commitment binaries (ONF, RMP, NRM) of the thermal plant model.
+
+Hours where the spread between power price and fuel costs is extreme enough make the commitment deterministic. The
+binaries of those hours are fixed before the model is built, which shrinks the branch and bound tree. Only fixings that
+hold in every optimal solution are made, so the objective of the presolved model is the same as of the full model:
+
+- forced on: switching the plant on at MIN (RMP = NRM = 0) is always feasible. If the margin of MIN production exceeds
+  the depreciation and the ramping costs of switching on and off, every schedule that is off in this hour can be
+  improved.
+- forced off: inside long runs of hours with a strongly negative margin. Lowering the production to a ramp feasible
+  envelope (RMP and NRM production reach 0 after ramping down from the border of the run) and switching off in the
+  interior of the run improves every schedule that is on there. The threshold covers the ramping costs and the
+  depreciation of the hours that leave NRM while ramping down.
+- ramp reachability: next to a forced off hour the RMP production can not reach SEL - MIN within the ramping rate, so
+  NRM is fixed to 0 there.
+
+The first time step of a window is never fixed as its production is given by the initial or boundary condition.
+"""
+import math
+import numpy as np
+
+COMMITMENT_VARIABLES = ('ONF', 'RMP', 'NRM')
+
+
+def _steps_to_ramp(amount, ramping_rate):
+    """
+    Number of time steps needed to ramp the given amount of production.
+    """
+    if amount <= 0:
+        return 0
+
+    if ramping_rate <= 0:
+        return math.inf
+
+    return math.ceil(amount / ramping_rate)
+
+
+def _distance_to(mask):
+    """
+    Distance (in time steps) of every position to the nearest position where mask is True.
+    :param mask: Boolean array.
+    :return: Float array, inf if mask has no True value.
+    """
+    n = len(mask)
+    positions = np.arange(n)
+
+    previous = np.where(mask, positions, -n - 1)
+    previous = np.maximum.accumulate(previous)
+
+    following = np.where(mask, positions, 2 * n + 1)
+    following = np.minimum.accumulate(following[::-1])[::-1]
+
+    distance = np.minimum(positions - previous, following - positions).astype(float)
+    distance[distance > n] = np.inf
+
+    return distance
+
+
+def presolve_commitment(plant, wholesale_price, clean_fuel_price):
+    """
+    Determines the commitment binaries that are fixed by the prices.
+    :param plant: Dictionary of plant definition
+    :param wholesale_price: Array of power prices [EUR/MWh]
+    :param clean_fuel_price: Array of clean fuel prices [EUR/MWh]
+    :return: Dictionary (ONF, RMP, NRM) of float arrays, NaN where the binary is free, otherwise the fixed value.
+    """
+    wholesale_price = np.asarray(wholesale_price, dtype=float)
+    clean_fuel_price = np.asarray(clean_fuel_price, dtype=float)
+
+    n = len(wholesale_price)
+    fixed = {name: np.full(n, np.nan) for name in COMMITMENT_VARIABLES}
+
+    if n < 2:
+        return fixed
+
+    MIN = plant['MIN']
+    RMP_range = plant['SEL'] - plant['MIN']
+    NRM_range = plant['MEL'] - plant['SEL']
+    costs_BSE = plant['ramping_costs_BSE']
+    costs_RMP = plant['ramping_costs_RMP']
+    costs_NRM = plant['ramping_costs_NRM']
+    depreciation = plant['depreciation']
+
+    # margin of one MWh of production
+    margin = wholesale_price - clean_fuel_price / plant['efficiency']
+
+    # the first time step is given by the initial or boundary condition
+    free = np.ones(n, dtype=bool)
+    free[0] = False
+
+    # forced on
+    forced_on = free & (MIN * margin - depreciation - 2 * MIN * costs_BSE > 0)
+
+    # forced off
+    forced_off = np.zeros(n, dtype=bool)
+
+    steps_NRM = _steps_to_ramp(NRM_range, plant['ramping_rate_NRM_MW'])
+    steps_RMP = _steps_to_ramp(RMP_range, plant['ramping_rate_RMP_MW'])
+
+    if MIN > 0 and not math.isinf(steps_NRM + steps_RMP):
+        threshold = max(2 * costs_RMP, 2 * costs_NRM, 2 * costs_BSE + 2 * steps_RMP * depreciation / MIN)
+
+        negative = free & (-margin > threshold)
+
+        # distance to the nearest hour outside of the run of negative hours
+        forced_off = negative & (_distance_to(~negative) >= steps_NRM + steps_RMP)
+
+    fixed['ONF'][forced_on] = 1
+
+    for name in COMMITMENT_VARIABLES:
+        fixed[name][forced_off] = 0
+
+    # ramp reachability: the RMP production next to forced off hours is limited by the ramping rate
+    if forced_off.any() and RMP_range > 0:
+        reachable = _distance_to(forced_off) * plant['ramping_rate_RMP_MW']
+        fixed['NRM'][free & (reachable < RMP_range)] = 0
+
+    return fixed
+
+
+def to_fixed_values(fixed, time_series_index):
+    """
+    Converts the fixed arrays to dictionaries of time step -> value as used to fix the pyomo variables.
+    :param fixed: Result of presolve_commitment
+    :param time_series_index: List of index values (same length as the arrays)
+    :return:
+    """
+    index = np.asarray(time_series_index, dtype=object)
+
+    result = {}
+    for name, values in fixed.items():
+        mask = ~np.isnan(values)
+        result[name] = dict(zip(index[mask].tolist(), values[mask].tolist()))
+
+    return result
@@ -0,0 +1,52 @@
+"""
+Parsing of cbc solver logs into structured statistics.
+"""
+import re
+
+_PRESOLVE = re.compile(r'^Presolve (\d+) \(-?\d+\) rows, (\d+) \(-?\d+\) columns and (\d+) \(-?\d+\) elements', re.M)
+_PROCESSED_MODEL = re.compile(r'processed model has (\d+) rows, (\d+) columns .*? and (\d+) elements', re.M)
+_NODES = re.compile(r'^Enumerated nodes:\s+(\d+)', re.M)
+_ITERATIONS = re.compile(r'^Total iterations:\s+(\d+)', re.M)
+_OBJECTIVE = re.compile(r'^Objective value:\s+(\S+)', re.M)
+_GAP = re.compile(r'^Gap:\s+(\S+)', re.M)
+_WALLCLOCK = re.compile(r'^Time \(Wallclock seconds\):\s+(\S+)', re.M)
+_RESULT = re.compile(r'^Result - (.+)$', re.M)
+
+
+def _last_match(pattern, log, cast=float):
+    matches = pattern.findall(log)
+
+    if not matches:
+        return None
+
+    try:
+        return cast(matches[-1])
+    except ValueError:
+        return None
+
+
+def parse_cbc_log(log):
+    """
+    Parses the log of a cbc run.
+    :param log: Log as string
+    :return: Dictionary with presolve_rows, presolve_columns, presolve_elements, nodes, iterations, objective, gap,
+    solve_seconds and result (status line of cbc). Values that are not found in the log are None.
+    """
+    result = {
+        'presolve_rows': None,
+        'presolve_columns': None,
+        'presolve_elements': None,
+    }
+
+    presolve = _PRESOLVE.search(log) or _PROCESSED_MODEL.search(log)
+    if presolve:
+        result['presolve_rows'], result['presolve_columns'], result['presolve_elements'] = map(int, presolve.groups())
+
+    result['nodes'] = _last_match(_NODES, log, int)
+    result['iterations'] = _last_match(_ITERATIONS, log, int)
+    result['objective'] = _last_match(_OBJECTIVE, log)
+    result['gap'] = _last_match(_GAP, log)
+    result['solve_seconds'] = _last_match(_WALLCLOCK, log)
+    result['result'] = _last_match(_RESULT, log, str.strip)
+
+    return result
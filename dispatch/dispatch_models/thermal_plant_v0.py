@@ -1,7 +1,39 @@
 from pyomo.environ import *
-from pyomo.opt import SolverFactory 
+from pyomo.opt import TerminationCondition
 import pandas as pd
-from dispatch.dispatch_models.utils import register_cbc_executable, append_result_to_df, convert_model_result_to_dataframe
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dispatch.dispatch_models.utils import get_solver, append_result_to_df, convert_model_result_to_dataframe
+from dispatch.dispatch_models.presolve import presolve_commitment, to_fixed_values
+from dispatch.dispatch_models.tuning import AUTO, tune_window_length
+from dispatch.dispatch_models.solver_log import parse_cbc_log
+from dispatch.dispatch_models.windows import create_windows
+
+INTEGRALITY_TOLERANCE = 1e-6
+
+# state of the last time step of a window that is carried into the next window as its boundary condition
+BOUNDARY_VARIABLES = ('production', 'powerProdBSE', 'powerProdRMP', 'powerProdNRM', 'ONF', 'RMP', 'NRM')
+
+
+class OptimizationError(Exception):
+    """
+    Raised if the model of a window has no optimal solution (e.g. infeasible).
+    """
+    pass
+
+
+def _solve_window_relaxation(optimization_model, slice_begin, slice_end, presolve=False):
+    """
+    Solves the LP relaxation of a single window (module level to be usable with a process pool).
+    :return: Tuple of the bound and whether the relaxation is integral.
+    """
+    optimization_model._setup_window(slice_begin, slice_end, presolve=presolve)
+    relaxed_model, lp_bound, integral = optimization_model._solve_relaxation()
+
+    return lp_bound, integral
 
 
 class ThermalPlantDispatchOptimizationModel(object):
@@ -17,99 +49,296 @@ class ThermalPlantDispatchOptimizationModel(object):
         self._model = None
         self._optimization = None
         self._result = None
+        self._windows = []
+        self._window = (None, None)
+        self._tuning = None
+        self._solver_statistics = None
 
     def to_dataframe(self):
         return convert_model_result_to_dataframe(self._model)
 
-    def optimize(self, start=None, end=None, number_of_batches=None, overlap=0.25):
+    def optimize(self, start=None, end=None, number_of_batches=None, overlap=0.25, relaxation=False, presolve=False,
+                 window_length=None, target_gap=0.01):
         """
         Only allows for integer ranges (at the moment).
-        :param overlap: (NOT IMPLEMENTED) If interval is optimized in batches, the overlap parameter defines how much
-        overlap between batches is simulated to ease the boundary conditions for each batch.
-        :param number_of_batches: The number of batches the given interal is split into.
+        :param overlap: If interval is optimized in batches, the overlap parameter defines how much overlap (fraction
+        of a batch) between batches is simulated to ease the boundary conditions for each batch.
+        :param number_of_batches: The number of batches the given interal is split into. If 'auto', the window length
+        and overlap are chosen by timing the first windows (see tuning.py).
+        :param window_length: Number of data points per window, alternative to number_of_batches.
+        :param target_gap: Accepted relative loss of profit of the automatically chosen window length.
         :param start: Offset for the given interval.
         :param end: End of the given interval
+        :param relaxation: Solve the LP relaxation of each window first. Its objective is an upper bound of the profit
+        of the window and the MILP is skipped if the relaxation is already integral.
+        :param presolve: Fix the commitment binaries that are determined by the prices before solving (see presolve.py).
         :return:
         """
-        # todo: increment must be changed to "number_of_batches" and then the setup of boundary condition must be met
+        if number_of_batches == AUTO:
+            self._tuning = tune_window_length(self, start=start, end=end, target_gap=target_gap,
+                                              relaxation=relaxation, presolve=presolve)
+            number_of_batches = None
+            window_length = self._tuning['window_length']
+            overlap = self._tuning['overlap']
 
-        if start:
-            assert start > 0, 'Start must be > 0.'
-        else:
-            start = 0
+        # todo: setup model and solve
+        self._result = pd.DataFrame()
+        self._windows = []
+        for number, (slice_begin, slice_end, keep) in enumerate(self._create_windows(start, end, number_of_batches,
+                                                                                     overlap, window_length)):
+            window_started = time.perf_counter()
+
+            # setup the optimization and optimize, every window starts from the last kept state of the previous one
+            fixed_binaries = self._setup_window(slice_begin, slice_end, presolve=presolve,
+                                                boundary_condition=self._boundary_condition())
+
+            window = {'number': number, 'start': slice_begin, 'end': slice_begin + keep, 'length': slice_end - slice_begin,
+                      'lp_bound': None, 'relaxation_integral': None, 'milp_skipped': False,
+                      'fixed_binaries': fixed_binaries}
+
+            if relaxation:
+                relaxed_model, window['lp_bound'], window['relaxation_integral'] = self._solve_relaxation()
+
+                if window['relaxation_integral']:
+                    # the solution of the relaxation is feasible for the MILP and therefore optimal
+                    self._model = relaxed_model
+                    window['milp_skipped'] = True
+
+            if not window['milp_skipped']:
+                self._optimize()
+                window.update(self._solver_statistics)
+
+            window['objective'] = value(self._model.profit)
+            window['wall_time'] = time.perf_counter() - window_started
+            self._windows.append(window)
+
+            # only keep the results outside of the overlap, the overlap is optimized again by the next window
+            iteration_result = self.to_dataframe().iloc[:keep]
 
-        if end:
-            assert end < len(self._input_data), 'End must be smaller than length of data provided.'
+            # add result to dataframe
+            self._result = append_result_to_df(self._result, iteration_result)
+
+        return self._result
+
+    def screen(self, start=None, end=None, number_of_batches=None, overlap=0.25, max_workers=None, presolve=False,
+               window_length=None):
+        """
+        Solves only the LP relaxation of every window. The sum of the bounds is an optimistic estimate of the profit.
+        :param max_workers: If > 1 the windows are solved in parallel processes.
+        :return: List of window dictionaries with the bounds ('lp_bound') of the windows.
+        """
+        windows = self._create_windows(start, end, number_of_batches, overlap, window_length)
+
+        if max_workers and max_workers > 1:
+            # only send the input data to the worker processes
+            optimization_model = ThermalPlantDispatchOptimizationModel(self._plant_definition, self._input_data)
+
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                relaxations = list(executor.map(_solve_window_relaxation,
+                                                [optimization_model] * len(windows),
+                                                [window[0] for window in windows],
+                                                [window[1] for window in windows],
+                                                [presolve] * len(windows)))
         else:
-            end = len(self._input_data)
+            relaxations = [_solve_window_relaxation(self, window[0], window[1], presolve) for window in windows]
 
-        # setup variables for iteration
-        increment = end-start
+        self._windows = []
+        for number, ((slice_begin, slice_end, keep), (lp_bound, integral)) in enumerate(zip(windows, relaxations)):
+            self._windows.append({'number': number, 'start': slice_begin, 'end': slice_begin + keep,
+                                  'length': slice_end - slice_begin, 'lp_bound': lp_bound,
+                                  'relaxation_integral': integral, 'milp_skipped': True, 'objective': None,
+                                  'fixed_binaries': None, 'wall_time': None})
 
-        if number_of_batches:
-            increment = int(increment / number_of_batches)
+        return self._windows
 
-        assert increment > 12, 'Each batch needs to be at least 12 data points.'
+    def _boundary_condition(self):
+        """
+        State of the last time step of the result so far (BOUNDARY_VARIABLES).
+        :return: Dictionary or None before the first window.
+        """
+        if self._result is None or self._result.empty:
+            return None
 
-        # set overlap to nearest smaller integer
-        overlap = int(overlap * increment)
+        last = self._result.iloc[-1]
 
-        # todo: setup model and solve
-        self._result = pd.DataFrame()
-        for i in range(start, end, increment):
-            slice_begin = i*start
-            slice_end = (i+1)*end
+        return {name: float(last[name]) for name in BOUNDARY_VARIABLES}
 
-            if slice_end > end:
-                slice_end = end
+    def windows(self):
+        """
+        Statistics of the windows of the last optimization or screening.
+        :return: List of dictionaries (number, start, end, length, objective, lp_bound, relaxation_integral,
+        milp_skipped, fixed_binaries, wall_time and the solver statistics of solver_statistics)
+        """
+        return self._windows
 
-            data_slice = self._input_data.iloc[slice_begin:slice_end]
+    def tuning(self):
+        """
+        Result of the automatic choice of the window length (number_of_batches='auto'), see tune_window_length.
+        :return:
+        """
+        return self._tuning
 
-            # create input data series for the optimization function
-            # optimization functions needs a list of time indices
-            # and dictionaries for the time series where the keys are the time indices and value the price values
-            index = data_slice.index.tolist()
-            wholesale_price = data_slice['wholesale_price'].to_dict()
-            clean_fuel_price = data_slice['clean_fuel_price'].to_dict()
+    def _create_windows(self, start=None, end=None, number_of_batches=None, overlap=0.25, window_length=None):
+        """
+        Splits the interval into windows, see windows.create_windows.
+        :return: List of (slice_begin, slice_end, keep) tuples.
+        """
+        return create_windows(len(self._input_data), start, end, number_of_batches, overlap, window_length)
 
-            # setup the optimization and optimize
-            self._setup_optimization(self._plant_definition, index, wholesale_price, clean_fuel_price)
-            self._optimize()
-            iteration_result = self.to_dataframe()
+    def _setup_window(self, slice_begin, slice_end, presolve=False, boundary_condition=None):
+        """
+        Sets up the model of a window.
+        :param boundary_condition: State of the time step before the window, see _boundary_condition.
+        :return: Number of commitment binaries fixed by the presolve.
+        """
+        self._window = (slice_begin, slice_end)
 
-            # add result to dataframe
-            self._result = append_result_to_df(self._result, iteration_result)
+        data_slice = self._input_data.iloc[slice_begin:slice_end]
 
-        return self._result
+        # create input data series for the optimization function
+        # optimization functions needs a list of time indices
+        # and dictionaries for the time series where the keys are the time indices and value the price values
+        index = data_slice.index.tolist()
+        wholesale_price = data_slice['wholesale_price'].to_dict()
+        clean_fuel_price = data_slice['clean_fuel_price'].to_dict()
 
-    def _optimize(self):
+        fixed = None
+        if presolve:
+            fixed = to_fixed_values(presolve_commitment(self._plant_definition,
+                                                        data_slice['wholesale_price'].values,
+                                                        data_slice['clean_fuel_price'].values), index)
+
+        self._setup_optimization(self._plant_definition, index, wholesale_price, clean_fuel_price,
+                                 boundary_condition=boundary_condition, fixed=fixed)
+
+        return sum(len(values) for values in fixed.values()) if fixed else 0
+
+    def _solve_relaxation(self):
+        """
+        Solves the LP relaxation of the current model.
+        :return: Tuple of the relaxed model, its objective (upper bound of the profit) and whether the binaries of
+        the solution are integral.
         """
+        relaxed_model = TransformationFactory('core.relax_integer_vars').create_using(self._model)
+
+        results = get_solver('cbc').solve(relaxed_model)
+        self._check_termination(results, 'LP relaxation')
+
+        integral = all(abs(variable.value - round(variable.value)) < INTEGRALITY_TOLERANCE
+                       for component in (relaxed_model.ONF, relaxed_model.RMP, relaxed_model.NRM)
+                       for variable in component.values())
 
+        return relaxed_model, value(relaxed_model.profit), integral
+
+    def solver_statistics(self):
+        """
+        Statistics of the last solve: presolve_rows, presolve_columns, presolve_elements, nodes, iterations,
+        best_bound, gap, solve_seconds, termination_condition and the solver_log.
         :return:
         """
+        return self._solver_statistics
 
-        register_cbc_executable()
-        opt = SolverFactory('cbc')  # options: 'couenne' for MINLP, 'glpk' or 'cbc' for MILP
-        self._optimization = opt.solve(self._model, tee=True)
+    def _optimize(self):
+        """
+        Solves the model. The solver log is captured instead of printed and parsed into the solver statistics.
+        :return:
+        """
+
+        opt = get_solver('cbc')  # options: 'couenne' for MINLP, 'glpk' or 'cbc' for MILP
+
+        log_handle, log_path = tempfile.mkstemp(suffix='.log')
+        os.close(log_handle)
+        try:
+            self._optimization = opt.solve(self._model, logfile=log_path)
+
+            with open(log_path) as log_file:
+                log = log_file.read()
+        finally:
+            os.remove(log_path)
+
+        self._check_termination(self._optimization, 'MILP')
+        self._solver_statistics = self._create_solver_statistics(log)
 
         return {"model": self._model, "result": self._optimization}
 
-    def _setup_optimization(self, plant, time_series_index, wholesale_price, clean_fuel_price, boundary_condition=None):
+    def _check_termination(self, results, problem):
+        """
+        Raises OptimizationError if the solver did not find an optimal solution of the current window.
+        :param results: Results returned by the solver.
+        :param problem: Name of the solved problem for the message.
+        :return:
+        """
+        termination_condition = results.solver.termination_condition
+
+        if termination_condition != TerminationCondition.optimal:
+            slice_begin, slice_end = self._window
+
+            raise OptimizationError('The {problem} of the window {slice_begin}:{slice_end} has no optimal solution '
+                                    '({termination_condition})'.format(problem=problem, slice_begin=slice_begin,
+                                                                      slice_end=slice_end,
+                                                                      termination_condition=termination_condition))
+
+    def _create_solver_statistics(self, log):
+        statistics = parse_cbc_log(log)
+
+        # the profit is maximized, so the upper bound is the best bound
+        try:
+            best_bound = float(self._optimization.problem.upper_bound)
+        except (TypeError, ValueError):
+            best_bound = None
+
+        if best_bound is not None and not math.isfinite(best_bound):
+            best_bound = None
+
+        objective = value(self._model.profit)
+
+        gap = statistics['gap']
+        if gap is None and best_bound is not None:
+            gap = (best_bound - objective) / max(abs(objective), 1e-10)
+
+        return {
+            'presolve_rows': statistics['presolve_rows'],
+            'presolve_columns': statistics['presolve_columns'],
+            'presolve_elements': statistics['presolve_elements'],
+            'nodes': statistics['nodes'],
+            'iterations': statistics['iterations'],
+            'best_bound': best_bound,
+            'gap': gap,
+            'solve_seconds': statistics['solve_seconds'],
+            'termination_condition': str(self._optimization.solver.termination_condition),
+            'solver_log': log,
+        }
+
+    def _setup_optimization(self, plant, time_series_index, wholesale_price, clean_fuel_price, boundary_condition=None,
+                            fixed=None):
         """
 
         :param plant: Dictionary of plant definition
         :param time_series_index: List of index values (integer or time stamps)
         :param wholesale_price: dictionary key=time_series_index, value=price value in [EUR/MWh]
         :param clean_fuel_price: dictionary key=time_series_index, value=price value in [EUR/MWh]
+        :param boundary_condition: dictionary key=variable name (BOUNDARY_VARIABLES), value=value in the time step before
+        the first one. Without a boundary condition the first time step is not linked to a predecessor.
+        :param fixed: dictionary key=variable name (ONF, RMP, NRM), value=dictionary of time step -> fixed value
         :return:
         """
-
-        # todo: how to implement boundary condition
-
         self._model = ConcreteModel()
 
         self._model.T = Set(initialize=time_series_index)
 
+        # the first time step is linked to the boundary condition (if any), all other time steps to the previous one
+        first = time_series_index[0]
+        previous = dict(zip(time_series_index[1:], time_series_index[:-1]))
+
+        def previous_value(model, name, t):
+            if t == first:
+                return boundary_condition[name]
+
+            return getattr(model, name)[previous[t]]
+
+        def unlinked(t):
+            return t == first and boundary_condition is None
+
         self._model.power_price = Param(self._model.T, initialize=wholesale_price)
         self._model.fuel_price = Param(self._model.T, initialize=clean_fuel_price)
 
@@ -117,8 +346,9 @@ class ThermalPlantDispatchOptimizationModel(object):
 
         # todo: find out how to set single constraint instead of Constraint(iterable, rule=func)
         # todo: write method to handle the creation of initial condition
+        # placeholder initial production at the global start (index 0), later windows start from their boundary
         def initial_condition(model, t):
-            if t == 0:
+            if t == 0 and boundary_condition is None:
                 return model.production[t] == 42.0
             else:
                 return Constraint.Skip
@@ -136,6 +366,12 @@ class ThermalPlantDispatchOptimizationModel(object):
         self._model.RMP = Var(self._model.T, within=Binary)
         self._model.NRM = Var(self._model.T, within=Binary)
 
+        if fixed:
+            for name, values in fixed.items():
+                variable = getattr(self._model, name)
+                for t, fixed_value in values.items():
+                    variable[t].fix(fixed_value)
+
         self._model.status_def0 = ConstraintList(rule=(self._model.ONF[t]
                                                        >=
                                                        self._model.RMP[t]
@@ -172,40 +408,40 @@ class ThermalPlantDispatchOptimizationModel(object):
                                                              for t in self._model.T))
 
         def RMP_constraint_up(model, t):
-            if t == 0:
+            if unlinked(t):
                 return Constraint.Skip
             else:
-                return (model.powerProdRMP[t] - model.powerProdRMP[t - 1]
+                return (model.powerProdRMP[t] - previous_value(model, 'powerProdRMP', t)
                         <=
                         + plant['ramping_rate_RMP_MW'])
 
         self._model.RMP_UP = Constraint(self._model.T, rule=RMP_constraint_up)
 
         def RMP_constraint_down(model, t):
-            if t == 0:
+            if unlinked(t):
                 return Constraint.Skip
             else:
-                return (model.powerProdRMP[t] - model.powerProdRMP[t - 1]
+                return (model.powerProdRMP[t] - previous_value(model, 'powerProdRMP', t)
                         >=
                         - plant['ramping_rate_RMP_MW'])
 
         self._model.RMP_DW = Constraint(self._model.T, rule=RMP_constraint_down)
 
         def NRM_constraint_up(model, t):
-            if t == 0:
+            if unlinked(t):
                 return Constraint.Skip
             else:
-                return (model.powerProdNRM[t] - model.powerProdNRM[t - 1]
+                return (model.powerProdNRM[t] - previous_value(model, 'powerProdNRM', t)
                         <=
                         + plant['ramping_rate_NRM_MW'])
 
         self._model.NRM_UP = Constraint(self._model.T, rule=NRM_constraint_up)
 
         def NRM_constraint_down(model, t):
-            if t == 0:
+            if unlinked(t):
                 return Constraint.Skip
             else:
-                return (model.powerProdNRM[t] - model.powerProdNRM[t - 1]
+                return (model.powerProdNRM[t] - previous_value(model, 'powerProdNRM', t)
                         >=
                         - plant['ramping_rate_NRM_MW'])
 
@@ -221,29 +457,29 @@ class ThermalPlantDispatchOptimizationModel(object):
         def ramping(model):
 
             def powerProdBSE_UPDW_contraint(model, i):
-                if i == 0:
+                if unlinked(i):
                     return model.powerProdBSE_UP[i] + model.powerProdBSE_DW[i] == 0
                 else:
                     return model.powerProdBSE_UP[i] - model.powerProdBSE_DW[i] == model.powerProdBSE[i] - \
-                           model.powerProdBSE[i - 1]
+                           previous_value(model, 'powerProdBSE', i)
 
             model.BSE_UPDW = Constraint(self._model.T, rule=powerProdBSE_UPDW_contraint)
 
             def powerProdRMP_UPDW_contraint(model, i):
-                if i == 0:
+                if unlinked(i):
                     return model.powerProdRMP_UP[i] + model.powerProdRMP_DW[i] == 0
                 else:
                     return model.powerProdRMP_UP[i] - model.powerProdRMP_DW[i] == model.powerProdRMP[i] - \
-                           model.powerProdRMP[i - 1]
+                           previous_value(model, 'powerProdRMP', i)
 
             model.RMP_UPDW = Constraint(self._model.T, rule=powerProdRMP_UPDW_contraint)
 
             def powerProdNRM_UPDW_contraint(model, i):
-                if i == 0:
+                if unlinked(i):
                     return model.powerProdNRM_UP[i] + model.powerProdNRM_DW[i] == 0
                 else:
                     return model.powerProdNRM_UP[i] - model.powerProdNRM_DW[i] == model.powerProdNRM[i] - \
-                           model.powerProdNRM[i - 1]
+                           previous_value(model, 'powerProdNRM', i)
 
             model.NRM_UPDW = Constraint(self._model.T, rule=powerProdNRM_UPDW_contraint)
 
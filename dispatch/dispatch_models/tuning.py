@@ -0,0 +1,111 @@
+"""
+Automatic choice of the window length of batch optimizations.
+
+The first windows of the interval are optimized with every candidate window length and overlap. The measured wall
+times of the windows are used to fit a model of the solve time versus window length (t = a * length ** b), which
+estimates the total time of the whole interval for every candidate. Out of the candidates whose profit on the sampled
+span is within the target gap of the best candidate, the one with the lowest estimated total time is chosen.
+"""
+import math
+import numpy as np
+
+AUTO = 'auto'
+
+WINDOW_LENGTHS = (24, 48, 96, 168)
+OVERLAPS = (0, 0.25)
+
+
+def fit_solve_time(lengths, times):
+    """
+    Fits t = a * length ** b (least squares in log space).
+    :param lengths: Optimized data points of the measured windows.
+    :param times: Wall times of the measured windows [s].
+    :return: Tuple (a, b)
+    """
+    lengths = np.log(np.asarray(lengths, dtype=float))
+    times = np.log(np.maximum(np.asarray(times, dtype=float), 1e-6))
+
+    if len(np.unique(lengths)) < 2:
+        # assume linear scaling if only one length was measured
+        return float(np.exp(np.mean(times - lengths))), 1.0
+
+    b, log_a = np.polyfit(lengths, times, 1)
+
+    return float(np.exp(log_a)), float(b)
+
+
+def estimate_total_time(a, b, horizon, window_length, overlap):
+    """
+    Estimated wall time to optimize the horizon with the given window length and overlap.
+    """
+    number_of_windows = math.ceil(horizon / window_length)
+    optimized_length = min(window_length + int(overlap * window_length), horizon)
+
+    return number_of_windows * a * optimized_length ** b
+
+
+def tune_window_length(optimization_model, start=None, end=None, window_lengths=WINDOW_LENGTHS, overlaps=OVERLAPS,
+                       sample_windows=2, target_gap=0.01, **optimize_kwargs):
+    """
+    Chooses the window length and overlap that minimize the total wall time within the target gap.
+    :param optimization_model: ThermalPlantDispatchOptimizationModel instance
+    :param start: Offset for the given interval.
+    :param end: End of the given interval.
+    :param window_lengths: Candidate window lengths (data points).
+    :param overlaps: Candidate overlaps (fraction of a window).
+    :param sample_windows: Number of windows of the longest candidate that are sampled.
+    :param target_gap: Accepted relative loss of profit on the sampled span compared to the best candidate.
+    :param optimize_kwargs: Passed to optimize (relaxation, presolve).
+    :return: Dictionary with the chosen window_length and overlap, the estimated_time, the gap, the fitted time model
+    (a, b) and the measured candidates.
+    """
+    data_length = len(optimization_model._input_data)
+    start = start or 0
+    end = end or data_length
+    horizon = end - start
+
+    candidate_lengths = [length for length in window_lengths if 12 < length <= horizon] or [horizon]
+    span = min(horizon, sample_windows * max(candidate_lengths))
+    sample_end = start + span
+
+    candidates = []
+    lengths = []
+    times = []
+    for window_length in candidate_lengths:
+        for overlap in overlaps:
+            sample_model = type(optimization_model)(optimization_model._plant_definition,
+                                                    optimization_model._input_data)
+
+            result = sample_model.optimize(start=start or None,
+                                           end=sample_end if sample_end < data_length else None,
+                                           window_length=window_length,
+                                           overlap=overlap,
+                                           **optimize_kwargs)
+
+            windows = sample_model.windows()
+            lengths.extend(window['length'] for window in windows)
+            times.extend(window['wall_time'] for window in windows)
+
+            candidates.append({'window_length': window_length,
+                               'overlap': overlap,
+                               'profit': float((result['Revenues'] - result['Costs']).sum()),
+                               'sample_time': sum(window['wall_time'] for window in windows)})
+
+    a, b = fit_solve_time(lengths, times)
+
+    best_profit = max(candidate['profit'] for candidate in candidates)
+    for candidate in candidates:
+        candidate['gap'] = (best_profit - candidate['profit']) / max(abs(best_profit), 1e-10)
+        candidate['estimated_time'] = estimate_total_time(a, b, horizon, candidate['window_length'],
+                                                          candidate['overlap'])
+
+    chosen = min((candidate for candidate in candidates if candidate['gap'] <= target_gap),
+                 key=lambda candidate: candidate['estimated_time'])
+
+    return {'window_length': chosen['window_length'],
+            'overlap': chosen['overlap'],
+            'estimated_time': chosen['estimated_time'],
+            'gap': chosen['gap'],
+            'a': a,
+            'b': b,
+            'candidates': candidates}
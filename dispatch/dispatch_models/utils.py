@@ -1,23 +1,47 @@
 from pyomo.environ import Var, Param
+from pyomo.opt import SolverFactory
 import pandas as pd
 
 import os
 from pyutilib.services import register_executable
 
 
+_registered_executables = set()
+_solvers = {}
+
+
 def register_cbc_executable(path=r'C:\Users\Benjamin\PycharmProjects\DispatchModels\dispatch\solver'):
     """
-
+    Registers the cbc executable. Only the first call per process changes PATH, later calls are no-ops.
     :param path:
     :return:
     """
     # todo: add cbc executable path to Django settings
+    if path in _registered_executables:
+        return None
+
     path_cbc = path
     os.environ['PATH'] += os.pathsep + path_cbc
     register_executable(name='cbc')
+    _registered_executables.add(path)
     return None
 
 
+def get_solver(name='cbc'):
+    """
+    Returns a solver handle that is created once per process and reused for every solve.
+    :param name: Solver name as understood by SolverFactory.
+    :return:
+    """
+    if name not in _solvers:
+        if name == 'cbc':
+            register_cbc_executable()
+
+        _solvers[name] = SolverFactory(name)
+
+    return _solvers[name]
+
+
 def convert_model_result_to_dataframe(model):
     result = []
 
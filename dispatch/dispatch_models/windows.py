@@ -0,0 +1,64 @@
+"""
+Splitting of the optimized interval into windows (batches). Kept free of pyomo so that the options of a run can be
+checked before the optimization model is imported or set up.
+"""
+import math
+import numbers
+
+# shortest window (without overlap) that is optimized
+MIN_WINDOW_LENGTH = 13
+
+
+def create_windows(length, start=None, end=None, number_of_batches=None, overlap=0.25, window_length=None):
+    """
+    Splits an interval of the data into windows.
+    :param length: Number of data points.
+    :param start: Position of the first optimized data point (0 <= start < end).
+    :param end: Position after the last optimized data point (end <= length), default length.
+    :param number_of_batches: Number of windows the interval is split into.
+    :param overlap: Fraction of a window (0 <= overlap < 1) that is optimized again by the next window.
+    :param window_length: Number of data points per window, alternative to number_of_batches.
+    :return: List of (slice_begin, slice_end, keep) tuples. Only the first keep rows of a window are part of the
+    result, the rest is the overlap with the next window.
+    :raises ValueError: If the options do not describe a valid split (the message names the option).
+    """
+    start = 0 if start is None else start
+    end = length if end is None else end
+
+    if not 0 <= start < end <= length:
+        raise ValueError('The range {start}:{end} is not within the {length} data points (0 <= start < end <= '
+                         'length).'.format(start=start, end=end, length=length))
+
+    if not (isinstance(overlap, numbers.Real) and math.isfinite(overlap) and 0 <= overlap < 1):
+        raise ValueError('The overlap must be a fraction of a window (0 <= overlap < 1), got {overlap}.'.format(
+            overlap=overlap))
+
+    if number_of_batches is not None and number_of_batches < 1:
+        raise ValueError('The number of batches must be at least 1, got {number}.'.format(number=number_of_batches))
+
+    if window_length is not None and window_length < 1:
+        raise ValueError('The window length must be at least 1, got {length}.'.format(length=window_length))
+
+    # setup variables for iteration
+    increment = end - start
+
+    if window_length:
+        increment = min(window_length, increment)
+
+    elif number_of_batches:
+        increment = int(increment / number_of_batches)
+
+    if increment < MIN_WINDOW_LENGTH:
+        raise ValueError('Each batch needs to be at least {minimum} data points, got {increment}.'.format(
+            minimum=MIN_WINDOW_LENGTH, increment=increment))
+
+    # set overlap to nearest smaller integer
+    overlap = int(overlap * increment)
+
+    windows = []
+    for slice_begin in range(start, end, increment):
+        slice_end = min(slice_begin + increment + overlap, end)
+        keep = min(increment, end - slice_begin)
+        windows.append((slice_begin, slice_end, keep))
+
+    return windows
@@ -1,6 +1,21 @@
 from django.db import models
 import json
 import gzip
+import struct
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 def compress_serialize(value, compresslevel=9):
@@ -11,7 +26,6 @@ def compress_serialize(value, compresslevel=9):
     :param value:
     :return:
     """
-    print(value, type(value), type(value[0]))
     value = json.dumps(value)
     value = value.encode(encoding='UTF-8', errors='strict')
     value = gzip.compress(value, compresslevel=compresslevel)
@@ -75,3 +89,515 @@ class CompressedJSONField(models.BinaryField):
         value = getattr(model_instance, self.attname)
 
         return compress_serialize(value)
+
+
+# binary array format: header followed by the compressed little-endian values
+# header: magic, format version, dtype code, codec code, decimals (scaled int32), filter flags, number of values
+ARRAY_MAGIC = b'DMA'
+ARRAY_VERSION = 1
+ARRAY_HEADER = struct.Struct('<3sBBBbBQ')
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# storage dtypes: floats, integers scaled by 10 ** decimals (value = integer / 10 ** decimals) and bit-packed 0/1 values
+ARRAY_DTYPES = {
+    1: np.dtype('<f8'),
+    2: np.dtype('<f4'),
+    3: np.dtype('<i4'),
+    4: np.dtype('u1'),
+}
+ARRAY_DTYPE_NAMES = {1: 'float64', 2: 'float32', 3: 'int32', 4: 'bool'}
+ARRAY_DTYPE_CODES = {name: code for code, name in ARRAY_DTYPE_NAMES.items()}
+
+# scaled int32 value of NaN
+INT32_NAN = np.iinfo(np.int32).min
+
+ARRAY_CODECS = {
+    0: 'none',
+    1: 'zlib',
+    2: 'lz4',
+    3: 'zstd',
+}
+ARRAY_CODEC_CODES = {name: code for code, name in ARRAY_CODECS.items()}
+
+# filters applied before compression (flags, in this order):
+# delta: differences of consecutive values (XOR of consecutive bit patterns for floats, lossless), smooth and constant
+# stretches become small numbers and zeros
+# rle: run-length encoding, constant stretches are stored as one value and the length of the run
+ARRAY_FILTERS = OrderedDict([('delta', 1), ('rle', 2)])
+
+# combinations tried by filters='auto'
+ARRAY_FILTER_CANDIDATES = ((), ('delta',), ('rle',), ('delta', 'rle'))
+
+# filters='auto' compares the candidates on a sample of this many values: windows of consecutive values (the filters
+# depend on neighbours) spread over the array, longer arrays are compressed only once with the chosen filters
+ARRAY_FILTER_SAMPLE = 4096
+ARRAY_FILTER_SAMPLE_WINDOWS = 8
+
+
+def is_binary(values, tolerance=1e-6):
+    """
+    :param values: Array of numbers
+    :param tolerance: Allowed deviation from 0 and 1 (e.g. of binaries returned by a solver)
+    :return: True if all values are (close to) 0 or 1.
+    """
+    values = np.asarray(values, dtype=float)
+
+    return bool(((np.abs(values) <= tolerance) | (np.abs(values - 1) <= tolerance)).all())
+
+
+def _to_storage(values, dtype, decimals):
+    """
+    Converts values to the storage dtype.
+    :return: Contiguous array of the storage dtype
+    """
+    if dtype in ('float64', 'float32'):
+        return np.ascontiguousarray(values, dtype=ARRAY_DTYPES[ARRAY_DTYPE_CODES[dtype]])
+
+    values = np.asarray(values, dtype=float)
+
+    if dtype == 'int32':
+        scaled = np.round(values * 10.0 ** decimals)
+        nan = np.isnan(scaled)
+
+        if (np.abs(scaled[~nan]) >= -INT32_NAN).any():
+            raise ValueError('Values do not fit into int32 with {decimals} decimals'.format(decimals=decimals))
+
+        return np.where(nan, INT32_NAN, scaled).astype(ARRAY_DTYPES[3])
+
+    if dtype == 'bool':
+        if not is_binary(values):
+            raise ValueError('Only 0 and 1 can be stored as bool')
+
+        return np.packbits(values > 0.5)
+
+    raise ValueError('Unknown dtype {dtype}'.format(dtype=dtype))
+
+
+def _from_storage(payload, dtype, decimals, length, filters=0):
+    """
+    Converts stored values back, inverse of _to_storage.
+    :return: numpy array (float64 for int32, bool for bool)
+    """
+    if dtype == 'bool':
+        packed = np.frombuffer(payload, dtype=ARRAY_DTYPES[4])
+
+        if len(packed) != (length + 7) // 8:
+            raise ValueError('Corrupt array data: expected {expected} bytes, got {found}'.format(
+                expected=(length + 7) // 8, found=len(packed)))
+
+        array = np.unpackbits(packed, count=length).astype(bool)
+
+    else:
+        array = _remove_filters(payload, ARRAY_DTYPES[ARRAY_DTYPE_CODES[dtype]], filters, length)
+
+        if len(array) != length:
+            raise ValueError('Corrupt array data: expected {expected} values, got {found}'.format(
+                expected=length, found=len(array)))
+
+        if dtype == 'int32':
+            nan = array == INT32_NAN
+            array = array / 10.0 ** decimals
+            array[nan] = np.nan
+
+    array.flags.writeable = False
+
+    return array
+
+
+def _unsigned(array):
+    """
+    :return: View of the bit patterns of the values as unsigned integers of the same size.
+    """
+    return array.view('<u{size}'.format(size=array.dtype.itemsize))
+
+
+def _apply_filters(array, flags):
+    """
+    :param array: Storage array (not bit-packed)
+    :param flags: Sum of ARRAY_FILTERS flags
+    :return: bytes
+    """
+    if flags & ARRAY_FILTERS['delta'] and len(array):
+        if array.dtype.kind == 'f':
+            bits = _unsigned(array)
+            array = np.concatenate([bits[:1], bits[1:] ^ bits[:-1]])
+        else:
+            array = np.concatenate([array[:1], np.diff(array)])  # wraps around on overflow
+
+    if flags & ARRAY_FILTERS['rle'] and len(array):
+        bits = _unsigned(array)
+        starts = np.concatenate([[0], np.flatnonzero(bits[1:] != bits[:-1]) + 1])
+        lengths = np.diff(np.concatenate([starts, [len(bits)]])).astype('<u4')
+
+        return bits[starts].tobytes() + lengths.tobytes()
+
+    return array.tobytes()
+
+
+def _remove_filters(payload, dtype, flags, length):
+    """
+    Inverse of _apply_filters.
+    :param payload: Decompressed bytes
+    :param dtype: numpy dtype of the storage array
+    :param flags: Sum of ARRAY_FILTERS flags
+    :param length: Number of values
+    :return: Storage array
+    """
+    if flags & ARRAY_FILTERS['rle'] and length:
+        runs = len(payload) // (dtype.itemsize + 4)
+        values = np.frombuffer(payload, dtype='<u{size}'.format(size=dtype.itemsize), count=runs)
+        lengths = np.frombuffer(payload, dtype='<u4', offset=runs * dtype.itemsize)
+
+        if lengths.sum() != length:
+            raise ValueError('Corrupt array data: expected {expected} values, got {found}'.format(
+                expected=length, found=int(lengths.sum())))
+
+        array = np.repeat(values, lengths).view(dtype)
+
+    else:
+        array = np.frombuffer(payload, dtype=dtype)
+
+    if flags & ARRAY_FILTERS['delta'] and len(array):
+        if dtype.kind == 'f':
+            array = np.bitwise_xor.accumulate(_unsigned(array)).view(dtype)
+        else:
+            array = np.cumsum(array, dtype=dtype)
+
+    return array
+
+
+def _compress(payload, codec, level):
+    if codec == 'none':
+        return payload
+
+    if codec == 'zlib':
+        return zlib.compress(payload, level)
+
+    if codec == 'lz4':
+        if lz4_frame is None:
+            raise ValueError('Codec lz4 requires the lz4 package')
+        return lz4_frame.compress(payload, compression_level=level)
+
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError('Codec zstd requires the zstandard package')
+        return zstandard.ZstdCompressor(level=level).compress(payload)
+
+    raise ValueError('Unknown codec {codec}'.format(codec=codec))
+
+
+def _decompress(payload, codec):
+    if codec == 'none':
+        return payload
+
+    if codec == 'zlib':
+        return zlib.decompress(payload)
+
+    if codec == 'lz4':
+        if lz4_frame is None:
+            raise ValueError('Codec lz4 requires the lz4 package')
+        return lz4_frame.decompress(payload)
+
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError('Codec zstd requires the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(payload)
+
+    raise ValueError('Unknown codec {codec}'.format(codec=codec))
+
+
+def _filter_sample(array):
+    """
+    :param array: Storage array (not bit-packed)
+    :return: The array itself if it is short, else ARRAY_FILTER_SAMPLE_WINDOWS evenly spaced windows of consecutive
+    values (ARRAY_FILTER_SAMPLE values in total).
+    """
+    if len(array) <= ARRAY_FILTER_SAMPLE:
+        return array
+
+    window = ARRAY_FILTER_SAMPLE // ARRAY_FILTER_SAMPLE_WINDOWS
+    starts = np.linspace(0, len(array) - window, ARRAY_FILTER_SAMPLE_WINDOWS).astype(int)
+
+    return np.concatenate([array[start:start + window] for start in starts])
+
+
+def _flags(filters):
+    return sum(ARRAY_FILTERS[name] for name in set(filters))
+
+
+def select_filters(array, codec='zlib', level=1):
+    """
+    Chooses the filters of filters='auto': the candidate of ARRAY_FILTER_CANDIDATES with the smallest compressed
+    sample (see _filter_sample), e.g. delta for smooth int32 columns and no filter for noisy float64 prices.
+    :param array: Storage array (not bit-packed)
+    :param codec: Codec the array is compressed with.
+    :param level: Compression level of the codec
+    :return: Tuple of filter names
+    """
+    sample = _filter_sample(array)
+
+    def size(candidate):
+        return len(_compress(_apply_filters(sample, _flags(candidate)), codec, level))
+
+    return min(ARRAY_FILTER_CANDIDATES, key=size)
+
+
+def encode_array(values, dtype='float64', codec='zlib', level=1, decimals=0, filters=()):
+    """
+    Encodes a sequence of numbers as header + compressed little-endian binary values.
+    :param values: List or array of numbers
+    :param dtype: Storage dtype:
+    'float64', 'float32' (relative error below 6e-8),
+    'int32' (values scaled by 10 ** decimals and rounded, absolute error at most 0.5 * 10 ** -decimals, NaN is kept)
+    or 'bool' (0/1 values packed into bits, e.g. commitment binaries).
+    :param codec: 'zlib', 'lz4', 'zstd' or 'none'
+    :param level: Compression level of the codec (zlib: 1-3 are fast and compress floats nearly as well as 9)
+    :param decimals: Decimals kept by 'int32'.
+    :param filters: Names of ARRAY_FILTERS ('delta', 'rle') applied before compression, ignored for 'bool'. With
+    'auto' the filters are chosen by select_filters, which compares the candidates on a sample of the values (all
+    values of arrays up to ARRAY_FILTER_SAMPLE values).
+    :return: bytes
+    """
+    if np.ndim(values) != 1:
+        raise ValueError('Only one dimensional arrays can be encoded')
+
+    array = _to_storage(values, dtype, decimals)
+
+    if dtype == 'bool':
+        filters = ()
+    elif filters == 'auto':
+        filters = select_filters(array, codec, level)
+
+    flags = _flags(filters)
+
+    header = ARRAY_HEADER.pack(ARRAY_MAGIC, ARRAY_VERSION, ARRAY_DTYPE_CODES[dtype], ARRAY_CODEC_CODES[codec],
+                               decimals if dtype == 'int32' else 0, flags, len(values))
+
+    return header + _compress(_apply_filters(array, flags), codec, level)
+
+
+def read_array_header(data):
+    """
+    Reads the header of an encoded array without decompressing the values.
+    :param data: bytes
+    :return: Dictionary with dtype, decimals, codec, filters (names) and length or None if data is not in the binary
+    array format.
+    """
+    data = bytes(data[:ARRAY_HEADER.size])
+
+    if len(data) < ARRAY_HEADER.size or not data.startswith(ARRAY_MAGIC):
+        return None
+
+    magic, version, dtype, codec, decimals, flags, length = ARRAY_HEADER.unpack(data)
+
+    if version != ARRAY_VERSION:
+        raise ValueError('Unsupported array format version {version}'.format(version=version))
+
+    return {'dtype': ARRAY_DTYPE_NAMES[dtype], 'decimals': decimals, 'codec': ARRAY_CODECS[codec],
+            'filters': [name for name, flag in ARRAY_FILTERS.items() if flags & flag], 'length': length}
+
+
+def decode_array(data):
+    """
+    Decodes bytes created by encode_array. Values stored by CompressedJSONField (gzip compressed JSON) are read as
+    well, empty bytes are an empty array.
+    :param data: bytes or memoryview (not copied)
+    :return: Read-only numpy array: float64, float32 or bool as stored ('int32' is returned as float64).
+    """
+    if not len(data):
+        return np.zeros(0, dtype=ARRAY_DTYPES[1])
+
+    header = read_array_header(data)
+
+    if header is None:
+        if bytes(data[:len(GZIP_MAGIC)]) == GZIP_MAGIC:
+            return np.asarray(decompress_deserialize(bytes(data)), dtype=ARRAY_DTYPES[1])
+
+        raise ValueError('Unknown array format')
+
+    payload = _decompress(memoryview(data)[ARRAY_HEADER.size:], header['codec'])
+
+    flags = _flags(header['filters'])
+
+    return _from_storage(payload, header['dtype'], header['decimals'], header['length'], flags)
+
+
+def round_trip(values, dtype='float64', decimals=0):
+    """
+    Values as they are returned after encoding them with a storage dtype.
+    :param values: List or array of numbers
+    :param dtype: Storage dtype (see encode_array)
+    :param decimals: Decimals kept by 'int32'
+    :return: numpy array
+    """
+    if dtype == 'float64':
+        return np.asarray(values, dtype=float)
+
+    return decode_array(encode_array(values, dtype=dtype, codec='none', decimals=decimals))
+
+
+class LazyArray:
+    """
+    Keeps the encoded bytes of an array and only decodes them on first access to the values.
+    Behaves like the decoded (read-only) numpy array: attributes are forwarded and np.asarray returns the array.
+    """
+    __slots__ = ('_raw', '_array')
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._array = None
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def decoded(self):
+        return self._array is not None
+
+    @property
+    def array(self):
+        if self._array is None:
+            self._array = decode_array(self._raw)
+
+        return self._array
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.array
+
+        return self.array.astype(dtype)
+
+    def __len__(self):
+        if self._array is None:
+            header = read_array_header(self._raw) if self._raw else {'length': 0}
+            if header is not None:
+                return header['length']
+
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __getitem__(self, item):
+        return self.array[item]
+
+    def __getattr__(self, name):
+        # private and special attributes are not forwarded (copy and pickle look them up)
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return getattr(self.array, name)
+
+    def __repr__(self):
+        if self._array is None:
+            return '<LazyArray: {length} values, not decoded>'.format(length=len(self))
+
+        return '<LazyArray: {array!r}>'.format(array=self._array)
+
+
+class CompressedArrayField(models.BinaryField):
+    """
+    Stores a one dimensional array of numbers as compressed binary (see encode_array).
+    Values are returned as LazyArray, which decodes to a read-only numpy array on first access. Values stored by
+    CompressedJSONField are read as well.
+    """
+
+    def __init__(self, *args, dtype='float64', codec='zlib', level=1, filters=(), **kwargs):
+        self.dtype = dtype
+        self.codec = codec
+        self.level = level
+        self.filters = filters
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+
+        if self.dtype != 'float64':
+            kwargs['dtype'] = self.dtype
+        if self.codec != 'zlib':
+            kwargs['codec'] = self.codec
+        if self.level != 1:
+            kwargs['level'] = self.level
+        if self.filters:
+            kwargs['filters'] = self.filters
+
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+
+        return LazyArray(value)
+
+    def to_python(self, value):
+        if not isinstance(value, (bytes, memoryview)):
+            return value
+
+        return decode_array(value)
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+
+        if value is None:
+            return value
+
+        if isinstance(value, LazyArray):
+            # the values of a LazyArray can not be changed, so the loaded bytes are still valid
+            value = value.raw
+
+        if isinstance(value, (bytes, memoryview)):
+            # bytes in the binary format are stored as they are, legacy values are converted
+            if read_array_header(value) is not None:
+                return bytes(value)
+            value = decode_array(value)
+
+        return encode_array(value, dtype=self.dtype, codec=self.codec, level=self.level, filters=self.filters)
+
+
+def encode_columns(columns, dtype='float64', codec='zlib', level=1, decimals=0, filters=(), encodings=None):
+    """
+    Encodes several equally long columns into one payload.
+    :param columns: Dictionary name -> array (e.g. the columns of a DataFrame).
+    :param encodings: Dictionary name -> keyword arguments of encode_array (dtype, decimals, filters) of single
+    columns, the other columns are stored with dtype, decimals and filters.
+    :return: Tuple (manifest, payload). The manifest lists name, offset and size (bytes) of every column in the payload.
+    """
+    encodings = encodings or {}
+
+    manifest = []
+    parts = []
+    offset = 0
+
+    for name, values in columns.items():
+        encoding = dict({'dtype': dtype, 'decimals': decimals, 'filters': filters}, **encodings.get(name, {}))
+        encoded = encode_array(values, codec=codec, level=level, **encoding)
+
+        manifest.append({'name': name, 'offset': offset, 'size': len(encoded)})
+        parts.append(encoded)
+        offset += len(encoded)
+
+    return manifest, b''.join(parts)
+
+
+def decode_columns(manifest, payload, columns=None):
+    """
+    Decodes columns of a payload created by encode_columns. Only the requested columns are decompressed.
+    :param manifest: Manifest returned by encode_columns.
+    :param payload: bytes
+    :param columns: Names of the columns to decode, default all.
+    :return: Dictionary name -> read-only array
+    """
+    payload = memoryview(payload)
+    entries = {entry['name']: entry for entry in manifest}
+
+    if columns is None:
+        columns = [entry['name'] for entry in manifest]
+
+    result = {}
+    for name in columns:
+        entry = entries[name]
+        result[name] = decode_array(payload[entry['offset']:entry['offset'] + entry['size']])
+
+    return result
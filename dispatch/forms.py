@@ -14,4 +14,4 @@ class ThermalPlantForm(forms.ModelForm):
         fields = ['name', 'capacity', 'efficiency', 'MIN_prod_fraction', 'SEL_prod_fraction', 'MEL_prod_fraction',
                   'ramping_rate_BSE', 'ramping_rate_RMP', 'ramping_rate_NRM', 'ramping_costs_BSE', 'ramping_costs_RMP',
                   'ramping_costs_NRM', 'depreciation', 'shutdown_costs', 'hot_start_costs', 'warm_start_costs',
-                  'cold_start_costs', 'hot_start_within_timedelta', 'warm_start_within_timedelta']
+                  'cold_start_costs', 'hot_start_within_timedelta', 'warm_start_within_timedelta', 'shared']
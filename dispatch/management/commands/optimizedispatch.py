@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from dispatch.service import submit_dispatch_job
+
+
+class Command(BaseCommand):
+    help = 'Optimizes a thermal plant dispatch setup. The job is forwarded to the optimization service if configured.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dispatch_model', type=int, help='Primary key of the ThermalPlantDispatch setup.')
+        parser.add_argument('--start', type=int, default=None)
+        parser.add_argument('--end', type=int, default=None)
+        parser.add_argument('--number-of-batches', default=None, help="Number of batches or 'auto'.")
+        parser.add_argument('--window-length', type=int, default=None)
+        parser.add_argument('--overlap', type=float, default=None)
+        parser.add_argument('--url', default=None, help='Service url, defaults to DISPATCH_SERVICE_URL.')
+
+    def handle(self, *args, **options):
+        job_options = {key: options[key] for key in ('start', 'end', 'number_of_batches', 'window_length', 'overlap')
+                       if options[key] is not None}
+
+        if job_options.get('number_of_batches', 'auto') != 'auto':
+            job_options['number_of_batches'] = int(job_options['number_of_batches'])
+
+        response = submit_dispatch_job(options['dispatch_model'], url=options['url'], **job_options)
+
+        self.stdout.write(json.dumps(response))
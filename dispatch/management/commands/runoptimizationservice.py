@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from dispatch.service import make_server
+
+
+class Command(BaseCommand):
+    help = 'Starts the long-running optimization service that keeps pyomo and the solver warm between jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1).')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765).')
+
+    def handle(self, *args, **options):
+        server = make_server(options['host'], options['port'])
+
+        self.stdout.write('Optimization service listening on http://{host}:{port}/'.format(
+            host=server.server_address[0], port=server.server_address[1]))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,95 @@
+import multiprocessing
+import time
+
+import django
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from dispatch.models import ThermalPlantDispatch, ThermalPlantOptimizationRun
+from dispatch.sqlite import BatchedWriter, get_pragmas, is_locked_error
+
+RESULT_COLUMNS = ('production', 'ONF', 'RMP', 'NRM', 'SU', 'SD', 'wholesale_price', 'clean_fuel_price', 'profit')
+
+
+def write_runs(options):
+    """
+    Worker process: stores the random results of several runs of a dispatch setup.
+    :param options: Dictionary with dispatch_model, runs, length, chunk_length and batch_size.
+    :return: Dictionary with the pks of the runs, written chunks, batches, lock_retries and lock_errors.
+    """
+    # processes started with spawn import the settings again, forked ones must not share the connection
+    django.setup()
+    connections.close_all()
+
+    dispatch_model = ThermalPlantDispatch.objects.get(pk=options['dispatch_model'])
+    random = np.random.RandomState()
+    writer = BatchedWriter(batch_size=options['batch_size'])
+
+    statistics = {'runs': [], 'lock_errors': 0}
+
+    for _ in range(options['runs']):
+        result = pd.DataFrame({name: random.rand(options['length']) for name in RESULT_COLUMNS})
+
+        try:
+            run = ThermalPlantOptimizationRun.objects.create(user=dispatch_model.user, dispatch_model=dispatch_model)
+            statistics['runs'].append(run.pk)
+
+            run.store_result(result, chunk_length=options['chunk_length'], writer=writer)
+            writer.flush()
+
+        except OperationalError as e:
+            if not is_locked_error(e):
+                raise
+            statistics['lock_errors'] += 1
+
+    statistics.update(written=writer.written, batches=writer.batches, lock_retries=writer.lock_retries)
+
+    connections.close_all()
+
+    return statistics
+
+
+class Command(BaseCommand):
+    help = 'Writes optimization results from several processes at the same time to test the SQLite settings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dispatch_model', type=int, help='Primary key of the ThermalPlantDispatch setup.')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--runs', type=int, default=10, help='Runs written by every process.')
+        parser.add_argument('--length', type=int, default=8760, help='Time steps of every run.')
+        parser.add_argument('--chunk-length', type=int, default=168)
+        parser.add_argument('--batch-size', type=int, default=20, help='Chunks per transaction.')
+        parser.add_argument('--keep', action='store_true', help='Keep the runs instead of deleting them.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('PRAGMAs: {pragmas}'.format(pragmas=dict(get_pragmas())))
+
+        worker_options = {key: options[key] for key in ('dispatch_model', 'runs', 'length', 'chunk_length',
+                                                        'batch_size')}
+
+        # the workers open their own connections
+        connections.close_all()
+
+        begin = time.perf_counter()
+        with multiprocessing.Pool(options['processes']) as pool:
+            statistics = pool.map(write_runs, [worker_options] * options['processes'])
+        seconds = time.perf_counter() - begin
+
+        written = sum(entry['written'] for entry in statistics)
+        lock_errors = sum(entry['lock_errors'] for entry in statistics)
+
+        self.stdout.write('{processes} processes wrote {runs} runs ({written} chunks in {batches} transactions) in '
+                          '{seconds:.1f} s: {rate:.0f} chunks/s, {retries} retries, {errors} lock errors'.format(
+                              processes=options['processes'], runs=sum(len(entry['runs']) for entry in statistics),
+                              written=written, batches=sum(entry['batches'] for entry in statistics),
+                              seconds=seconds, rate=written / seconds,
+                              retries=sum(entry['lock_retries'] for entry in statistics), errors=lock_errors))
+
+        if not options['keep']:
+            ThermalPlantOptimizationRun.objects.filter(
+                pk__in=[pk for entry in statistics for pk in entry['runs']]).delete()
+
+        if lock_errors:
+            raise CommandError('{errors} writes failed because the database was locked'.format(errors=lock_errors))
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0013_auto_20190926_1259'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='lp_bound',
+            field=models.FloatField(null=True, verbose_name='Upper bound of the profit summed over all windows [EUR]'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='objective',
+            field=models.FloatField(null=True, verbose_name='Profit summed over all windows [EUR]'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='screening',
+            field=models.BooleanField(default=False, verbose_name='Only the LP relaxation was solved.'),
+        ),
+        migrations.CreateModel(
+            name='ThermalPlantOptimizationWindow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField(verbose_name='Number of the window')),
+                ('start', models.IntegerField(verbose_name='Offset of the window.')),
+                ('end', models.IntegerField(verbose_name='End of the window (without overlap).')),
+                ('length', models.IntegerField(verbose_name='Optimized data points (including overlap).')),
+                ('objective', models.FloatField(null=True, verbose_name='Profit of the window (MILP) [EUR]')),
+                ('lp_bound', models.FloatField(null=True, verbose_name='Upper bound of the profit (LP relaxation) [EUR]')),
+                ('relaxation_integral', models.NullBooleanField(verbose_name='LP relaxation is integral.')),
+                ('milp_skipped', models.BooleanField(default=False, verbose_name='MILP was not solved.')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='windows', to='dispatch.ThermalPlantOptimizationRun')),
+            ],
+            options={
+                'ordering': ['run', 'number'],
+            },
+        ),
+    ]
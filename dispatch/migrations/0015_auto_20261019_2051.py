@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0014_auto_20261019_2049'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='presolve',
+            field=models.BooleanField(default=False, verbose_name='Commitment binaries fixed by presolve.'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='fixed_binaries',
+            field=models.IntegerField(null=True, verbose_name='Commitment binaries fixed by presolve.'),
+        ),
+    ]
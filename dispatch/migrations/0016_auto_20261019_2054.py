@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0015_auto_20261019_2051'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='tuned',
+            field=models.BooleanField(default=False, verbose_name='Window length was chosen automatically.'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='window_length',
+            field=models.IntegerField(null=True, verbose_name='Data points per window.'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='wall_time',
+            field=models.FloatField(null=True, verbose_name='Wall time of the window [s]'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0016_auto_20261019_2054'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='best_bound',
+            field=models.FloatField(null=True, verbose_name='Best bound of the profit [EUR]'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='gap',
+            field=models.FloatField(null=True, verbose_name='Relative gap between best bound and profit'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='iterations',
+            field=models.IntegerField(null=True, verbose_name='Total iterations'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='nodes',
+            field=models.IntegerField(null=True, verbose_name='Enumerated nodes'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='presolve_columns',
+            field=models.IntegerField(null=True, verbose_name='Columns after presolve'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='presolve_elements',
+            field=models.IntegerField(null=True, verbose_name='Elements after presolve'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='presolve_rows',
+            field=models.IntegerField(null=True, verbose_name='Rows after presolve'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='solve_seconds',
+            field=models.FloatField(null=True, verbose_name='Solver wall time [s]'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='solver_log',
+            field=models.TextField(default='', verbose_name='Solver log'),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationwindow',
+            name='termination_condition',
+            field=models.CharField(default='', max_length=64, verbose_name='Termination condition'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-19 18:58
+
+import dispatch.fields
+from django.db import migrations
+
+
+def encode_time_series(apps, schema_editor):
+    """
+    Re-encodes the gzip compressed JSON of existing time series in the binary array format.
+    """
+    TimeSeries = apps.get_model('dispatch', 'TimeSeries')
+
+    for pk, data in TimeSeries.objects.values_list('pk', 'data').iterator():
+        raw = bytes(data.raw)
+
+        if dispatch.fields.read_array_header(raw) is None:
+            TimeSeries.objects.filter(pk=pk).update(
+                data=dispatch.fields.encode_array(dispatch.fields.decode_array(raw)))
+
+
+def decode_time_series(apps, schema_editor):
+    """
+    Stores the time series as gzip compressed JSON again.
+    """
+    TimeSeries = apps.get_model('dispatch', 'TimeSeries')
+
+    for time_series in TimeSeries.objects.only('pk', 'data').iterator():
+        TimeSeries.objects.filter(pk=time_series.pk).update(
+            data=dispatch.fields.compress_serialize(time_series.data.tolist()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0017_auto_20261019_2055'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timeseries',
+            name='data',
+            field=dispatch.fields.CompressedArrayField(default=b''),
+        ),
+        migrations.RunPython(encode_time_series, decode_time_series),
+    ]
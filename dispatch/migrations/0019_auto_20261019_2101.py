@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:01
+
+import dispatch.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0018_auto_20261019_2058'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='chunk_length',
+            field=models.IntegerField(default=4096),
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='storage',
+            field=models.CharField(choices=[('inline', 'inline'), ('chunked', 'chunked')], default='inline', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='TimeSeriesChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_no', models.IntegerField()),
+                ('data', dispatch.fields.CompressedArrayField(default=b'')),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='dispatch.TimeSeries')),
+            ],
+            options={
+                'ordering': ['series', 'chunk_no'],
+                'unique_together': {('series', 'chunk_no')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0019_auto_20261019_2101'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArrayFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('dtype', models.CharField(max_length=16)),
+                ('shape', models.CharField(max_length=64)),
+                ('checksum', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='result_columns',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='timeseries',
+            name='storage',
+            field=models.CharField(choices=[('inline', 'inline'), ('chunked', 'chunked'), ('file', 'file')], default='inline', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='thermalplantoptimizationrun',
+            name='result_file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='dispatch.ArrayFile'),
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='array_file',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='dispatch.ArrayFile'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:04
+
+import dispatch.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0020_auto_20261019_2102'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSeriesBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('length', models.IntegerField(default=0)),
+                ('data', dispatch.fields.CompressedArrayField(default=b'')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='timeseries',
+            name='storage',
+            field=models.CharField(choices=[('inline', 'inline'), ('chunked', 'chunked'), ('file', 'file'), ('shared', 'shared')], default='inline', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='time_series', to='dispatch.TimeSeriesBlob'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:06
+
+import pandas as pd
+from django.db import migrations, models
+
+
+def create_keys(apps, schema_editor):
+    """
+    Fills the key of existing indices (same as TimeSeriesIndex.create_key). Of duplicated indices only the first one
+    gets the key, the others are not found by lookups anymore.
+    """
+    TimeSeriesIndex = apps.get_model('dispatch', 'TimeSeriesIndex')
+
+    used_keys = set()
+    for time_series_index in TimeSeriesIndex.objects.order_by('pk').iterator():
+        if time_series_index.index_type == 1:
+            key = 'integer:{offset}'.format(offset=int(time_series_index.integer_offset or 0))
+
+        else:
+            start = pd.Timestamp(time_series_index.datetime_start)
+            start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+            interval = pd.Timedelta(time_series_index.datetime_interval)
+            key = 'datetime:{start}:{interval}'.format(start=start.isoformat(),
+                                                       interval=interval // pd.Timedelta(microseconds=1))
+
+        if key in used_keys:
+            continue
+
+        used_keys.add(key)
+        TimeSeriesIndex.objects.filter(pk=time_series_index.pk).update(key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0021_auto_20261019_2104'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseriesindex',
+            name='key',
+            field=models.CharField(blank=True, max_length=128, null=True, unique=True),
+        ),
+        migrations.RunPython(create_keys, migrations.RunPython.noop),
+    ]
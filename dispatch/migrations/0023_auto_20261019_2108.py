@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:08
+
+import dispatch.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0022_timeseriesindex_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseriesindex',
+            name='segments',
+            field=dispatch.fields.CompressedJSONField(default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='timeseriesindex',
+            name='index_type',
+            field=models.IntegerField(choices=[(1, 'integer'), (2, 'datetime'), (3, 'irregular datetime')], default=1),
+        ),
+    ]
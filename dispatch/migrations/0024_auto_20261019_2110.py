@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:10
+
+import dispatch.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0023_auto_20261019_2108'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='pyramid',
+            field=dispatch.fields.CompressedArrayField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='summary',
+            field=dispatch.fields.CompressedJSONField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:12
+
+import dispatch.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0024_auto_20261019_2110'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThermalPlantOptimizationResultChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_no', models.IntegerField()),
+                ('start', models.IntegerField()),
+                ('end', models.IntegerField()),
+                ('manifest', dispatch.fields.CompressedJSONField(default=list)),
+                ('payload', models.BinaryField(default=b'')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_chunks', to='dispatch.ThermalPlantOptimizationRun')),
+            ],
+            options={
+                'ordering': ['run', 'chunk_no'],
+                'unique_together': {('run', 'chunk_no')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+from dispatch.utils import fingerprint
+
+# ThermalPlant.INPUT_PARAMETERS at the time of this migration
+INPUT_PARAMETERS = ('capacity', 'efficiency', 'MIN_prod_fraction', 'SEL_prod_fraction', 'MEL_prod_fraction',
+                    'ramping_rate_BSE', 'ramping_rate_RMP', 'ramping_rate_NRM', 'ramping_costs_BSE', 'ramping_costs_RMP',
+                    'ramping_costs_NRM', 'depreciation', 'shutdown_costs', 'hot_start_costs', 'warm_start_costs',
+                    'cold_start_costs', 'hot_start_within_timedelta', 'warm_start_within_timedelta')
+
+
+def create_fingerprints(apps, schema_editor):
+    """
+    Fills the fingerprint of existing plants (same as ThermalPlant.create_fingerprint).
+    """
+    ThermalPlant = apps.get_model('dispatch', 'ThermalPlant')
+
+    for plant in ThermalPlant.objects.only('pk', *INPUT_PARAMETERS).iterator():
+        ThermalPlant.objects.filter(pk=plant.pk).update(
+            fingerprint=fingerprint({name: getattr(plant, name) for name in INPUT_PARAMETERS}))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0025_thermalplantoptimizationresultchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thermalplant',
+            name='fingerprint',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='thermalplant',
+            name='shared',
+            field=models.BooleanField(default=False, verbose_name='Share tuning and results with other users who share'),
+        ),
+        migrations.RunPython(create_fingerprints, migrations.RunPython.noop),
+    ]
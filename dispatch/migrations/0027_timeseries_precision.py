@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0026_thermalplant_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeseries',
+            name='decimals',
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='timeseries',
+            name='precision',
+            field=models.CharField(choices=[('float64', 'float64'), ('float32', 'float32'), ('int32', 'int32 with fixed decimals'), ('bool', 'bit-packed 0/1')], default='float64', max_length=8),
+        ),
+    ]
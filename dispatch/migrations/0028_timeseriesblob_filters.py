@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:26
+
+import dispatch.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0027_timeseries_precision'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timeseriesblob',
+            name='data',
+            field=dispatch.fields.CompressedArrayField(default=b'', filters='auto'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+import dispatch.fields
+from django.db import migrations
+
+
+def encode_legacy_time_series(apps, schema_editor):
+    """
+    Re-encodes time series that are still stored as gzip compressed JSON in the binary array format (0018 left them
+    unchanged on databases migrated before it was fixed).
+    """
+    TimeSeries = apps.get_model('dispatch', 'TimeSeries')
+
+    for pk, data in TimeSeries.objects.values_list('pk', 'data').iterator():
+        raw = bytes(data.raw)
+
+        if dispatch.fields.read_array_header(raw) is None:
+            TimeSeries.objects.filter(pk=pk).update(
+                data=dispatch.fields.encode_array(dispatch.fields.decode_array(raw)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0028_timeseriesblob_filters'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_legacy_time_series, migrations.RunPython.noop),
+    ]
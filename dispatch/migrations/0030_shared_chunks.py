@@ -0,0 +1,99 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:45
+
+import hashlib
+import os
+
+import numpy as np
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from dispatch.fields import encode_array
+
+
+def array_checksum(array):
+    """
+    Same as dispatch.models.array_checksum at the time of this migration.
+    """
+    array = np.ascontiguousarray(array)
+
+    checksum = hashlib.sha256()
+    checksum.update('{dtype}{shape}'.format(dtype=array.dtype.str, shape=array.shape).encode('ascii'))
+    checksum.update(array.data)
+
+    return checksum.hexdigest()
+
+
+def split_shared_blobs(apps, schema_editor):
+    """
+    Stores the values of shared time series as chunks that reference one blob per chunk content.
+    """
+    TimeSeries = apps.get_model('dispatch', 'TimeSeries')
+    TimeSeriesBlob = apps.get_model('dispatch', 'TimeSeriesBlob')
+    TimeSeriesChunk = apps.get_model('dispatch', 'TimeSeriesChunk')
+
+    for series in TimeSeries.objects.filter(storage='shared', blob__isnull=False).select_related('blob').iterator():
+        values = np.asarray(series.blob.data)
+
+        for chunk_no, begin in enumerate(range(0, len(values), series.chunk_length)):
+            part = values[begin:begin + series.chunk_length]
+
+            blob, created = TimeSeriesBlob.objects.get_or_create(
+                content_hash=array_checksum(part),
+                defaults={'length': len(part),
+                          'data': encode_array(part, dtype=series.precision, decimals=series.decimals,
+                                               filters='auto')})
+
+            TimeSeriesChunk.objects.create(series=series, chunk_no=chunk_no, blob=blob, data=b'')
+
+
+def delete_unreferenced_blobs(apps, schema_editor):
+    """
+    Deletes the blobs of whole series that are not the blob of a chunk as well.
+    """
+    TimeSeriesBlob = apps.get_model('dispatch', 'TimeSeriesBlob')
+
+    TimeSeriesBlob.objects.filter(chunks__isnull=True).delete()
+
+
+def create_content_hashes(apps, schema_editor):
+    """
+    Fills the content hash of time series whose values were not saved by TimeSeries.write().
+    """
+    TimeSeries = apps.get_model('dispatch', 'TimeSeries')
+
+    for series in TimeSeries.objects.filter(content_hash='').select_related('array_file').iterator():
+        if series.storage == 'file':
+            values = np.load(os.path.join(settings.MEDIA_ROOT, series.array_file.path))
+
+        elif series.storage in ('chunked', 'shared'):
+            chunks = [np.asarray(blob_data if blob_data is not None else data)
+                      for data, blob_data in series.chunks.order_by('chunk_no').values_list('data', 'blob__data')]
+            values = np.concatenate(chunks) if chunks else np.zeros(0)
+
+        else:
+            values = np.asarray(series.data)
+
+        TimeSeries.objects.filter(pk=series.pk).update(content_hash=array_checksum(values))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0029_encode_legacy_time_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeserieschunk',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='chunks', to='dispatch.TimeSeriesBlob'),
+        ),
+        migrations.RunPython(split_shared_blobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='timeseries',
+            name='blob',
+        ),
+        migrations.RunPython(delete_unreferenced_blobs, migrations.RunPython.noop),
+        migrations.RunPython(create_content_hashes, migrations.RunPython.noop),
+    ]
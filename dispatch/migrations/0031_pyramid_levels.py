@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-19 19:47
+
+from django.db import migrations, models
+
+from dispatch.fields import encode_array, decode_array
+
+
+def encode_levels(apps, schema_editor):
+    """
+    Splits the flat pyramid array of existing time series into separately encoded levels (see summary.py).
+    """
+    TimeSeries = apps.get_model('dispatch', 'TimeSeries')
+
+    for series in TimeSeries.objects.filter(summary__isnull=False).only('pk', 'summary', 'pyramid').iterator():
+        layout = series.summary.get('pyramid') or []
+
+        if not layout or any('size' in entry for entry in layout):
+            continue
+
+        flat = decode_array(bytes(series.pyramid))
+
+        levels = []
+        offset = 0
+        for entry in layout:
+            encoded = encode_array(flat[entry['offset']:entry['offset'] + 3 * entry['length']])
+
+            entry.update(offset=offset, size=len(encoded))
+            levels.append(encoded)
+            offset += len(encoded)
+
+        series.pyramid = b''.join(levels)
+        series.save(update_fields=['summary', 'pyramid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0030_shared_chunks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timeseries',
+            name='pyramid',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(encode_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+import datetime
+import hashlib
+import json
+
+import pandas as pd
+from django.db import migrations
+
+
+def convert_single_datetime_indices(apps, schema_editor):
+    """
+    Stores datetime indices of a single value, which were saved as regular indices without interval, as irregular
+    indices of one segment (key same as TimeSeriesIndex.create_key).
+    """
+    TimeSeriesIndex = apps.get_model('dispatch', 'TimeSeriesIndex')
+
+    for time_series_index in TimeSeriesIndex.objects.filter(index_type=2, datetime_interval=datetime.timedelta(0)):
+        start = pd.Timestamp(time_series_index.datetime_start)
+        start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+
+        segments = [[int(start.value), 0, 1]]
+
+        time_series_index.index_type = 3
+        time_series_index.segments = segments
+        time_series_index.datetime_start = None
+        time_series_index.datetime_interval = None
+        time_series_index.key = 'irregular:{checksum}'.format(
+            checksum=hashlib.sha256(json.dumps(segments, separators=(',', ':')).encode('ascii')).hexdigest())
+        time_series_index.save(update_fields=['index_type', 'segments', 'datetime_start', 'datetime_interval', 'key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0031_pyramid_levels'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_single_datetime_indices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+import numpy as np
+from django.db import migrations
+
+from dispatch.fields import encode_columns
+
+# ThermalPlantOptimizationResultChunk.CHUNK_LENGTH at the time of this migration
+CHUNK_LENGTH = 8784
+
+# fields of the legacy rows -> columns of the result (ramping_BSE held powerProdBSE)
+LEGACY_COLUMNS = (('production', 'production'), ('consumption', 'consumption'), ('ramping_BSE', 'powerProdBSE'),
+                  ('power_price', 'power_price'), ('fuel_price', 'fuel_price'))
+
+
+def convert_legacy_results(apps, schema_editor):
+    """
+    Stores the results of runs saved as one ThermalPlantOptimizationResult row per time step column wise
+    (ThermalPlantOptimizationResultChunk, see ThermalPlantOptimizationRun.store_result) and deletes the rows.
+    """
+    ThermalPlantOptimizationRun = apps.get_model('dispatch', 'ThermalPlantOptimizationRun')
+    ThermalPlantOptimizationResult = apps.get_model('dispatch', 'ThermalPlantOptimizationResult')
+    ThermalPlantOptimizationResultChunk = apps.get_model('dispatch', 'ThermalPlantOptimizationResultChunk')
+
+    runs = ThermalPlantOptimizationResult.objects.values_list('run', flat=True).distinct()
+
+    for run in ThermalPlantOptimizationRun.objects.filter(pk__in=runs, result_chunks__isnull=True).iterator():
+        rows = ThermalPlantOptimizationResult.objects.filter(run=run).order_by('pk')
+        values = np.array(list(rows.values_list(*[field for field, name in LEGACY_COLUMNS])), dtype=float)
+
+        chunks = []
+        for chunk_no, begin in enumerate(range(0, len(values), CHUNK_LENGTH)):
+            part = values[begin:begin + CHUNK_LENGTH]
+            manifest, payload = encode_columns({name: part[:, position]
+                                                for position, (field, name) in enumerate(LEGACY_COLUMNS)},
+                                               filters='auto')
+
+            chunks.append(ThermalPlantOptimizationResultChunk(run=run, chunk_no=chunk_no, start=begin,
+                                                              end=begin + len(part), manifest=manifest,
+                                                              payload=payload))
+
+        ThermalPlantOptimizationResultChunk.objects.bulk_create(chunks)
+        rows.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatch', '0032_single_datetime_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_legacy_results, migrations.RunPython.noop),
+    ]
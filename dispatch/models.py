@@ -1,33 +1,84 @@
 import numpy as np
-import datetime
 import pandas as pd
 import uuid
 import csv
-
-from django.db import models
+import time
+import os
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import models, connections, transaction, IntegrityError
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.db.models.signals import pre_delete, post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.db.models.fields.related import RelatedField
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 
-from .fields import CompressedJSONField
-from .utils import to_dict
+from .cache import get_array_cache
+from . import time_index
+from .fields import CompressedJSONField, CompressedArrayField, LazyArray, encode_array, decode_array, encode_columns
+from .fields import decode_columns
+from .fields import is_binary, round_trip
+from .results import ResultReader
+from .parquet import PARQUET_AVAILABLE, is_parquet, read_frame, read_columns
+from .resample import resample as resample_values, first_label, interval_ends, to_step
+from .summary import compute_summary, compute_pyramid, find_level, level_to_dataframe
+from .utils import to_dict, fingerprint
 
 
 class CompressedJSONModel(models.Model):
     value = CompressedJSONField(null=False, default=b'')
 
 
+class ThermalPlantQuerySet(models.QuerySet):
+    def reusable_for(self, user, shared=False):
+        """
+        Plants whose tuning and results may be reused for a plant of a user.
+        :param user:
+        :param shared: The plant is shared, the shared plants of other users are included.
+        :return: The plants of the user (and the shared plants of other users)
+        """
+        plants = models.Q(user=user)
+
+        if shared:
+            plants |= models.Q(shared=True)
+
+        return self.filter(plants)
+
+
 # Create your models here.
 class ThermalPlant(models.Model):
     # todo: toask: What does BSE, RMP, NRM, UPwarm, depreciation ... stand for?
     # todo: validation of fields: >0, <1, MEL > SEL (form validation)
+
+    # input parameters of a plant definition, all other parameters are derived from them in save()
+    INPUT_PARAMETERS = ('capacity', 'efficiency', 'MIN_prod_fraction', 'SEL_prod_fraction', 'MEL_prod_fraction',
+                        'ramping_rate_BSE', 'ramping_rate_RMP', 'ramping_rate_NRM', 'ramping_costs_BSE',
+                        'ramping_costs_RMP', 'ramping_costs_NRM', 'depreciation', 'shutdown_costs', 'hot_start_costs',
+                        'warm_start_costs', 'cold_start_costs', 'hot_start_within_timedelta',
+                        'warm_start_within_timedelta')
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(blank=False, max_length=256, default='Plant', verbose_name='Plant name')
     pub_date = models.DateTimeField(auto_now_add=True)
     last_altered = models.DateTimeField(auto_now=True)
 
+    # hash of the input parameters, equal for plants with identical parameters (see create_fingerprint)
+    fingerprint = models.CharField(max_length=64, db_index=True, editable=False, default='')
+    shared = models.BooleanField(default=False, verbose_name='Share tuning and results with other users who share')
+
+    objects = ThermalPlantQuerySet.as_manager()
+
     # production
     capacity = models.FloatField(blank=False, verbose_name='Capacity [MW]', validators=[MinValueValidator(0)])
     efficiency = models.FloatField(blank=False, verbose_name='Efficiency [0-1]', validators=[MinValueValidator(0), MaxValueValidator(1)])
@@ -94,9 +145,25 @@ class ThermalPlant(models.Model):
         self.UPwarm_time = self.warm_start_within_timedelta
         self.DW_cost = self.shutdown_costs * self.capacity
 
+        self.fingerprint = self.create_fingerprint(self.to_parameters())
+
         # Call the "real" save() method.
         super().save(*args, **kwargs)
 
+    @classmethod
+    def create_fingerprint(cls, definition):
+        """
+        :param definition: Dictionary containing (at least) the input parameters of a plant definition.
+        :return: Fingerprint of the input parameters
+        """
+        return fingerprint({name: definition[name] for name in cls.INPUT_PARAMETERS})
+
+    def to_parameters(self):
+        """
+        :return: Dictionary of the input parameters
+        """
+        return {name: getattr(self, name) for name in self.INPUT_PARAMETERS}
+
     def to_dict(self):
         result = to_dict(self)
 
@@ -109,18 +176,27 @@ class ThermalPlant(models.Model):
 class TimeSeriesIndex(models.Model):
     """
     Indexes are UTC encoded series of date times.
+    Datetime indices with gaps or changing intervals (e.g. DST shifts of local time exports) are stored as run-length
+    encoded segments (see time_index.py).
     """
     INDEX_TYPE_CHOICES = (
         (1, _('integer')),
         (2, _('datetime')),
+        (3, _('irregular datetime')),
     )
 
     index_type = models.IntegerField(choices=INDEX_TYPE_CHOICES, default=1, blank=False)
 
+    # canonical representation of the index, see create_key
+    key = models.CharField(max_length=128, unique=True, null=True, blank=True)
+
     # datetime index
     datetime_start = models.DateTimeField(null=True)
     datetime_interval = models.DurationField(null=True)
 
+    # irregular datetime index: list of [start, interval, count] segments in nanoseconds since the epoch (UTC)
+    segments = CompressedJSONField(null=True, default=None)
+
     # todo: time index (just as time_start, time_interval instead of datetime)
 
     # integer index
@@ -129,83 +205,149 @@ class TimeSeriesIndex(models.Model):
 
     # constraints: make sure that interval is positive
 
+    # process wide memo of committed indices (key -> instance)
+    MEMO_SIZE = 1024
+    _memo = OrderedDict()
+    _memo_lock = threading.Lock()
+
+    # process wide pool of created indices ((key, length) -> pandas Index)
+    INDEX_POOL_SIZE = 256
+    _index_pool = OrderedDict()
+
+    def create_key(self):
+        """
+        Canonical key of the index definition: integer:<offset>, datetime:<UTC start>:<interval in microseconds> or
+        irregular:<SHA-256 of the segments>.
+        :return:
+        """
+        if self.index_type == 1:
+            return 'integer:{offset}'.format(offset=int(self.integer_offset or 0))
+
+        if self.index_type == 3:
+            segments = json.dumps(self.segments, separators=(',', ':')).encode('ascii')
+            return 'irregular:{checksum}'.format(checksum=hashlib.sha256(segments).hexdigest())
+
+        start = pd.Timestamp(self.datetime_start)
+        start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+        interval = pd.Timedelta(self.datetime_interval)
+
+        return 'datetime:{start}:{interval}'.format(start=start.isoformat(),
+                                                    interval=interval // pd.Timedelta(microseconds=1))
+
+    def save(self, *args, **kwargs):
+        self.key = self.create_key()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def _memorize(cls, instance):
+        with cls._memo_lock:
+            cls._memo[instance.key] = instance
+            cls._memo.move_to_end(instance.key)
+
+            while len(cls._memo) > cls.MEMO_SIZE:
+                cls._memo.popitem(last=False)
+
+    @classmethod
+    def _forget(cls, key):
+        with cls._memo_lock:
+            cls._memo.pop(key, None)
+
+    @classmethod
+    def _memorized(cls, key):
+        with cls._memo_lock:
+            return cls._memo.get(key)
+
     def create_index(self, length):
         """
-        Creates an numpy array as index for a time series. Either integer or datetime.
+        Creates the index for a time series: a RangeIndex for integer indices, a UTC DatetimeIndex for datetime
+        indices. Indices are immutable and shared by all time series with the same index definition and length.
         :param length: Number of items in the index.
-        :return:
+        :return: pandas Index
         """
-        # create a numpy array as basis for the index
-        result = np.arange(length)
+        pool_key = (self.create_key(), length)
+
+        with TimeSeriesIndex._memo_lock:
+            result = TimeSeriesIndex._index_pool.get(pool_key)
+
+            if result is not None:
+                TimeSeriesIndex._index_pool.move_to_end(pool_key)
+                return result
 
         # if integer index
         if self.index_type == 1:
-            result += self.integer_offset
+            offset = int(self.integer_offset or 0)
+            result = pd.RangeIndex(offset, offset + length)
 
         # datetime index
         elif self.index_type == 2:
-            result = self.datetime_start + self.datetime_interval * result
+            start = pd.Timestamp(self.datetime_start)
+            start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+            result = pd.date_range(start=start, periods=length, freq=pd.Timedelta(self.datetime_interval))
 
-        return result
-
-    def _convert_data_index_to_model(self, index):
-        if len(index) == 0:
-            # todo: raise error
-            assert len(index) > 0
-
-        def is_integer_index(index):
-            return (type(index[0]) == int) or (type(index[0]) == np.int64)
+        # irregular datetime index
+        elif self.index_type == 3:
+            result = pd.to_datetime(time_index.decode_segments(self.segments, length), utc=True)
 
-        def is_datetime_index(index):
-            return (type(index[0]) == datetime.datetime) or (type(index[0]) == np.datetime64)
+        with TimeSeriesIndex._memo_lock:
+            TimeSeriesIndex._index_pool[pool_key] = result
 
-        index_type = None
-        index_types = {
-            'integer': is_integer_index,
-            'datetime': is_datetime_index
-        }
+            while len(TimeSeriesIndex._index_pool) > TimeSeriesIndex.INDEX_POOL_SIZE:
+                TimeSeriesIndex._index_pool.popitem(last=False)
 
-        for t, f in index_types.items():
-            if f(index):
-                index_type = t
+        return result
 
-        # assuming that index is ordered
-        start = index[0]
+    def _convert_data_index_to_model(self, index):
+        """
+        Validates index data and converts it to the fields of the model.
+        :param index: List, array or pandas Index of integers or datetimes, strictly increasing.
+        :return: Dictionary of fields
+        """
+        try:
+            kind, values = time_index.to_int64(index)
+            time_index.validate(values)
 
-        # assuming that index is ordered and have equidistant spacing
-        interval = -1
-        if len(index) > 1:
-            interval = index[1] - index[0]
+        except ValueError as e:
+            raise ValidationError(str(e))
 
         result = {
             'index_type': None,
             'integer_offset': None,
             'datetime_start': None,
-            'datetime_interval': None
+            'datetime_interval': None,
+            'segments': None,
         }
 
-        if index_type == 'integer':
+        segments = time_index.encode_segments(values)
+
+        if kind == time_index.INTEGER:
+            if len(segments) > 1 or segments[0][1] not in (0, 1):
+                raise ValidationError(_('Integer indices must be consecutive, found spacing {spacing}').format(
+                    spacing=time_index.spacing_histogram(values)))
+
             result['index_type'] = 1
-            result['integer_offset'] = start
+            result['integer_offset'] = int(values[0])
 
-        elif index_type == 'datetime':
+        elif len(segments) == 1 and segments[0][1] > 0:
             result['index_type'] = 2
-            result['datetime_start'] = start
-            result['datetime_interval'] = interval
+            result['datetime_start'] = pd.Timestamp(values[0], tz='UTC').to_pydatetime()
+            result['datetime_interval'] = pd.Timedelta(int(segments[0][1])).to_pytimedelta()
+
+        else:
+            # also a single datetime (one segment without interval)
+            result['index_type'] = 3
+            result['segments'] = segments
 
         return result
 
     def create_from_data(self, index):
         """
-        Assumes index is ordered.
+        Validates the index (strictly increasing) and sets the fields.
         :param index:
         :return:
         """
 
         index_dict = self._convert_data_index_to_model(index)
 
-        print('index_dict', index, index_dict)
-
         self.index_type = index_dict['index_type']
         if index_dict['index_type'] == 1:
             self.integer_offset = index_dict['integer_offset']
@@ -214,52 +356,411 @@ class TimeSeriesIndex(models.Model):
             self.datetime_start = index_dict['datetime_start']
             self.datetime_interval = index_dict['datetime_interval']
 
+        elif index_dict['index_type'] == 3:
+            self.segments = index_dict['segments']
+
         return self
 
+    def step(self):
+        """
+        :return: Smallest spacing of the index values (nanoseconds for datetime indices, 1 for integer indices), None
+        for an index of a single datetime.
+        """
+        if self.index_type == 1:
+            return 1
+
+        if self.index_type == 2:
+            return pd.Timedelta(self.datetime_interval).value
+
+        return min((interval for start, interval, count in self.segments if interval > 0), default=None)
+
+    def count_before(self, value):
+        """
+        Number of index values before a value.
+        :param value: int64 value (see time_index.to_int64)
+        :return:
+        """
+        if self.index_type == 1:
+            return max(0, value - int(self.integer_offset or 0))
+
+        if self.index_type == 2:
+            start = time_index.to_int64([self.datetime_start])[1][0]
+            return max(0, -(-(value - int(start)) // self.step()))
+
+        return int(np.searchsorted(time_index.decode_segments(self.segments), value, side='left'))
+
+    def locate(self, value):
+        """
+        Position of an index value (integer or datetime).
+        :param value:
+        :return: Position or None if the value is not part of the index.
+        """
+        kind, values = time_index.to_int64([value])
+
+        if (kind == time_index.INTEGER) != (self.index_type == 1):
+            return None
+
+        if self.index_type == 1:
+            segments = [[int(self.integer_offset or 0), 1, np.iinfo(np.int64).max]]
+
+        elif self.index_type == 2:
+            start = time_index.to_int64([self.datetime_start])[1][0]
+            segments = [[int(start), pd.Timedelta(self.datetime_interval).value, np.iinfo(np.int64).max]]
+
+        else:
+            segments = self.segments
+
+        return time_index.locate(segments, int(values[0]))
+
     def does_exist(self, index):
         """
         Looks up if an index representation for a data index already exist.
         :param index:
         :return: Model instance of TimeSeriesIndex if exists
         """
+        key = TimeSeriesIndex().create_from_data(index).create_key()
 
-        index_dict = self._convert_data_index_to_model(index)
+        model_instance = TimeSeriesIndex._memorized(key)
 
-        index_dict = {key: value for (key, value) in index_dict.items() if value is not None}
+        if model_instance is None:
+            model_instance = TimeSeriesIndex.objects.filter(key=key).first()
 
-        # delete None
-        try:
-            model_instance = TimeSeriesIndex.objects.get(**index_dict)
-            return model_instance
+            if model_instance is not None:
+                transaction.on_commit(lambda: TimeSeriesIndex._memorize(model_instance))
 
-        except TimeSeriesIndex.DoesNotExist:
-            return None
+        return model_instance
 
     def create_if_not_exists(self, index):
+        """
+        Returns the saved index representation of a data index, it is created if it does not exist yet. Safe under
+        concurrent uploads of the same index.
+        :param index:
+        :return: Model instance of TimeSeriesIndex
+        """
         result = self.does_exist(index)
 
-        print('does_exist', result)
-
         if result is not None:
             return result
-        else:
-            return self.create_from_data(index)
+
+        self.create_from_data(index)
+        key = self.create_key()
+
+        try:
+            with transaction.atomic():
+                self.save()
+            result = self
+
+        except IntegrityError:
+            # created by a concurrent request in the meantime
+            result = TimeSeriesIndex.objects.get(key=key)
+
+        # only memorize committed rows, rolled back rows would be returned otherwise
+        transaction.on_commit(lambda: TimeSeriesIndex._memorize(result))
+
+        return result
+
+    @classmethod
+    def create_many_if_not_exist(cls, indices):
+        """
+        Saved index representations of many data indices, looked up with one query. Missing ones are created once, even
+        if several data indices are equal.
+        :param indices: List of data indices
+        :return: List of TimeSeriesIndex instances in the order of the data indices
+        """
+        candidates = [cls().create_from_data(index) for index in indices]
+        keys = [candidate.create_key() for candidate in candidates]
+
+        existing = {key: cls._memorized(key) for key in keys}
+        existing.update(cls.objects.in_bulk([key for key, value in existing.items() if value is None],
+                                            field_name='key'))
+
+        for key, candidate in zip(keys, candidates):
+            if existing.get(key) is not None:
+                continue
+
+            try:
+                with transaction.atomic():
+                    candidate.save()
+                existing[key] = candidate
+
+            except IntegrityError:
+                # created by a concurrent request in the meantime
+                existing[key] = cls.objects.get(key=key)
+
+        results = [existing[key] for key in keys]
+
+        transaction.on_commit(lambda: [cls._memorize(result) for result in results])
+
+        return results
+
+
+@receiver(post_delete, sender=TimeSeriesIndex)
+def forget_time_series_index(sender, instance, **kwargs):
+    if instance.key is not None:
+        TimeSeriesIndex._forget(instance.key)
+
+
+def array_checksum(array):
+    """
+    SHA-256 of the dtype, shape and values of an array.
+    :param array: Numpy array
+    :return: Hex digest
+    """
+    array = np.ascontiguousarray(array)
+
+    checksum = hashlib.sha256()
+    checksum.update('{dtype}{shape}'.format(dtype=array.dtype.str, shape=array.shape).encode('ascii'))
+    checksum.update(array.data)
+
+    return checksum.hexdigest()
+
+
+# per thread: the lists of paths written by ArrayFile.from_array of the active remove_files_on_error blocks
+_written_array_files = threading.local()
+
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@contextmanager
+def remove_files_on_error():
+    """
+    Removes the files written by ArrayFile.from_array inside the block if the block raises, i.e. if the transaction
+    the rows of the files were created in rolls back. Enter it before transaction.atomic().
+    """
+    stack = _written_array_files.__dict__.setdefault('stack', [])
+    paths = []
+    stack.append(paths)
+
+    try:
+        yield
+    except BaseException:
+        for path in paths:
+            remove_file(path)
+        raise
+    finally:
+        stack.pop()
+
+
+class ArrayFile(models.Model):
+    """
+    Array stored as .npy file below MEDIA_ROOT (directory DISPATCH_ARRAY_DIRECTORY). Reads are memory-mapped, so
+    slicing only loads the touched pages and processes reading the same file share them through the OS cache.
+    """
+    path = models.CharField(max_length=255, unique=True)  # relative to MEDIA_ROOT
+    dtype = models.CharField(max_length=16)
+    shape = models.CharField(max_length=64)  # comma separated
+    checksum = models.CharField(max_length=64)  # see array_checksum
+    created = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Writes the array to a new file and creates the row.
+        :param array: Numpy array (or list)
+        :return: ArrayFile instance
+        """
+        array = np.ascontiguousarray(array)
+
+        directory = getattr(settings, 'DISPATCH_ARRAY_DIRECTORY', 'arrays')
+        path = os.path.join(directory, '{name}.npy'.format(name=uuid.uuid4().hex))
+
+        instance = cls(path=path,
+                       dtype=array.dtype.str,
+                       shape=','.join(str(dimension) for dimension in array.shape),
+                       checksum=array_checksum(array))
+
+        os.makedirs(os.path.dirname(instance.full_path), exist_ok=True)
+
+        # write to a temporary file first so that readers never see a partial file
+        temporary_path = instance.full_path + '.tmp'
+        with open(temporary_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(temporary_path, instance.full_path)
+
+        for paths in getattr(_written_array_files, 'stack', []):
+            paths.append(instance.full_path)
+
+        instance.save()
+
+        return instance
+
+    @property
+    def full_path(self):
+        return os.path.join(settings.MEDIA_ROOT, self.path)
+
+    def get_shape(self):
+        return tuple(int(dimension) for dimension in self.shape.split(',') if dimension)
+
+    def load(self, mmap=True):
+        """
+        Loads the array.
+        :param mmap: Return a read-only np.memmap instead of reading the whole file.
+        :return:
+        """
+        return np.load(self.full_path, mmap_mode='r' if mmap else None)
+
+    def verify(self):
+        """
+        Checks the file against the stored checksum.
+        :return: True if the file is unchanged.
+        """
+        return array_checksum(self.load()) == self.checksum
+
+
+@receiver(post_delete, sender=ArrayFile)
+def delete_array_file(sender, instance, **kwargs):
+    # the row is restored if the transaction rolls back, so the file is only removed once the deletion is committed
+    path = instance.full_path
+    transaction.on_commit(lambda: remove_file(path))
+
+
+class TimeSeriesBlobQuerySet(models.QuerySet):
+    def unreferenced(self):
+        """
+        Blobs that are not used by any time series anymore.
+        :return:
+        """
+        return self.filter(chunks__isnull=True)
+
+
+class TimeSeriesBlob(models.Model):
+    """
+    Values of a chunk shared by all time series with the same chunk content (e.g. the same price curve uploaded several
+    times or the same year in several scenarios).
+    """
+    content_hash = models.CharField(max_length=64, unique=True)  # see array_checksum
+    length = models.IntegerField(null=False, default=0)
+    data = CompressedArrayField(null=False, default=b'', filters='auto')
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = TimeSeriesBlobQuerySet.as_manager()
+
+    @classmethod
+    def get_or_create_for(cls, values, content_hash=None, data=None):
+        """
+        Returns the blob with the given values, it is created if no blob has the same content.
+        :param values: Numpy array
+        :param content_hash: array_checksum of the values if already computed.
+        :param data: The values encoded by encode_array (e.g. with a storage precision), default float64.
+        :return: TimeSeriesBlob instance
+        """
+        blob, created = cls.objects.get_or_create(content_hash=content_hash or array_checksum(values),
+                                                  defaults={'length': len(values),
+                                                            'data': values if data is None else data})
+
+        return blob
+
+    @classmethod
+    def get_or_create_many(cls, arrays, encode=None):
+        """
+        Blobs of many arrays with one lookup query, missing ones are inserted with one bulk insert.
+        :param arrays: Dictionary content_hash -> numpy array
+        :param encode: Function returning the encoded values of an array (e.g. with a storage precision), default
+        float64.
+        :return: Dictionary content_hash -> TimeSeriesBlob instance (without data)
+        """
+        blobs = {blob.content_hash: blob for blob in cls.objects.filter(content_hash__in=arrays).defer('data')}
+
+        missing = [content_hash for content_hash in arrays if content_hash not in blobs]
+
+        if missing:
+            # conflicts are blobs created by a concurrent request in the meantime
+            cls.objects.bulk_create([cls(content_hash=content_hash, length=len(arrays[content_hash]),
+                                         data=arrays[content_hash] if encode is None else encode(arrays[content_hash]))
+                                     for content_hash in missing],
+                                    ignore_conflicts=True)
+            blobs.update({blob.content_hash: blob
+                          for blob in cls.objects.filter(content_hash__in=missing).defer('data')})
+
+        return blobs
+
+    @classmethod
+    def collect(cls, pks):
+        """
+        Deletes the blobs that are not referenced by a chunk anymore once the transaction is committed (e.g. after the
+        chunks of a shared time series were deleted).
+        :param pks: Primary keys of the blobs of the deleted chunks
+        :return:
+        """
+        pks = list(set(pks))
+
+        if pks:
+            transaction.on_commit(lambda: cls.objects.unreferenced().filter(pk__in=pks).delete())
+
+
+class TimeSeriesQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Time series without their data and pyramid, e.g. for list views (the summary is loaded). The data is only loaded
+        when it is accessed.
+        :return:
+        """
+        return self.defer('data', 'pyramid')
 
 
 class TimeSeries(models.Model):
+    """
+    Values of a time series. Short series are stored in the data column (inline), long series in chunks of
+    chunk_length values (TimeSeriesChunk), so that ranges can be read without decoding the whole series. Very large
+    series can be stored as memory-mapped file (ArrayFile). Shared storage is chunked as well, but identical chunks are
+    stored once (TimeSeriesBlob) and referenced by the chunks of every time series with the same values there.
+    content_hash identifies the values of the whole series.
+    """
+    STORAGE_INLINE = 'inline'
+    STORAGE_CHUNKED = 'chunked'
+    STORAGE_FILE = 'file'
+    STORAGE_SHARED = 'shared'
+
+    STORAGE_CHOICES = (
+        (STORAGE_INLINE, _('inline')),
+        (STORAGE_CHUNKED, _('chunked')),
+        (STORAGE_FILE, _('file')),
+        (STORAGE_SHARED, _('shared')),
+    )
+
+    PRECISION_FLOAT64 = 'float64'
+    PRECISION_FLOAT32 = 'float32'
+    PRECISION_SCALED = 'int32'
+    PRECISION_BOOL = 'bool'
+
+    PRECISION_CHOICES = (
+        (PRECISION_FLOAT64, _('float64')),
+        (PRECISION_FLOAT32, _('float32')),
+        (PRECISION_SCALED, _('int32 with fixed decimals')),
+        (PRECISION_BOOL, _('bit-packed 0/1')),
+    )
+
+    CHUNK_LENGTH = 4096
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)  # reference to creat
     name = models.CharField(max_length=256)  #
     description = models.TextField(default='')  #
 
     index = models.ForeignKey(TimeSeriesIndex, on_delete=models.CASCADE)  # self reference
-    data = CompressedJSONField(null=False, default=b'')  # list of values, maybe binary and zipped
+    data = CompressedArrayField(null=False, default=b'')  # array of values, binary and compressed
     length = models.IntegerField(null=False, default=0)  # store length of data, to be able to easily create index
     unit = models.CharField(max_length=124, default='')
 
+    storage = models.CharField(max_length=16, choices=STORAGE_CHOICES, default=STORAGE_INLINE)  # location of the values
+    chunk_length = models.IntegerField(null=False, default=CHUNK_LENGTH)  # values per chunk of chunked storage
+    array_file = models.ForeignKey(ArrayFile, null=True, blank=True, on_delete=models.SET_NULL)  # file storage
+    content_hash = models.CharField(max_length=64, default='', db_index=True)  # identity of the values
+    precision = models.CharField(max_length=8, choices=PRECISION_CHOICES, default=PRECISION_FLOAT64)  # see encode_array
+    decimals = models.SmallIntegerField(default=0)  # decimals kept by the int32 precision
+
+    # computed when the values are saved, see summary.py
+    summary = CompressedJSONField(null=True, default=None)  # statistics and layout of the pyramid
+    pyramid = models.BinaryField(null=False, default=b'')  # min/max/mean per hour, day and week, encoded per level
+
     pub_date = models.DateTimeField('date published', auto_now_add=True, null=False)
     last_altered = models.DateTimeField('date altered', auto_now=True, null=False)
     public = models.BooleanField(default=False)
 
+    objects = TimeSeriesQuerySet.as_manager()
+
     def create_index(self):
         """
         Creates an index for time series
@@ -287,150 +788,795 @@ class TimeSeries(models.Model):
         # create index if it does not exist already
         time_series_index = TimeSeriesIndex().create_if_not_exists(index)
 
-    def to_dataframe(self):
+    def save(self, *args, **kwargs):
+        # values assigned to data (not loaded from the database) are summarized and hashed, write() does it for other
+        # storages
+        if self.storage == self.STORAGE_INLINE and 'data' not in self.get_deferred_fields():
+            if not isinstance(self.data, (LazyArray, bytes, memoryview)):
+                values = np.asarray(self.data, dtype=float)
+                self.update_summary(values)
+                self.content_hash = array_checksum(values)
+
+            elif not self.content_hash:
+                self.content_hash = array_checksum(np.asarray(self.data) if isinstance(self.data, LazyArray)
+                                                   else decode_array(self.data))
+
+        super().save(*args, **kwargs)
+
+    def update_summary(self, values):
         """
-        Return a dataframe with index.
+        Computes the summary statistics and the pyramid of the values.
+        :param values: List or array of values.
         :return:
         """
+        values = np.asarray(values, dtype=float)
 
-        # todo: write test
+        layout, self.pyramid = compute_pyramid(values, self.index.create_index(len(values)))
 
-        index = self.create_index()
+        self.summary = compute_summary(values)
+        self.summary['pyramid'] = layout
 
-        df = pd.DataFrame({'index': index, self.name: self.data})
+    def overview(self, level='day'):
+        """
+        Downsampled values from the pyramid, the values of the series are not loaded. If the pyramid is deferred (see
+        for_listing) only the bytes of the level are read.
+        :param level: 'hour', 'day' or 'week'
+        :return: DataFrame with the columns min, max and mean.
+        """
+        if not self.summary:
+            raise KeyError('The time series has no pyramid')
 
-        df.set_index('index', inplace=True)
+        entry = find_level(self.summary['pyramid'], level)
 
-        return df
+        if 'pyramid' in self.get_deferred_fields():
+            data = TimeSeries.objects.filter(pk=self.pk) \
+                .annotate(level_data=Substr('pyramid', entry['offset'] + 1, entry['size'])) \
+                .values_list('level_data', flat=True).get()
+        else:
+            data = memoryview(self.pyramid)[entry['offset']:entry['offset'] + entry['size']]
 
+        return level_to_dataframe(entry, data)
 
-def create_thermal_plant_dispatch_model(user, version, plant_definition, time_series_index_data, wholesale_price,
-                                        clean_fuel_price, pk=None):
-    """
-    Create instance or edit it if pk is provided.
-    :param version:
-    :param plant_definition: Dictionary containing all information about a plant definition.
-    :param wholesale_price:
-    :param clean_fuel_price:
-    :param time_series_index:
-    :param pk:
-    :return:
-    """
-    # todo: function needs to be able to receive raw definitions/data or pks of already created objects. create asserts
+    def write(self, values, storage=None, precision=None, decimals=None):
+        """
+        Stores the values (replacing the existing ones) and saves the time series. Callers writing file storage in
+        their own transaction enter remove_files_on_error before it, so the new file is removed if it rolls back.
+        :param values: List or array of values.
+        :param storage: STORAGE_INLINE, STORAGE_CHUNKED, STORAGE_FILE or STORAGE_SHARED. By default series longer than
+        one chunk are chunked.
+        :param precision: Storage precision (PRECISION_FLOAT64, ...), default the precision of the series. Values are
+        rounded to it before the summary and the content hash are computed.
+        :param decimals: Decimals kept by PRECISION_SCALED, default the decimals of the series.
+        :return:
+        """
+        if precision is not None:
+            self.precision = precision
+        if decimals is not None:
+            self.decimals = decimals
 
-    assert len(time_series_index_data) == len(wholesale_price) == len(
-        clean_fuel_price), 'Time series data and index must have the same length.'
+        # the values as they are read back
+        values = round_trip(values, self.precision, self.decimals)
 
-    if pk is None:
-        model_instance = ThermalPlantDispatch()
+        if storage is None:
+            storage = self.STORAGE_CHUNKED if len(values) > self.chunk_length else self.STORAGE_INLINE
 
-    else:
-        # todo: maybe use get_object_or_404
-        model_instance = ThermalPlantDispatch.objects.get(pk=pk)
-
-    # create time series index if it doesn't exist already
-    time_series_index = TimeSeriesIndex().create_if_not_exists(time_series_index_data)
-    time_series_index.save()
-
-    print(time_series_index.pk)
-
-    # create the two time series
-    # 1. wholesale price
-    wholesale_price_time_series = TimeSeries.objects.create(
-        user=user,
-        name='wholesale_price',
-        description='',
-        index=time_series_index,
-        data=wholesale_price,
-        length=len(wholesale_price),
-        unit='EUR/MWh',
-    )
+        self.storage = storage
+        self.length = len(values)
+        self.content_hash = array_checksum(values)
 
-    print('wholesale_price_time_series', wholesale_price_time_series.pk)
-
-    # 2. clean fuel price
-    clean_fuel_price_time_series = TimeSeries.objects.create(
-        user=user,
-        name='clean_fuel_price',
-        description='',
-        index=time_series_index,
-        data=clean_fuel_price,
-        length=len(clean_fuel_price),
-        unit='EUR/MWh_thermal',
-    )
+        self.update_summary(values)
 
-    print('clean_fuel_price_time_series', clean_fuel_price_time_series.pk)
+        previous_array_file = self.array_file
 
-    # create plant
-    # delete 'user' from plant_definition if exists
-    if 'user' in plant_definition:
-        del plant_definition['user']
+        try:
+            with remove_files_on_error(), transaction.atomic():
+                self.data = LazyArray(self.encode(values)) if storage == self.STORAGE_INLINE else b''
+                self.array_file = ArrayFile.from_array(values) if storage == self.STORAGE_FILE else None
+                self.save()
 
-    if 'id' in plant_definition:
-        del plant_definition['id']
+                blobs = self.chunks.filter(blob__isnull=False).values_list('blob', flat=True)
+                TimeSeriesBlob.collect(blobs)
 
-    # todo: only create if it does not exist already
-    thermal_plant = ThermalPlant.objects.create(user=user, **plant_definition)
+                self.chunks.all().delete()
 
-    print('thermal_plant', thermal_plant.pk)
+                if storage in (self.STORAGE_CHUNKED, self.STORAGE_SHARED):
+                    TimeSeriesChunk.objects.bulk_create(self.create_chunks(values))
 
-    thermal_plant_dispatch_setup = ThermalPlantDispatch.objects.create(
-        user=user,
-        version=version,
-        plant=thermal_plant,
-        wholesale_price=wholesale_price_time_series,
-        clean_fuel_price=clean_fuel_price_time_series,
-        time_series_index=time_series_index,
-    )
+                if previous_array_file is not None:
+                    previous_array_file.delete()
 
-    return thermal_plant_dispatch_setup
+        except BaseException:
+            self.array_file = previous_array_file
+            raise
 
+    def encode(self, values):
+        """
+        :param values: Array of values
+        :return: Values encoded with the precision of the series (see fields.encode_array)
+        """
+        return encode_array(values, dtype=self.precision, decimals=self.decimals, filters='auto')
 
-class ThermalPlantDispatch(models.Model):
-    # todo: maybe call differently to reflect purpose of Object. ThermalPlantDispatchSetup
-    """
-    The setup for a thermal plant dispatch simulation.
-    """
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    version = models.IntegerField(default=0)
-    plant = models.ForeignKey(ThermalPlant, on_delete=models.CASCADE)
-    wholesale_price = models.ForeignKey(TimeSeries,
-                                        on_delete=models.CASCADE,
-                                        related_name='dispatch_wholesale_price_set')
-    clean_fuel_price = models.ForeignKey(TimeSeries,
-                                         on_delete=models.CASCADE,
-                                         related_name='dispatch_clean_fuel_price_set')
+    def create_chunks(self, values, blobs=None):
+        """
+        Unsaved chunks of chunked or shared storage. Chunks of shared storage reference the blob of their content.
+        :param values: Values of the series (rounded to its precision).
+        :param blobs: Dictionary content hash -> TimeSeriesBlob of the chunks (see split_chunks), looked up if None.
+        :return: List of TimeSeriesChunk instances
+        """
+        chunks = split_chunks(values, self.chunk_length)
 
-    time_series_index = models.ForeignKey(TimeSeriesIndex, on_delete=models.CASCADE)
+        if self.storage != self.STORAGE_SHARED:
+            return [TimeSeriesChunk(series=self, chunk_no=chunk_no, data=self.encode(part))
+                    for chunk_no, (content_hash, part) in enumerate(chunks)]
+
+        if blobs is None:
+            blobs = TimeSeriesBlob.get_or_create_many(dict(chunks), encode=self.encode)
 
-    def time_series(self):
+        return [TimeSeriesChunk(series=self, chunk_no=chunk_no, blob=blobs[content_hash], data=b'')
+                for chunk_no, (content_hash, part) in enumerate(chunks)]
+
+    def chunk_range(self, start=None, end=None):
         """
-        Creates one common DataFrame for all data.
-        :return:
+        :param start: Position of the first value (as for slicing).
+        :param end: Position after the last value (as for slicing).
+        :return: Tuple (start, end, first chunk_no, last chunk_no) of the range, None if it is empty.
         """
+        start, end, _ = slice(start, end).indices(self.length)
 
-        # todo: write test
+        if end <= start:
+            return None
 
-        # find all TimeSeries fields
-        time_series_fields = []
-        for field in self._meta.get_fields():
-            if isinstance(field, RelatedField):
-                if field.related_model is TimeSeries:  # weirdly isinstance(field.related_model, TimeSeries) doesn't work
-                    time_series_fields.append(field.name)
+        return start, end, start // self.chunk_length, (end - 1) // self.chunk_length
 
-        # create data frames with indices
-        data = []
-        for field in time_series_fields:
-            data.append(getattr(self, field).to_dataframe())
+    def chunk_data_field(self):
+        """
+        :return: Lookup of the encoded values of a chunk (of the blob for shared storage).
+        """
+        return 'blob__data' if self.storage == self.STORAGE_SHARED else 'data'
 
-        # concat dataframes of returned
-        result = pd.concat(data, axis=1)
-        return result
+    def read(self, start=None, end=None, chunks=None):
+        """
+        Reads the values of a range. Of chunked and shared series only the chunks overlapping the range are loaded and
+        decoded. Decoded values are kept in the array cache of the process (see cache.py).
+        :param start: Position of the first value (as for slicing).
+        :param end: Position after the last value (as for slicing).
+        :param chunks: List of (chunk_no, encoded values) of the chunks of the range if already loaded (see
+        read_time_series).
+        :return: Read-only numpy array, a np.memmap for file storage.
+        """
+        if self.storage == self.STORAGE_FILE:
+            # file pages are cached by the OS
+            return self.array_file.load()[start:end]
 
+        cache = get_array_cache() if self.pk is not None else None
 
-def unique_filename_user_directory(instance, filename):
-    """
-    Creates a unique filename using uuid and stores it into a user folder.
+        if self.storage not in (self.STORAGE_CHUNKED, self.STORAGE_SHARED):
+            # the whole data column is decoded anyway, so the whole series is cached
+            key = (self.pk, self.last_altered, None, None)
+            values = cache.get(key) if cache is not None else None
+
+            if values is None:
+                values = np.asarray(self.data)
+
+                if cache is not None:
+                    values = cache.put(key, values)
+
+            return values[start:end]
+
+        chunk_range = self.chunk_range(start, end)
+
+        if chunk_range is None:
+            return np.zeros(0)
+
+        start, end, first_chunk, last_chunk = chunk_range
+
+        key = (self.pk, self.last_altered, start, end)
+        values = cache.get(key) if cache is not None else None
+
+        if values is not None:
+            return values
+
+        if chunks is None:
+            chunks = self.chunks.filter(chunk_no__gte=first_chunk, chunk_no__lte=last_chunk) \
+                .values_list('chunk_no', self.chunk_data_field())
+
+        chunks = sorted((chunk for chunk in chunks if first_chunk <= chunk[0] <= last_chunk), key=lambda chunk: chunk[0])
+        values = np.concatenate([np.asarray(data) for chunk_no, data in chunks])
+
+        offset = first_chunk * self.chunk_length
+        values = values[start - offset:end - offset].copy()
+        values.flags.writeable = False  # cached without a further copy
+
+        if cache is not None:
+            cache.put(key, values)
+
+        return values
+
+    def index_kind(self):
+        """
+        :return: time_index.INTEGER or time_index.DATETIME
+        """
+        return time_index.INTEGER if self.index.index_type == 1 else time_index.DATETIME
+
+    def index_values(self):
+        """
+        :return: The index as int64 values (see time_index.to_int64).
+        """
+        return time_index.to_int64(self.create_index())[1] if self.length else np.zeros(0, dtype=np.int64)
+
+    def resample(self, freq, how='mean', first=None, last=None, origin=0):
+        """
+        Values at a regular frequency, vectorized up- and downsampling (see resample.py). With first and last only the
+        values of the range are read. The resampled values are kept in the array cache of the process.
+        :param freq: Frequency of datetime indices ('15min', 'h', 'D', Timedelta) or number of positions of integer
+        indices.
+        :param how: 'mean', 'first' or 'ffill'
+        :param first: First label (int64, see time_index.to_int64) of the range, default the start of the series.
+        :param last: Last label (int64) of the range, default the end of the series.
+        :param origin: The labels are origin (int64) plus multiples of the step, default multiples of the step.
+        :return: pandas Series named like the time series, indexed by UTC datetimes (or positions of integer indices).
+        """
+        kind = self.index_kind()
+        labels, values = self.resample_values(to_step(freq, kind), how, first, last, origin)
+
+        labels = pd.to_datetime(labels, utc=True) if kind == time_index.DATETIME else pd.Index(labels)
+
+        return pd.Series(values, index=labels.rename('index'), name=self.name)
+
+    def resample_values(self, step, how='mean', first=None, last=None, origin=0):
+        """
+        See resample.
+        :param step: Step as int64 (see resample.to_step)
+        :return: Tuple (labels, values) of int64 labels and float64 values
+        """
+        index_values = self.index_values()
+
+        start, end = 0, len(index_values)
+        if first is not None:
+            # the value covering the first label
+            start = max(int(np.searchsorted(index_values, first, side='right')) - 1, 0)
+        if last is not None:
+            # one more value than needed, its index value ends the interval of the last needed value
+            end = min(int(np.searchsorted(index_values, last + step, side='left')) + 1, len(index_values))
+
+        if end <= start:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        cache = get_array_cache() if self.pk is not None else None
+        key = (self.pk, self.last_altered, 'resample', step, how, origin, start, end)
+        values = cache.get(key) if cache is not None else None
+
+        if values is None:
+            labels, values = resample_values(self.read(start, end), index_values[start:end], step, how, origin)
+            values.flags.writeable = False  # cached without a copy
+
+            if cache is not None:
+                cache.put(key, values)
+
+        labels = first_label(index_values[start], step, origin) + step * np.arange(len(values), dtype=np.int64)
+
+        # only the labels of the range (starting with the bucket of first)
+        begin = 0 if first is None else int(np.searchsorted(labels, first_label(first, step, origin), side='left'))
+        stop = len(labels) if last is None else int(np.searchsorted(labels, last, side='right'))
+
+        return labels[begin:stop], values[begin:stop]
+
+    def coverage_end(self):
+        """
+        :return: End (int64) of the interval covered by the last value (see resample.interval_ends), None if empty.
+        """
+        index_values = self.index_values()
+
+        return int(interval_ends(index_values[-2:])[-1]) if len(index_values) else None
+
+    def to_dataframe(self, start=None, end=None, values=None):
+        """
+        Return a dataframe with index.
+        :param start: Position of the first value.
+        :param end: Position after the last value.
+        :param values: Values of the range if they are already read.
+        :return:
+        """
+        if values is None:
+            values = self.read(start, end)
+
+        # the index is shared, rename returns a new index object
+        index = self.create_index()[start:end].rename('index')
+
+        df = pd.DataFrame({self.name: values}, index=index)
+
+        return df
+
+
+@receiver(post_delete, sender=TimeSeries)
+def delete_time_series_array_file(sender, instance, **kwargs):
+    if instance.array_file_id is not None:
+        ArrayFile.objects.filter(pk=instance.array_file_id).delete()
+
+
+@receiver(pre_delete, sender=TimeSeries)
+def collect_time_series_blobs(sender, instance, **kwargs):
+    # the chunks are deleted with the time series, their blobs are deleted once they are unreferenced
+    TimeSeriesBlob.collect(TimeSeriesChunk.objects.filter(series=instance, blob__isnull=False)
+                           .values_list('blob', flat=True))
+
+
+@receiver(post_save, sender=TimeSeries)
+@receiver(post_delete, sender=TimeSeries)
+def invalidate_cached_time_series(sender, instance, **kwargs):
+    cache = get_array_cache()
+
+    if cache is not None:
+        cache.invalidate(instance.pk)
+
+
+def split_chunks(values, chunk_length):
+    """
+    :param values: Array of values
+    :param chunk_length: Values per chunk
+    :return: List of (content hash, values) of the chunks.
+    """
+    parts = [values[begin:begin + chunk_length] for begin in range(0, len(values), chunk_length)]
+
+    return [(array_checksum(part), part) for part in parts]
+
+
+class TimeSeriesChunk(models.Model):
+    """
+    Part of the values of a chunked TimeSeries. Chunks of shared storage reference the blob with their values instead.
+    """
+    series = models.ForeignKey(TimeSeries, on_delete=models.CASCADE, related_name='chunks')
+    chunk_no = models.IntegerField()  # position of the chunk, first value is chunk_no * series.chunk_length
+    data = CompressedArrayField(null=False, default=b'')
+    blob = models.ForeignKey(TimeSeriesBlob, null=True, blank=True, on_delete=models.PROTECT,
+                             related_name='chunks')  # shared storage
+
+    class Meta:
+        unique_together = ('series', 'chunk_no')
+        ordering = ['series', 'chunk_no']
+
+
+def insert_instances(instances):
+    """
+    Inserts new model instances of one model. They are bulk inserted if the database returns the primary keys of bulk
+    inserts, otherwise they are saved one by one (call it inside a transaction to commit them at once).
+    :param instances: List of unsaved model instances
+    :return: The instances with their primary keys set
+    """
+    if not instances:
+        return instances
+
+    manager = type(instances[0])._default_manager
+
+    if connections[manager.db].features.can_return_ids_from_bulk_insert:
+        return manager.bulk_create(instances)
+
+    for instance in instances:
+        instance.save(force_insert=True)
+
+    return instances
+
+
+def create_thermal_plant_dispatch_model(user, version, plant_definition, time_series_index_data, wholesale_price,
+                                        clean_fuel_price, pk=None):
+    """
+    Create instance or edit it if pk is provided. All rows are written in one transaction.
+    :param version:
+    :param plant_definition: Dictionary containing all information about a plant definition.
+    :param wholesale_price:
+    :param clean_fuel_price:
+    :param time_series_index:
+    :param pk:
+    :return:
+    """
+    # todo: function needs to be able to receive raw definitions/data or pks of already created objects. create asserts
+
+    return create_thermal_plant_dispatch_models(user, version, plant_definition,
+                                                [(time_series_index_data, wholesale_price, clean_fuel_price)],
+                                                pks=[pk])[0]
+
+
+def create_thermal_plant_dispatch_models(user, version, plant_definition, scenarios, pks=None):
+    """
+    Creates dispatch setups of one plant for many price scenarios (e.g. one plant against many price files) in one
+    transaction. Indices and blobs are looked up once for all scenarios, identical indices and prices are stored once.
+    The oldest plant of the user with the same parameters, name and shared flag is reused, otherwise a plant is
+    created.
+    :param user:
+    :param version:
+    :param plant_definition: Dictionary containing all information about a plant definition.
+    :param scenarios: List of tuples (time_series_index_data, wholesale_price, clean_fuel_price)
+    :param pks: Primary keys of setups of the user to edit instead of creating new ones, None for new setups (one per
+    scenario). The time series replaced by the edit are deleted.
+    :return: List of ThermalPlantDispatch instances in the order of the scenarios
+    :raises ThermalPlantDispatch.DoesNotExist: If a setup to edit does not exist or belongs to another user.
+    """
+    pks = pks or [None] * len(scenarios)
+
+    assert len(pks) == len(scenarios), 'One primary key (or None) per scenario is needed.'
+
+    existing = ThermalPlantDispatch.objects.filter(user=user).in_bulk([pk for pk in pks if pk is not None])
+    missing = sorted({pk for pk in pks if pk is not None} - set(existing))
+
+    if missing:
+        raise ThermalPlantDispatch.DoesNotExist('Dispatch setups {pks} do not exist or belong to another user.'.format(
+            pks=', '.join(str(pk) for pk in missing)))
+
+    scenarios = [(index_data, np.asarray(wholesale_price, dtype=float), np.asarray(clean_fuel_price, dtype=float))
+                 for index_data, wholesale_price, clean_fuel_price in scenarios]
+
+    for index_data, wholesale_price, clean_fuel_price in scenarios:
+        assert len(index_data) == len(wholesale_price) == len(
+            clean_fuel_price), 'Time series data and index must have the same length.'
+
+    # the plant is created with the fields of the definition only
+    plant_definition = {name: value for name, value in plant_definition.items() if name not in ('user', 'id')}
+
+    # validation and hashing happen before the transaction is opened
+    content_hashes = [(array_checksum(wholesale_price), array_checksum(clean_fuel_price))
+                      for index_data, wholesale_price, clean_fuel_price in scenarios]
+
+    # identical chunks of all prices are stored once
+    chunks = {}
+    for index_data, wholesale_price, clean_fuel_price in scenarios:
+        for values in (wholesale_price, clean_fuel_price):
+            chunks.update(split_chunks(values, TimeSeries.CHUNK_LENGTH))
+
+    with transaction.atomic():
+        time_series_indices = TimeSeriesIndex.create_many_if_not_exist(
+            [index_data for index_data, wholesale_price, clean_fuel_price in scenarios])
+        blobs = TimeSeriesBlob.get_or_create_many(chunks)
+
+        # plants with the same parameters, name and sharing are reused (a plant differing in name or sharing only is
+        # created, it still finds the tuning of plants with the same parameters, see tuned_for)
+        thermal_plant = ThermalPlant.objects.filter(
+            user=user, fingerprint=ThermalPlant.create_fingerprint(plant_definition),
+            **{name: plant_definition.get(name, ThermalPlant._meta.get_field(name).get_default())
+               for name in ('name', 'shared')}).order_by('pk').first()
+
+        if thermal_plant is None:
+            thermal_plant = ThermalPlant.objects.create(user=user, **plant_definition)
+
+        # identical uploads share their values
+        time_series = []
+        values_of_series = []
+        for (index_data, *prices), time_series_index, hashes in zip(scenarios, time_series_indices, content_hashes):
+            for name, unit, values, content_hash in zip(('wholesale_price', 'clean_fuel_price'),
+                                                        ('EUR/MWh', 'EUR/MWh_thermal'), prices, hashes):
+                series = TimeSeries(user=user, name=name, description='', unit=unit, index=time_series_index,
+                                    storage=TimeSeries.STORAGE_SHARED, length=len(values), content_hash=content_hash,
+                                    data=b'')
+                series.update_summary(values)
+                time_series.append(series)
+                values_of_series.append(values)
+
+        insert_instances(time_series)
+
+        TimeSeriesChunk.objects.bulk_create([chunk for series, values in zip(time_series, values_of_series)
+                                             for chunk in series.create_chunks(values, blobs)])
+
+        setups = []
+        new_setups = []
+        replaced = set()
+        for (wholesale_price, clean_fuel_price), time_series_index, pk in zip(
+                zip(time_series[::2], time_series[1::2]), time_series_indices, pks):
+
+            if pk is not None:
+                replaced.update(getattr(existing[pk], '{name}_id'.format(name=name))
+                                for name in ThermalPlantDispatch.time_series_fields())
+
+            setup = existing[pk] if pk is not None else ThermalPlantDispatch()
+            setup.user = user
+            setup.version = version
+            setup.plant = thermal_plant
+            setup.wholesale_price = wholesale_price
+            setup.clean_fuel_price = clean_fuel_price
+            setup.time_series_index = time_series_index
+
+            if pk is None:
+                new_setups.append(setup)
+            else:
+                setup.save()
+
+            setups.append(setup)
+
+        insert_instances(new_setups)
+
+        if replaced:
+            delete_unused_time_series(replaced)
+
+    return setups
+
+
+def delete_unused_time_series(pks):
+    """
+    Deletes time series that are not used by a dispatch setup (e.g. the prices replaced by an edit). Blobs only their
+    chunks used are deleted on commit (see collect_time_series_blobs).
+    :param pks: Primary keys of time series
+    :return:
+    """
+    used = Q()
+    for name in ThermalPlantDispatch.time_series_fields():
+        used |= Q(**{'{related}__isnull'.format(
+            related=ThermalPlantDispatch._meta.get_field(name).related_query_name()): False})
+
+    TimeSeries.objects.filter(pk__in=pks).exclude(used).delete()
+
+
+def load_chunks(series, start=None, end=None):
+    """
+    Loads the encoded chunks of a range of many chunked or shared time series with one query.
+    :param series: List of TimeSeries instances (chunked or shared storage).
+    :param start: Position of the first value.
+    :param end: Position after the last value.
+    :return: Dictionary pk -> list of (chunk_no, encoded values)
+    """
+    chunk_ranges = {}
+    for time_series in series:
+        chunk_range = time_series.chunk_range(start, end)
+
+        if chunk_range is not None:
+            chunk_ranges.setdefault(chunk_range[2:], []).append(time_series.pk)
+
+    result = {pk: [] for pk in chain.from_iterable(chunk_ranges.values())}
+
+    if not result:
+        return result
+
+    # series of the same length and chunk length cover the same chunks
+    condition = Q()
+    for (first_chunk, last_chunk), pks in chunk_ranges.items():
+        condition |= Q(series__in=pks, chunk_no__gte=first_chunk, chunk_no__lte=last_chunk)
+
+    rows = TimeSeriesChunk.objects.filter(condition).values_list('series', 'chunk_no', 'data', 'blob__data')
+
+    for pk, chunk_no, data, blob_data in rows:
+        result[pk].append((chunk_no, blob_data if blob_data is not None else data))
+
+    return result
+
+
+def read_time_series(series, start=None, end=None, max_workers=None):
+    """
+    Reads the values of many time series. Values stored in the rows (inline storage, loaded e.g. with select_related)
+    and the chunks of chunked and shared storage (loaded with one query for all series) are decoded in a thread pool as
+    zlib releases the GIL. File storage is read in the calling thread.
+    :param series: List of TimeSeries instances.
+    :param start: Position of the first value.
+    :param end: Position after the last value.
+    :param max_workers: Number of threads, default of ThreadPoolExecutor if None.
+    :return: List of arrays in the order of series.
+    """
+    values = [None] * len(series)
+
+    chunks = load_chunks([time_series for time_series in series
+                          if time_series.storage in (TimeSeries.STORAGE_CHUNKED, TimeSeries.STORAGE_SHARED)],
+                         start, end)
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = {}
+        for position, time_series in enumerate(series):
+            if time_series.storage == TimeSeries.STORAGE_INLINE:
+                futures[position] = executor.submit(time_series.read, start, end)
+            elif time_series.storage != TimeSeries.STORAGE_FILE:
+                futures[position] = executor.submit(time_series.read, start, end, chunks.get(time_series.pk, []))
+            else:
+                values[position] = time_series.read(start, end)
+
+        for position, future in futures.items():
+            values[position] = future.result()
+
+    return values
+
+
+def align(*series, freq=None, how='mean'):
+    """
+    Resamples time series to one frequency and joins them on their common range, e.g. hourly fuel prices and 15 minute
+    power prices.
+    :param series: TimeSeries instances
+    :param freq: Target frequency (see TimeSeries.resample), default the finest step of the series.
+    :param how: 'mean', 'first' or 'ffill', or a dictionary time series name -> method (default 'mean').
+    :return: DataFrame with one column per time series, named like the series.
+    """
+    if len({time_series.index.index_type == 1 for time_series in series}) > 1:
+        raise ValueError('Time series with integer and datetime indices can not be aligned')
+
+    if freq is None:
+        freq = min((time_series.index.step() for time_series in series if time_series.index.step() is not None),
+                   default=1)
+
+    resampled = [time_series.resample(freq, how.get(time_series.name, 'mean') if isinstance(how, dict) else how)
+                 for time_series in series]
+
+    if any(len(values) == 0 for values in resampled):
+        return pd.DataFrame(columns=[values.name for values in resampled])
+
+    first = max(values.index[0] for values in resampled)
+    last = min(values.index[-1] for values in resampled)
+
+    return pd.concat([values.loc[first:last] for values in resampled], axis=1)
+
+
+def align_to_index(series, time_series_index, start=None, end=None, how='mean'):
+    """
+    Resamples time series to the index of a dispatch setup, e.g. hourly fuel prices to the 15 minute index of the power
+    prices. Only the values of the range are read.
+    :param series: TimeSeries instances
+    :param time_series_index: TimeSeriesIndex, positions refer to it and its step is the target frequency.
+    :param start: Position of the first data point.
+    :param end: Position after the last data point, default the end of the range covered by all time series.
+    :param how: 'mean', 'first' or 'ffill', or a dictionary time series name -> method (default 'mean').
+    :return: DataFrame with one column per time series indexed by the labels of the index, the values of the bucket of
+    every label (NaN where a time series has no values).
+    """
+    kind = time_index.INTEGER if time_series_index.index_type == 1 else time_index.DATETIME
+
+    if any(time_series.index_kind() != kind for time_series in series):
+        raise ValueError('Time series with integer and datetime indices can not be aligned')
+
+    # an index of a single datetime has no step, its bucket is as long as the finest step of the series
+    step = time_series_index.step() or min((time_series.index.step() for time_series in series
+                                            if time_series.index.step() is not None), default=1)
+
+    if end is None:
+        ends = [time_series.coverage_end() for time_series in series]
+        end = time_series_index.count_before(min(ends)) if None not in ends else 0
+
+    start, end, _ = slice(start, end).indices(end)
+    labels = time_series_index.create_index(max(start, end))[start:end].rename('index')
+
+    columns = OrderedDict()
+    for time_series in series:
+        columns[time_series.name] = np.full(len(labels), np.nan)
+
+    if len(labels) == 0:
+        return pd.DataFrame(columns, index=labels)
+
+    label_values = time_index.to_int64(labels)[1]
+    origin = int(label_values[0])  # buckets start at the labels of the index
+
+    for time_series in series:
+        method = how.get(time_series.name, 'mean') if isinstance(how, dict) else how
+        resampled_labels, values = time_series.resample_values(step, method, label_values[0], label_values[-1], origin)
+
+        if len(values) == 0:
+            continue
+
+        # bucket of every label
+        positions = (label_values - resampled_labels[0]) // step
+        valid = (positions >= 0) & (positions < len(values))
+        columns[time_series.name][valid] = values[positions[valid]]
+
+    return pd.DataFrame(columns, index=labels)
+
+
+class ThermalPlantDispatchQuerySet(models.QuerySet):
+    def with_time_series(self):
+        """
+        Fetches the plant, the index and all time series (with their index) in the same query.
+        :return:
+        """
+        related = ['plant', 'time_series_index']
+        for field in ThermalPlantDispatch.time_series_fields():
+            related += [field, '{field}__index'.format(field=field)]
+
+        return self.select_related(*related)
+
+    def load_time_series(self, start=None, end=None, max_workers=None, wide=False):
+        """
+        Loads the time series of all dispatch setups with one query (and one for the chunks of their values) and decodes
+        them in parallel.
+        :param start: Position of the first data point.
+        :param end: Position after the last data point.
+        :param max_workers: Number of decoding threads.
+        :param wide: Return one DataFrame with (pk, time series) columns instead of a dictionary.
+        :return: Dictionary pk -> DataFrame (as ThermalPlantDispatch.time_series) or one wide DataFrame.
+        """
+        setups = list(self.with_time_series())
+        fields = ThermalPlantDispatch.time_series_fields()
+
+        # setups with time series of other indices are aligned as in ThermalPlantDispatch.time_series
+        series = [getattr(setup, field) for setup in setups if not setup.needs_alignment() for field in fields]
+        values = iter(read_time_series(series, start, end, max_workers))
+        series = iter(series)
+
+        result = {}
+        for setup in setups:
+            if setup.needs_alignment():
+                result[setup.pk] = setup.time_series(start, end)
+                continue
+
+            frames = [next(series).to_dataframe(start, end, values=next(values)) for field in fields]
+            result[setup.pk] = pd.concat(frames, axis=1)
+
+        if wide:
+            return pd.concat(list(result.values()), axis=1, keys=list(result.keys()))
+
+        return result
+
+
+class ThermalPlantDispatch(models.Model):
+    # todo: maybe call differently to reflect purpose of Object. ThermalPlantDispatchSetup
+    """
+    The setup for a thermal plant dispatch simulation.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    version = models.IntegerField(default=0)
+    plant = models.ForeignKey(ThermalPlant, on_delete=models.CASCADE)
+    wholesale_price = models.ForeignKey(TimeSeries,
+                                        on_delete=models.CASCADE,
+                                        related_name='dispatch_wholesale_price_set')
+    clean_fuel_price = models.ForeignKey(TimeSeries,
+                                         on_delete=models.CASCADE,
+                                         related_name='dispatch_clean_fuel_price_set')
+
+    time_series_index = models.ForeignKey(TimeSeriesIndex, on_delete=models.CASCADE)
+
+    objects = ThermalPlantDispatchQuerySet.as_manager()
+
+    _time_series_fields = None
+
+    @classmethod
+    def time_series_fields(cls):
+        """
+        Names of all TimeSeries fields.
+        :return:
+        """
+        if cls._time_series_fields is None:
+            time_series_fields = []
+            for field in cls._meta.get_fields():
+                if isinstance(field, RelatedField):
+                    if field.related_model is TimeSeries:  # weirdly isinstance(field.related_model, TimeSeries) doesn't work
+                        time_series_fields.append(field.name)
+
+            cls._time_series_fields = tuple(time_series_fields)
+
+        return cls._time_series_fields
+
+    def needs_alignment(self):
+        """
+        :return: True if a time series has another index than the setup (e.g. another resolution).
+        """
+        return any(getattr(self, field).index_id != self.time_series_index_id for field in self.time_series_fields())
+
+    def length(self):
+        """
+        :return: Number of data points of the setup (positions of time_series), the range covered by all time series.
+        """
+        series = [getattr(self, field) for field in self.time_series_fields()]
+
+        if self.needs_alignment():
+            ends = [time_series.coverage_end() for time_series in series]
+            return self.time_series_index.count_before(min(ends)) if None not in ends else 0
+
+        return min(time_series.length for time_series in series)
+
+    def time_series(self, start=None, end=None):
+        """
+        Creates one common DataFrame for all data. Time series with another index than the setup are resampled to the
+        index of the setup (see align_to_index), positions always refer to the index of the setup.
+        :param start: Position of the first data point, only the given range is read.
+        :param end: Position after the last data point.
+        :return:
+        """
+        series = [getattr(self, field) for field in self.time_series_fields()]
+
+        if self.needs_alignment():
+            return align_to_index(series, self.time_series_index, start, end)
+
+        # create data frames with indices
+        data = []
+        for time_series in series:
+            data.append(time_series.to_dataframe(start, end))
+
+        # concat dataframes of returned
+        result = pd.concat(data, axis=1)
+        return result
+
+
+def unique_filename_user_directory(instance, filename):
+    """
+    Creates a unique filename using uuid and stores it into a user folder.
     File will be uploaded to MEDIA_ROOT/user_<id>/<filename>
     :param instance:
     :param filename:
@@ -458,6 +1604,9 @@ def csv_validator(file):
     :return:
     """
 
+    if is_parquet(file):
+        return parquet_validator(file)
+
     csv_sniffer = csv.Sniffer()
 
     # read data and try to convert to string
@@ -493,6 +1642,28 @@ def csv_validator(file):
             raise ValidationError(_('TimeSeries must contain the following columns: index, wholesale_price, clean_fuel_price'))
 
 
+def parquet_validator(file):
+    """
+    Checks if the uploaded file is a Parquet file with the necessary columns. The index may be stored as index of the
+    frame, also without name (see read_columns).
+    :param file:
+    :return:
+    """
+    if not PARQUET_AVAILABLE:
+        raise ValidationError(_('Parquet files are not supported on this server.'))
+
+    try:
+        headers = set(read_columns(file))
+    except Exception:
+        raise ValidationError(_('File is not a valid Parquet file.'))
+    finally:
+        file.seek(0)
+
+    for header in ['index', 'wholesale_price', 'clean_fuel_price']:
+        if header not in headers:
+            raise ValidationError(_('TimeSeries must contain the following columns: index, wholesale_price, clean_fuel_price'))
+
+
 class CSVFileUpload(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     upload_date = models.DateTimeField(auto_created=True, auto_now_add=True)
@@ -506,6 +1677,15 @@ class CSVFileUpload(models.Model):
         # set pointer to beginning of file
         self.file.seek(0)
 
+        if is_parquet(self.file):
+            df = read_frame(self.file)
+
+            # the index may be stored as index of the frame
+            if 'index' not in df.columns:
+                df = df.reset_index()
+
+            return df
+
         # find csv dialect
         data = self.file.read(1024)
 
@@ -520,6 +1700,19 @@ class CSVFileUpload(models.Model):
         return pd.read_csv(self.file, dialect=dialect)
 
 
+class ThermalPlantOptimizationRunQuerySet(models.QuerySet):
+    def tuned_for(self, plant):
+        """
+        Runs with an automatically chosen window length for plants with the same input parameters (fingerprint) that
+        are reusable for the user of the plant (see ThermalPlantQuerySet.reusable_for), latest first.
+        :param plant: ThermalPlant instance
+        :return:
+        """
+        plants = ThermalPlant.objects.reusable_for(plant.user, plant.shared).filter(fingerprint=plant.fingerprint)
+
+        return self.filter(tuned=True, dispatch_model__plant__in=plants).order_by('-started')
+
+
 class ThermalPlantOptimizationRun(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     dispatch_model = models.ForeignKey(ThermalPlantDispatch, on_delete=models.CASCADE)
@@ -531,9 +1724,248 @@ class ThermalPlantOptimizationRun(models.Model):
     end = models.IntegerField(null=True, verbose_name="End of optimization run.")
     number_of_batches = models.IntegerField(null=True, verbose_name="Number of batches.")
     overlap = models.FloatField(null=True, verbose_name="Overlap between batches.")
+    window_length = models.IntegerField(null=True, verbose_name="Data points per window.")
+    tuned = models.BooleanField(default=False, verbose_name="Window length was chosen automatically.")
+    presolve = models.BooleanField(default=False, verbose_name="Commitment binaries fixed by presolve.")
+
+    # screening
+    screening = models.BooleanField(default=False, verbose_name="Only the LP relaxation was solved.")
+    objective = models.FloatField(null=True, verbose_name="Profit summed over all windows [EUR]")
+    lp_bound = models.FloatField(null=True, verbose_name="Upper bound of the profit summed over all windows [EUR]")
+
+    # result matrix as memory-mapped file, alternative to ThermalPlantOptimizationResult rows
+    result_file = models.ForeignKey(ArrayFile, null=True, blank=True, on_delete=models.SET_NULL)
+    result_columns = models.TextField(default='')  # comma separated columns of the result matrix
+
+    # commitment binaries of the result, stored bit-packed
+    BINARY_COLUMNS = ('ONF', 'RMP', 'NRM')
+
+    objects = ThermalPlantOptimizationRunQuerySet.as_manager()
+
+    @property
+    def integrality_gap(self):
+        """
+        Relative gap between the LP bound and the profit of the MILP.
+        :return:
+        """
+        return relative_gap(self.lp_bound, self.objective)
+
+    def solver_statistics(self):
+        """
+        Solver statistics of all windows of the run, to find pathological windows.
+        :return: DataFrame with one row per window.
+        """
+        fields = ['number', 'start', 'end', 'length', 'wall_time', 'presolve_rows', 'presolve_columns',
+                  'presolve_elements', 'nodes', 'iterations', 'objective', 'best_bound', 'gap', 'solve_seconds',
+                  'termination_condition']
+
+        return pd.DataFrame.from_records(self.windows.values(*fields), columns=fields, index='number')
+
+    def store_windows(self, windows):
+        """
+        Stores the window statistics of ThermalPlantDispatchOptimizationModel.windows() and sums the objectives and
+        bounds of the windows up.
+        :param windows: List of window dictionaries.
+        :return:
+        """
+        self.windows.all().delete()
+
+        ThermalPlantOptimizationWindow.objects.bulk_create([
+            ThermalPlantOptimizationWindow(run=self, **window) for window in windows
+        ])
+
+        objectives = [window['objective'] for window in windows]
+        lp_bounds = [window['lp_bound'] for window in windows]
+
+        self.objective = sum(objectives) if None not in objectives else None
+        self.lp_bound = sum(lp_bounds) if None not in lp_bounds else None
+        self.save()
+
+    def store_result(self, result, chunk_length=None, writer=None, precision='float64', decimals=0, filters='auto'):
+        """
+        Stores the numeric columns of the result DataFrame column wise (ThermalPlantOptimizationResultChunk).
+        Commitment binaries (BINARY_COLUMNS) that are 0 or 1 are stored bit-packed and loaded as bool.
+        :param result: Result DataFrame of ThermalPlantDispatchOptimizationModel.optimize
+        :param chunk_length: Time steps per chunk, default ThermalPlantOptimizationResultChunk.CHUNK_LENGTH.
+        :param writer: sqlite.BatchedWriter the chunks are added to (e.g. of a worker writing many runs), only for runs
+        without a stored result. By default the chunks are replaced in one transaction.
+        :param precision: Storage precision of the other columns: 'float64', 'float32' or 'int32' (see encode_array).
+        :param decimals: Decimals kept by 'int32'.
+        :param filters: Filters applied before compression (see encode_array), by default the smallest of the filter
+        combinations is chosen per column and chunk.
+        :return:
+        """
+        result = result.select_dtypes(include=[np.number, bool])
+        chunk_length = chunk_length or ThermalPlantOptimizationResultChunk.CHUNK_LENGTH
+
+        # decided for the whole result, so that all chunks of a column have the same dtype
+        encodings = {name: {'dtype': 'bool'} for name in self.BINARY_COLUMNS
+                     if name in result.columns and is_binary(result[name])}
+
+        chunks = []
+        for chunk_no, begin in enumerate(range(0, len(result), chunk_length)):
+            part = result.iloc[begin:begin + chunk_length]
+            manifest, payload = encode_columns({name: part[name].to_numpy(dtype=float) for name in part.columns},
+                                               dtype=precision, decimals=decimals, filters=filters,
+                                               encodings=encodings)
+
+            chunks.append(ThermalPlantOptimizationResultChunk(run=self, chunk_no=chunk_no, start=begin,
+                                                              end=begin + len(part), manifest=manifest,
+                                                              payload=payload))
+
+        if writer is not None:
+            for chunk in chunks:
+                writer.add(chunk)
+            return
+
+        with transaction.atomic():
+            self.result_chunks.all().delete()
+            ThermalPlantOptimizationResultChunk.objects.bulk_create(chunks)
+
+    def load_result(self, columns=None, start=None, end=None):
+        """
+        Result stored by store_result. Only the chunks of the range and the requested columns are decoded.
+        :param columns: Columns to return, default all.
+        :param start: Position of the first time step within the result.
+        :param end: Position after the last time step.
+        :return: DataFrame indexed by the time series index of the dispatch setup.
+        """
+        chunks = self.result_chunks.all()
+        if start is not None:
+            chunks = chunks.filter(end__gt=start)
+        if end is not None:
+            chunks = chunks.filter(start__lt=end)
+
+        chunks = list(chunks)
+        if not chunks:
+            return pd.DataFrame(columns=columns)
+
+        if columns is None:
+            columns = [entry['name'] for entry in chunks[0].manifest]
+
+        parts = [decode_columns(chunk.manifest, chunk.payload, columns) for chunk in chunks]
+        data = {name: np.concatenate([part[name] for part in parts]) if len(parts) > 1 else parts[0][name]
+                for name in columns}
+
+        # positions of the decoded rows within the setup
+        offset = self.start or 0
+        first, last = chunks[0].start, chunks[-1].end
+        index = self.dispatch_model.time_series_index.create_index(offset + last)[offset + first:]
+
+        result = pd.DataFrame(data, index=index, columns=list(columns))
+
+        start = first if start is None else start
+        end = last if end is None else end
+
+        return result.iloc[start - first:end - first]
+
+    def result_reader(self, columns=None):
+        """
+        Lazy reader of the stored result, columns, range and downsampling are pushed down to the storage (see
+        results.py).
+        :param columns: Columns to read, default all.
+        :return: ResultReader
+        """
+        return ResultReader(self, columns)
+
+    def store_result_file(self, result):
+        """
+        Stores the numeric columns of the result DataFrame as memory-mapped file (rows in the order of the result).
+        :param result: Result DataFrame of ThermalPlantDispatchOptimizationModel.optimize
+        :return:
+        """
+        result = result.select_dtypes(include=[np.number])
+
+        previous_result_file = self.result_file
+
+        try:
+            with remove_files_on_error(), transaction.atomic():
+                self.result_file = ArrayFile.from_array(result.to_numpy(dtype=float))
+                self.result_columns = ','.join(result.columns)
+                self.save()
+
+                if previous_result_file is not None:
+                    previous_result_file.delete()
+
+        except BaseException:
+            self.result_file = previous_result_file
+            raise
+
+    def load_result_file(self, columns=None):
+        """
+        Result matrix stored by store_result_file.
+        :param columns: Columns to return, default all.
+        :return: DataFrame indexed by the time series index of the dispatch setup.
+        """
+        stored_columns = self.result_columns.split(',')
+        matrix = self.result_file.load()
+
+        start = self.start or 0
+        index = self.dispatch_model.time_series_index.create_index(start + len(matrix))[start:]
+
+        if columns is None:
+            return pd.DataFrame(matrix, index=index, columns=stored_columns)
+
+        positions = [stored_columns.index(column) for column in columns]
+
+        return pd.DataFrame(matrix[:, positions], index=index, columns=list(columns))
+
+
+@receiver(post_delete, sender=ThermalPlantOptimizationRun)
+def delete_run_result_file(sender, instance, **kwargs):
+    if instance.result_file_id is not None:
+        ArrayFile.objects.filter(pk=instance.result_file_id).delete()
+
+
+def relative_gap(bound, objective):
+    if bound is None or objective is None:
+        return None
+
+    return (bound - objective) / max(abs(objective), 1e-10)
+
+
+class ThermalPlantOptimizationWindow(models.Model):
+    """
+    A window (batch) of an optimization run.
+    """
+    run = models.ForeignKey(ThermalPlantOptimizationRun, on_delete=models.CASCADE, related_name='windows')
+    number = models.IntegerField(verbose_name="Number of the window")
+    start = models.IntegerField(verbose_name="Offset of the window.")
+    end = models.IntegerField(verbose_name="End of the window (without overlap).")
+    length = models.IntegerField(verbose_name="Optimized data points (including overlap).")
+
+    objective = models.FloatField(null=True, verbose_name="Profit of the window (MILP) [EUR]")
+    lp_bound = models.FloatField(null=True, verbose_name="Upper bound of the profit (LP relaxation) [EUR]")
+    relaxation_integral = models.NullBooleanField(verbose_name="LP relaxation is integral.")
+    milp_skipped = models.BooleanField(default=False, verbose_name="MILP was not solved.")
+    fixed_binaries = models.IntegerField(null=True, verbose_name="Commitment binaries fixed by presolve.")
+    wall_time = models.FloatField(null=True, verbose_name="Wall time of the window [s]")
+
+    # solver statistics (parsed from the solver log)
+    presolve_rows = models.IntegerField(null=True, verbose_name="Rows after presolve")
+    presolve_columns = models.IntegerField(null=True, verbose_name="Columns after presolve")
+    presolve_elements = models.IntegerField(null=True, verbose_name="Elements after presolve")
+    nodes = models.IntegerField(null=True, verbose_name="Enumerated nodes")
+    iterations = models.IntegerField(null=True, verbose_name="Total iterations")
+    best_bound = models.FloatField(null=True, verbose_name="Best bound of the profit [EUR]")
+    gap = models.FloatField(null=True, verbose_name="Relative gap between best bound and profit")
+    solve_seconds = models.FloatField(null=True, verbose_name="Solver wall time [s]")
+    termination_condition = models.CharField(max_length=64, default='', verbose_name="Termination condition")
+    solver_log = models.TextField(default='', verbose_name="Solver log")
+
+    class Meta:
+        ordering = ['run', 'number']
+
+    @property
+    def integrality_gap(self):
+        return relative_gap(self.lp_bound, self.objective)
 
 
 class ThermalPlantOptimizationResult(models.Model):
+    """
+    One time step of the result of a run. Only used by runs stored before ThermalPlantOptimizationResultChunk, migration
+    0033 converts them to chunks.
+    """
     run = models.ForeignKey(ThermalPlantOptimizationRun, on_delete=models.CASCADE)
 
     # output fields
@@ -553,4 +1985,117 @@ class ThermalPlantOptimizationResult(models.Model):
      'powerProdBSE_DW', 'powerProdRMP_UP', 'powerProdRMP_DW',
      'powerProdNRM_UP', 'powerProdNRM_DW', 'fuelCosts', 'rampingCosts',
      'depriciationCosts', 'Revenues', 'Costs', 'power_price', 'fuel_price']
-    """
\ No newline at end of file
+    """
+
+
+class ThermalPlantOptimizationResultChunk(models.Model):
+    """
+    Result of a run stored column wise: all output columns of up to CHUNK_LENGTH time steps as compressed arrays in
+    one payload, the manifest lists the columns and their position in the payload (see fields.encode_columns).
+    """
+    CHUNK_LENGTH = 8784
+
+    run = models.ForeignKey(ThermalPlantOptimizationRun, on_delete=models.CASCADE, related_name='result_chunks')
+    chunk_no = models.IntegerField()
+    start = models.IntegerField()  # position of the first time step within the result
+    end = models.IntegerField()  # position after the last time step
+
+    manifest = CompressedJSONField(null=False, default=list)
+    payload = models.BinaryField(null=False, default=b'')
+
+    class Meta:
+        unique_together = ('run', 'chunk_no')
+        ordering = ['run', 'chunk_no']
+
+
+def run_thermal_plant_optimization(user, dispatch_model, start=None, end=None, number_of_batches=None, overlap=0.25,
+                                   relaxation=False, screening=False, max_workers=None, presolve=False,
+                                   window_length=None, reuse_tuning=True, result_file=False):
+    """
+    Optimizes a dispatch setup and stores the run together with its results.
+    :param user:
+    :param dispatch_model: ThermalPlantDispatch instance (setup) to optimize.
+    :param start: Offset for the optimization run.
+    :param end: End of the optimization run.
+    :param number_of_batches: Number of batches or 'auto' to choose the window length by timing the first windows.
+    :param overlap:
+    :param relaxation: Solve the LP relaxation of every window before the MILP (bounds and gaps of the windows).
+    :param screening: Only solve the LP relaxations (optimistic profit estimate), no results are stored.
+    :param max_workers: Number of processes used to solve the relaxations when screening.
+    :param presolve: Fix the commitment binaries that are determined by the prices before solving.
+    :param window_length: Number of data points per window, alternative to number_of_batches.
+    :param reuse_tuning: With number_of_batches='auto', reuse the window length of a previous run for a plant with the
+    same parameters instead of tuning again.
+    :param result_file: Also store the whole result matrix as memory-mapped file (run.load_result_file()).
+    :return: Tuple of the ThermalPlantOptimizationRun instance and the result DataFrame (None when screening).
+    :raises ValueError: If the range or the window options are invalid (see windows.create_windows), checked before
+    anything is solved or stored.
+    """
+    from .dispatch_models.windows import create_windows
+    from .dispatch_models.tuning import AUTO
+
+    create_windows(dispatch_model.length(), start, end, number_of_batches if number_of_batches != AUTO else None,
+                   overlap, window_length)
+
+    # imported here so that loading the models does not import pyomo
+    from .dispatch_models.thermal_plant_v0 import ThermalPlantDispatchOptimizationModel
+
+    tuned = False
+    if number_of_batches == AUTO and reuse_tuning:
+        previous_run = ThermalPlantOptimizationRun.objects.tuned_for(dispatch_model.plant).first()
+
+        if previous_run is not None:
+            number_of_batches = None
+            window_length = previous_run.window_length
+            overlap = previous_run.overlap
+            tuned = True
+
+    # the run is saved together with its windows and results once the optimization succeeded
+    run = ThermalPlantOptimizationRun(user=user,
+                                      dispatch_model=dispatch_model,
+                                      start=start,
+                                      end=end,
+                                      number_of_batches=number_of_batches if number_of_batches != AUTO else None,
+                                      overlap=overlap,
+                                      presolve=presolve,
+                                      screening=screening)
+
+    # only the optimized range is read, positions of the optimization are relative to start
+    opt_model = ThermalPlantDispatchOptimizationModel(dispatch_model.plant.to_dict(),
+                                                      dispatch_model.time_series(start, end))
+
+    started = time.perf_counter()
+    if screening:
+        opt_model.screen(number_of_batches=number_of_batches, overlap=overlap, max_workers=max_workers,
+                         presolve=presolve, window_length=window_length)
+    else:
+        result = opt_model.optimize(number_of_batches=number_of_batches, overlap=overlap, relaxation=relaxation,
+                                    presolve=presolve, window_length=window_length)
+    run.simulation_time = int(round(time.perf_counter() - started))
+
+    if opt_model.tuning() is not None:
+        run.overlap = opt_model.tuning()['overlap']
+        window_length = opt_model.tuning()['window_length']
+        tuned = True
+
+    offset = start or 0
+    windows = [dict(window, start=window['start'] + offset, end=window['end'] + offset)
+               for window in opt_model.windows()]
+
+    # the requested (or tuned) length, the first window is shorter if the range is
+    run.window_length = window_length
+    run.tuned = tuned
+
+    with remove_files_on_error(), transaction.atomic():
+        run.save()
+        run.store_windows(windows)
+
+        if screening:
+            return run, None
+
+        if result_file:
+            run.store_result_file(result)
+
+        run.store_result(result)
+
+    return run, result
@@ -0,0 +1,154 @@
+"""
+Parquet import and export of time series, dispatch setups and run results.
+
+Needs pyarrow, which is optional: PARQUET_AVAILABLE tells if it is installed. Frames are written with their index
+(tz-aware datetime indices keep their time zone) and read column wise with multiple threads. Descriptions of the data
+(name, unit, plant parameters, ...) are stored as JSON in the 'dispatch' key of the schema metadata.
+"""
+import json
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+PARQUET_AVAILABLE = pyarrow is not None
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+METADATA_KEY = b'dispatch'
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError('Parquet support requires the pyarrow package')
+
+
+def is_parquet(file):
+    """
+    :param file: File or file name
+    :return: True if the name has a Parquet extension.
+    """
+    name = getattr(file, 'name', file) or ''
+
+    return name.lower().endswith(PARQUET_EXTENSIONS)
+
+
+def write_frame(df, target, metadata=None, compression='snappy'):
+    """
+    Writes a DataFrame (including its index) to Parquet.
+    :param df: DataFrame
+    :param target: Path or file object
+    :param metadata: JSON serializable description stored in the schema metadata.
+    :param compression: Parquet compression codec.
+    :return:
+    """
+    _require_pyarrow()
+
+    table = pyarrow.Table.from_pandas(df, preserve_index=True)
+
+    if metadata is not None:
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(metadata, default=str).encode('utf-8')
+        table = table.replace_schema_metadata(schema_metadata)
+
+    pyarrow.parquet.write_table(table, target, compression=compression)
+
+
+def read_frame(source, columns=None):
+    """
+    Reads a DataFrame written by write_frame (or any Parquet file).
+    :param source: Path or file object
+    :param columns: Columns to read, default all.
+    :return: DataFrame
+    """
+    _require_pyarrow()
+
+    return pyarrow.parquet.read_table(source, columns=columns, use_threads=True).to_pandas()
+
+
+def read_columns(source):
+    """
+    Column names of a Parquet file without reading the data, as the columns of read_frame(source).reset_index(): the
+    stored index is named like in pandas, an index without name (stored as __index_level_0__ or only as RangeIndex in
+    the pandas metadata) is called 'index'.
+    :param source: Path or file object
+    :return: List of names (the index first, if it is stored and 'index' is not a column)
+    """
+    _require_pyarrow()
+
+    schema = pyarrow.parquet.read_schema(source)
+    pandas_metadata = schema.pandas_metadata or {}
+
+    index_columns = pandas_metadata.get('index_columns', [])
+    names = [name for name in schema.names if name not in index_columns]
+
+    if 'index' in names:
+        return names
+
+    field_names = {column.get('field_name'): column.get('name') for column in pandas_metadata.get('columns', [])}
+
+    index_names = []
+    for level, index_column in enumerate(index_columns):
+        # a RangeIndex is only described in the metadata
+        name = index_column.get('name') if isinstance(index_column, dict) else field_names.get(index_column)
+
+        index_names.append(name if name is not None else 'index' if len(index_columns) == 1 else
+                           'level_{level}'.format(level=level))
+
+    return index_names + names
+
+
+def read_metadata(source):
+    """
+    Description stored by write_frame.
+    :param source: Path or file object
+    :return: Dictionary or None
+    """
+    _require_pyarrow()
+
+    metadata = pyarrow.parquet.read_schema(source).metadata or {}
+
+    if METADATA_KEY not in metadata:
+        return None
+
+    return json.loads(metadata[METADATA_KEY].decode('utf-8'))
+
+
+def export_time_series(time_series, target, start=None, end=None):
+    """
+    :param time_series: TimeSeries instance
+    :param target: Path or file object
+    :param start: Position of the first value.
+    :param end: Position after the last value.
+    :return:
+    """
+    write_frame(time_series.to_dataframe(start, end), target,
+                metadata={'name': time_series.name, 'unit': time_series.unit,
+                          'description': time_series.description})
+
+
+def export_dispatch_setup(dispatch_model, target, start=None, end=None):
+    """
+    Writes all time series of a dispatch setup, the plant parameters are part of the metadata.
+    :param dispatch_model: ThermalPlantDispatch instance
+    :param target: Path or file object
+    :return:
+    """
+    plant = dispatch_model.plant
+
+    write_frame(dispatch_model.time_series(start, end), target,
+                metadata={'dispatch_model': dispatch_model.pk,
+                          'plant': {name: getattr(plant, name) for name in plant.INPUT_PARAMETERS}})
+
+
+def export_run_result(run, target, columns=None):
+    """
+    :param run: ThermalPlantOptimizationRun instance
+    :param target: Path or file object
+    :param columns: Columns to export, default all.
+    :return:
+    """
+    write_frame(run.load_result(columns), target,
+                metadata={'run': run.pk, 'dispatch_model': run.dispatch_model_id, 'objective': run.objective})
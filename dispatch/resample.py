@@ -0,0 +1,111 @@
+"""
+Vectorized resampling of time series values to a regular step.
+
+Index values are int64 (nanoseconds since the epoch in UTC for datetimes, positions for integer indices, see
+time_index.to_int64). The target labels are multiples of the step (days start at midnight UTC) from an origin (default
+0) covering all values; a value covers the interval up to the next index value (the last value the interval before it).
+
+Methods (how):
+- 'mean': mean of the values within every bucket (downsampling). Buckets without values within the interval of a value
+  take that value, upsampling repeats values (e.g. an hourly price for its four quarter hours). Buckets in gaps are NaN.
+- 'first': first value within every bucket, NaN for buckets without values.
+- 'ffill': last value at or before the label, also across gaps.
+"""
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+from . import time_index
+
+METHODS = ('mean', 'first', 'ffill')
+
+
+def to_step(freq, kind):
+    """
+    :param freq: Frequency of datetime indices ('15min', 'h', 'D', Timedelta) or number of positions of integer indices.
+    :param kind: time_index.INTEGER or time_index.DATETIME
+    :return: Step as int64 (nanoseconds or positions)
+    """
+    if kind == time_index.INTEGER:
+        if not isinstance(freq, (int, np.integer)) or freq < 1:
+            raise ValueError('The frequency of integer indices is a number of positions, not {freq}'.format(freq=freq))
+
+        return int(freq)
+
+    if isinstance(freq, str):
+        return int(to_offset(freq).nanos)
+
+    return int(pd.Timedelta(freq).value)
+
+
+def interval_ends(index_values):
+    """
+    :param index_values: Strictly increasing int64 array
+    :return: End of the interval covered by every value
+    """
+    if len(index_values) == 1:
+        return index_values + 1
+
+    return np.append(index_values[1:], 2 * index_values[-1] - index_values[-2])
+
+
+def first_label(index_value, step, origin=0):
+    """
+    :return: Label of the bucket of an index value.
+    """
+    return origin + (index_value - origin) // step * step
+
+
+def resample(values, index_values, step, how='mean', origin=0):
+    """
+    :param values: Array of values
+    :param index_values: Strictly increasing int64 index values
+    :param step: Step of the target labels (see to_step)
+    :param how: 'mean', 'first' or 'ffill'
+    :param origin: The labels are origin plus multiples of the step.
+    :return: Tuple (labels, values) of int64 labels and float64 values
+    """
+    if how not in METHODS:
+        raise ValueError('Unknown method {how}, use one of {methods}'.format(how=how, methods=', '.join(METHODS)))
+
+    values = np.asarray(values, dtype=float)
+    index_values = np.asarray(index_values, dtype=np.int64)
+
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    ends = interval_ends(index_values)
+
+    first = first_label(index_values[0], step, origin)
+    labels = np.arange(first, ends[-1], step, dtype=np.int64)
+
+    if how == 'ffill':
+        positions = np.searchsorted(index_values, labels, side='right') - 1
+
+        return labels, np.where(positions >= 0, values[np.maximum(positions, 0)], np.nan)
+
+    buckets = (index_values - first) // step
+
+    if how == 'first':
+        result = np.full(len(labels), np.nan)
+        occupied, first_positions = np.unique(buckets, return_index=True)
+        result[occupied] = values[first_positions]
+
+        return labels, result
+
+    valid = ~np.isnan(values)
+    sums = np.bincount(buckets[valid], weights=values[valid], minlength=len(labels))
+    counts = np.bincount(buckets[valid], minlength=len(labels))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = sums / counts
+
+    # buckets within the interval of a value (upsampling) take its value
+    empty = np.bincount(buckets, minlength=len(labels)) == 0
+
+    if empty.any():
+        positions = np.searchsorted(index_values, labels[empty], side='right') - 1
+        covered = (positions >= 0) & (labels[empty] < ends[np.maximum(positions, 0)])
+        result[empty] = np.where(covered, values[np.maximum(positions, 0)], np.nan)
+
+    return labels, result
@@ -0,0 +1,261 @@
+"""
+Lazy reader of the stored result of an optimization run, e.g. for plots of multi-year runs.
+
+ResultReader behaves like a DataFrame that is not loaded yet: selecting columns, slicing a range and downsampling only
+return a new reader, the values are read by to_dataframe(). Column selection and range are pushed down to the storage.
+Of result chunks (ThermalPlantOptimizationResultChunk) only the chunks overlapping the range are queried, and of those
+only the bytes of the selected columns (SUBSTR of the payload, one query). Of a result file (memory-mapped matrix) only
+the rows of the range are read, block by block. Downsampling reduces every chunk to partial buckets right after
+decoding, so the full resolution values of a long range are never held at once.
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import BinaryField, Case, When
+from django.db.models.functions import Substr
+
+from .fields import decode_array
+
+AGGREGATIONS = ('mean', 'min', 'max', 'first')
+
+# rows of a result file read at once
+FILE_BLOCK_LENGTH = 8784
+
+
+class ResultReader:
+    """
+    Lazy view of the result of a ThermalPlantOptimizationRun (stored by store_result or store_result_file).
+
+    Usage:
+        reader = run.result_reader()
+        reader[['production', 'power_price']].between(first, last).downsample(max_points=500).to_dataframe()
+    """
+
+    def __init__(self, run, columns=None, start=None, end=None, step=1, how='mean'):
+        """
+        :param run: ThermalPlantOptimizationRun instance
+        :param columns: Columns to read, default all.
+        :param start: Position of the first time step within the result (as for slicing).
+        :param end: Position after the last time step (as for slicing).
+        :param step: Time steps per row, see downsample.
+        :param how: Aggregation of downsampled rows, see downsample.
+        """
+        self.run = run
+        self._columns = list(columns) if columns is not None else None
+        self._start = start
+        self._end = end
+        self.step = step
+        self.how = how
+        self._layout = None
+
+    def _derive(self, **kwargs):
+        options = {'columns': self._columns, 'start': self._start, 'end': self._end, 'step': self.step,
+                   'how': self.how}
+        options.update(kwargs)
+
+        reader = ResultReader(self.run, **options)
+        reader._layout = self._layout  # queried only once
+
+        return reader
+
+    @property
+    def layout(self):
+        """
+        The stored result without its values, queried once.
+        :return: Dictionary with source ('chunks', 'file' or None), columns, length and chunks (pk, start, end and
+        manifest of every chunk).
+        """
+        if self._layout is None:
+            chunks = list(self.run.result_chunks.order_by('chunk_no').values('pk', 'start', 'end', 'manifest'))
+
+            if chunks:
+                self._layout = {'source': 'chunks', 'columns': [entry['name'] for entry in chunks[0]['manifest']],
+                                'length': chunks[-1]['end'], 'chunks': chunks}
+
+            elif self.run.result_file_id is not None:
+                self._layout = {'source': 'file', 'columns': self.run.result_columns.split(','),
+                                'length': self.run.result_file.get_shape()[0], 'chunks': []}
+
+            else:
+                self._layout = {'source': None, 'columns': [], 'length': 0, 'chunks': []}
+
+        return self._layout
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            return list(self.layout['columns'])
+
+        return list(self._columns)
+
+    def _range(self):
+        start, end, _ = slice(self._start, self._end).indices(self.layout['length'])
+
+        return start, max(start, end)
+
+    def _full_index(self, length):
+        offset = self.run.start or 0
+
+        return self.run.dispatch_model.time_series_index.create_index(offset + length)[offset:]
+
+    @property
+    def index(self):
+        """
+        :return: Index of the rows (the first label of every bucket if downsampled), no values are read.
+        """
+        start, end = self._range()
+
+        return self._full_index(end)[start:end:self.step]
+
+    def __len__(self):
+        start, end = self._range()
+
+        return -(-(end - start) // self.step)
+
+    def __getitem__(self, key):
+        """
+        reader['production'] or reader[['production', 'power_price']] selects columns, reader[100:200] time steps
+        (positions within the current range).
+        """
+        if isinstance(key, str):
+            return self._derive(columns=[key])
+
+        if isinstance(key, slice):
+            positions = range(*self._range())[key]
+
+            if positions.step != 1:
+                raise ValueError('Use downsample() instead of a slice step')
+
+            return self._derive(start=positions.start, end=positions.stop)
+
+        return self._derive(columns=list(key))
+
+    def between(self, first=None, last=None):
+        """
+        Time steps by index labels (e.g. UTC datetimes), both included as for DataFrame.loc.
+        :param first: First label, default the start of the result.
+        :param last: Last label, default the end of the result.
+        :return: ResultReader
+        """
+        index = self._full_index(self.layout['length'])
+
+        start = int(index.searchsorted(first, side='left')) if first is not None else None
+        end = int(index.searchsorted(last, side='right')) if last is not None else None
+
+        return self._derive(start=start, end=end)
+
+    def downsample(self, max_points=None, step=None, how='mean'):
+        """
+        Aggregates consecutive time steps into one row.
+        :param max_points: Maximal number of rows (at least 1), the step is chosen accordingly.
+        :param step: Time steps per row (at least 1), alternative to max_points. Without either every row is kept.
+        :param how: 'mean', 'min', 'max' or 'first'
+        :return: ResultReader
+        """
+        if how not in AGGREGATIONS:
+            raise ValueError('Unknown aggregation {how}, use one of {aggregations}'.format(
+                how=how, aggregations=', '.join(AGGREGATIONS)))
+
+        if max_points is not None and max_points < 1:
+            raise ValueError('max_points must be at least 1, got {max_points}'.format(max_points=max_points))
+
+        if step is not None and step < 1:
+            raise ValueError('step must be at least 1, got {step}'.format(step=step))
+
+        if step is None and max_points is None:
+            step = 1
+
+        elif step is None:
+            start, end = self._range()
+            step = max(1, -(-(end - start) // max_points))
+
+        return self._derive(step=step, how=how)
+
+    def _read_chunks(self, columns, start, end):
+        chunks = [chunk for chunk in self.layout['chunks'] if chunk['end'] > start and chunk['start'] < end]
+
+        if not chunks:
+            return
+
+        # the bytes of every selected column of every chunk (positions of SUBSTR start at 1)
+        annotations = {}
+        for number, name in enumerate(columns):
+            cases = []
+            for chunk in chunks:
+                entry = next(entry for entry in chunk['manifest'] if entry['name'] == name)
+                cases.append(When(pk=chunk['pk'], then=Substr('payload', entry['offset'] + 1, entry['size'])))
+
+            annotations['column_{number}'.format(number=number)] = Case(*cases, output_field=BinaryField())
+
+        rows = self.run.result_chunks.filter(pk__in=[chunk['pk'] for chunk in chunks]).order_by('chunk_no') \
+            .annotate(**annotations).values_list(*annotations)
+
+        for chunk, row in zip(chunks, rows):
+            begin = max(start, chunk['start'])
+            part = slice(begin - chunk['start'], min(end, chunk['end']) - chunk['start'])
+
+            yield begin, {name: decode_array(data)[part] for name, data in zip(columns, row)}
+
+    def _read_file(self, columns, start, end):
+        stored_columns = self.layout['columns']
+        positions = [stored_columns.index(name) for name in columns]
+
+        matrix = self.run.result_file.load()
+
+        for begin in range(start, end, FILE_BLOCK_LENGTH):
+            block = np.asarray(matrix[begin:min(end, begin + FILE_BLOCK_LENGTH)])
+
+            yield begin, {name: block[:, position] for name, position in zip(columns, positions)}
+
+    def _read(self, columns, start, end):
+        """
+        :return: Generator of (position of the first time step, dictionary name -> array) of consecutive parts.
+        """
+        if self.layout['source'] == 'chunks':
+            return self._read_chunks(columns, start, end)
+
+        if self.layout['source'] == 'file':
+            return self._read_file(columns, start, end)
+
+        return iter(())
+
+    def to_dataframe(self):
+        """
+        Reads the selected columns and range.
+        :return: DataFrame indexed by the time series index of the dispatch setup (first label of every bucket if
+        downsampled).
+        """
+        columns = self.columns
+        start, end = self._range()
+
+        missing = [name for name in columns if name not in self.layout['columns']]
+        if missing and self.layout['source'] is not None:
+            raise KeyError('The result has no columns {missing}'.format(missing=', '.join(missing)))
+
+        parts = []
+        for begin, data in self._read(columns, start, end):
+            part = pd.DataFrame(data, columns=columns)
+
+            if self.step > 1:
+                # partial buckets, buckets on the border of two parts are combined below
+                buckets = (np.arange(begin, begin + len(part)) - start) // self.step
+                part = part.groupby(buckets).agg(['sum', 'count'] if self.how == 'mean' else [self.how])
+
+            parts.append(part)
+
+        if not parts:
+            return pd.DataFrame(columns=columns, index=self.index[:0])
+
+        result = pd.concat(parts)
+
+        if self.step > 1:
+            grouped = result.groupby(level=0)
+
+            if self.how == 'mean':
+                sums = grouped.sum()
+                result = sums.xs('sum', axis=1, level=1) / sums.xs('count', axis=1, level=1)
+            else:
+                result = getattr(grouped, self.how)().xs(self.how, axis=1, level=1)
+
+        result.index = self.index
+
+        return result[columns]
@@ -0,0 +1,226 @@
+"""
+Long-running optimization service.
+
+Importing pyomo, registering the cbc executable and creating the solver handle only happens once per process. The
+service keeps all of that warm and takes dispatch jobs as JSON over a local HTTP interface, so Django views and the
+command line only forward the work to it:
+
+    POST /dispatch  {"dispatch_model": 1, "start": null, "end": null, "number_of_batches": 2, "overlap": 0.25}
+    GET  /status
+
+Start it with `python manage.py runoptimizationservice` and point DISPATCH_SERVICE_URL in the settings to it. If no
+service url is configured, jobs are run by a service instance inside the current process.
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import close_old_connections
+
+from .cache import get_array_cache
+
+JOB_OPTIONS = ('start', 'end', 'number_of_batches', 'overlap', 'relaxation', 'screening', 'presolve', 'window_length')
+
+
+class DispatchServiceError(Exception):
+    """
+    Error response of the service, status is the HTTP status (400 for invalid jobs).
+    """
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+class DispatchService:
+    """
+    Holds the warm optimization stack and runs dispatch jobs one after the other (pyomo models are not thread safe).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.warm_up()
+
+    def warm_up(self):
+        """
+        Imports the optimization stack and creates the solver handle.
+        :return:
+        """
+        # the import itself is the warm up (pyomo and the model module are loaded once per process)
+        from .dispatch_models import thermal_plant_v0  # noqa: F401
+        from .dispatch_models.utils import get_solver
+
+        get_solver('cbc')
+
+    def status(self):
+        cache = get_array_cache()
+
+        return {'jobs': self.jobs, 'array_cache': cache.stats() if cache is not None else None}
+
+    def dispatch(self, job):
+        """
+        Runs a dispatch job.
+        :param job: Dictionary with the pk of the dispatch setup ('dispatch_model'), optionally the pk of the 'user'
+        the run is stored for and the options of ThermalPlantDispatchOptimizationModel.optimize.
+        :return: Dictionary with the pk of the stored run, the simulation time, objective, LP bound and the profit.
+        """
+        from django.contrib.auth.models import User
+        from .models import ThermalPlantDispatch, run_thermal_plant_optimization
+
+        dispatch_model = ThermalPlantDispatch.objects.with_time_series().select_related('user').get(
+            pk=job['dispatch_model'])
+
+        user = dispatch_model.user
+        if job.get('user') is not None:
+            user = User.objects.get(pk=job['user'])
+
+        options = {key: job[key] for key in JOB_OPTIONS if job.get(key) is not None}
+
+        with self._lock:
+            run, result = run_thermal_plant_optimization(user, dispatch_model, **options)
+            self.jobs += 1
+
+        response = {
+            'run': run.pk,
+            'simulation_time': run.simulation_time,
+            'objective': run.objective,
+            'lp_bound': run.lp_bound,
+        }
+
+        if result is not None:
+            response['profit'] = float((result['Revenues'] - result['Costs']).sum())
+
+        if result is not None and job.get('return_result'):
+            response['result'] = json.loads(result.to_json(orient='split'))
+
+        return response
+
+
+_local_service = None
+
+
+def get_local_service():
+    """
+    Returns the service instance of the current process.
+    :return:
+    """
+    global _local_service
+
+    if _local_service is None:
+        _local_service = DispatchService()
+
+    return _local_service
+
+
+class DispatchServiceRequestHandler(BaseHTTPRequestHandler):
+    service = None
+    close_connections = True
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/status':
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {'error': 'Unknown path {path}'.format(path=self.path)})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/dispatch':
+            self._send_json(404, {'error': 'Unknown path {path}'.format(path=self.path)})
+            return
+
+        if self.close_connections:
+            close_old_connections()
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length).decode('utf-8'))
+            response = self.service.dispatch(job)
+
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'error': 'Invalid job: {error}'.format(error=e)})
+
+        except ObjectDoesNotExist as e:
+            self._send_json(404, {'error': str(e)})
+
+        except Exception as e:
+            self._send_json(500, {'error': '{name}: {error}'.format(name=type(e).__name__, error=e)})
+
+        else:
+            self._send_json(200, response)
+
+        finally:
+            if self.close_connections:
+                close_old_connections()
+
+
+def make_server(host='127.0.0.1', port=8765, service=None, close_connections=True):
+    """
+    Creates the HTTP server of the service. Call serve_forever() on the result to start it.
+    :param host:
+    :param port: Port to listen on, 0 picks a free port.
+    :param service: DispatchService instance, defaults to a new one.
+    :param close_connections: Close stale database connections around every job.
+    :return:
+    """
+    handler = type('DispatchServiceRequestHandler', (DispatchServiceRequestHandler,), {
+        'service': service or DispatchService(),
+        'close_connections': close_connections,
+    })
+
+    return HTTPServer((host, port), handler)
+
+
+def submit_dispatch_job(dispatch_model, user=None, url=None, timeout=None, fallback=True, **options):
+    """
+    Forwards a dispatch job to the optimization service.
+    :param dispatch_model: ThermalPlantDispatch instance or pk.
+    :param user: User the run is stored for, defaults to the owner of the dispatch setup.
+    :param url: Service url, defaults to settings.DISPATCH_SERVICE_URL. If no url is set, the job runs in-process.
+    :param timeout: Seconds to wait for the service.
+    :param fallback: Run the job in-process if the service can not be reached.
+    :param options: start, end, number_of_batches, overlap, relaxation, screening, presolve, window_length and
+    return_result.
+    :return: Response of DispatchService.dispatch
+    """
+    job = dict(options)
+    job['dispatch_model'] = getattr(dispatch_model, 'pk', dispatch_model)
+    job['user'] = getattr(user, 'pk', user)
+
+    if url is None:
+        url = getattr(settings, 'DISPATCH_SERVICE_URL', None)
+
+    if url is None:
+        return get_local_service().dispatch(job)
+
+    request = urllib.request.Request(url.rstrip('/') + '/dispatch',
+                                     data=json.dumps(job).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read().decode('utf-8'))['error']
+        except (ValueError, KeyError):
+            message = str(e)
+
+        raise DispatchServiceError(message, status=e.code)
+
+    except urllib.error.URLError:
+        if not fallback:
+            raise
+
+        return get_local_service().dispatch(job)
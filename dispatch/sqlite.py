@@ -0,0 +1,126 @@
+"""
+SQLite tuning for concurrent web requests, uploads and solver workers.
+
+Every new SQLite connection is configured with the PRAGMAs of DISPATCH_SQLITE_PRAGMAS (merged over DEFAULT_PRAGMAS):
+WAL journal mode lets readers continue while one process writes, the busy timeout makes writers wait for the lock
+instead of failing with "database is locked", synchronous=NORMAL is safe with WAL (only the last transactions may be
+lost on power failure, the database is never corrupted) and larger page cache and mmap sizes keep reads of time series
+and results in memory. The hook is connected in DispatchConfig.ready().
+
+Workers write through BatchedWriter: instances are bulk inserted in short transactions and a write that still finds the
+database locked is retried.
+"""
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+
+DEFAULT_PRAGMAS = OrderedDict([
+    ('journal_mode', 'WAL'),
+    ('busy_timeout', 20000),  # milliseconds
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -64000),  # negative values are KiB: 64 MB
+    ('mmap_size', 256 * 1024 ** 2),
+])
+
+
+def get_pragmas():
+    """
+    :return: Ordered dictionary of the PRAGMAs set on new connections, a value of None leaves the SQLite default.
+    """
+    pragmas = OrderedDict(DEFAULT_PRAGMAS)
+    pragmas.update(getattr(settings, 'DISPATCH_SQLITE_PRAGMAS', None) or {})
+
+    return OrderedDict((name, value) for name, value in pragmas.items() if value is not None)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Receiver of the connection_created signal, sets the PRAGMAs on SQLite connections.
+    :param sender:
+    :param connection: Database wrapper of the new connection.
+    :return:
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in get_pragmas().items():
+            cursor.execute('PRAGMA {name} = {value}'.format(name=name, value=value))
+
+
+def is_locked_error(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+class BatchedWriter:
+    """
+    Collects new model instances and bulk inserts them in batches of batch_size, each batch in its own short
+    transaction. Batches are inserted in the order the models were first added (add parents before children). A batch
+    that fails because the database is locked is retried up to retries times with exponential backoff; inside an outer
+    transaction the error is raised instead, as only the whole transaction can be retried.
+
+    Usage:
+        with BatchedWriter(batch_size=100) as writer:
+            for chunk in chunks:
+                writer.add(chunk)
+    """
+
+    def __init__(self, batch_size=500, retries=5, retry_wait=0.05, using='default'):
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_wait = retry_wait
+        self.using = using
+        self._pending = OrderedDict()
+        self.written = 0
+        self.batches = 0
+        self.lock_retries = 0
+
+    def add(self, instance):
+        """
+        Adds an unsaved instance, the pending instances are written when batch_size is reached.
+        :param instance: Model instance
+        :return:
+        """
+        self._pending.setdefault(type(instance), []).append(instance)
+
+        if sum(len(instances) for instances in self._pending.values()) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all pending instances.
+        :return:
+        """
+        while self._pending:
+            model, instances = next(iter(self._pending.items()))
+
+            for begin in range(0, len(instances), self.batch_size):
+                self._write(model, instances[begin:begin + self.batch_size])
+
+            del self._pending[model]
+
+    def _write(self, model, instances):
+        for attempt in range(self.retries + 1):
+            try:
+                with transaction.atomic(using=self.using):
+                    model._default_manager.db_manager(self.using).bulk_create(instances)
+                break
+
+            except OperationalError as e:
+                if not is_locked_error(e) or attempt == self.retries or connections[self.using].in_atomic_block:
+                    raise
+
+                self.lock_retries += 1
+                time.sleep(self.retry_wait * 2 ** attempt)
+
+        self.written += len(instances)
+        self.batches += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
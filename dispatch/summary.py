@@ -0,0 +1,144 @@
+"""
+Summary statistics and downsampled pyramid of time series.
+
+Both are computed when the values of a time series are saved, so overview plots, listings and screening can use them
+without decoding the series. The pyramid holds the min, max and mean of every hour, day and week (datetime indices;
+hours and days are skipped if they do not reduce the data). For integer indices the positions are taken as hours, the
+levels are days (24 values) and weeks (168 values).
+
+Every level is encoded separately as one array [min, max, mean] (see fields.encode_array) and the encoded levels are
+concatenated into one payload. The layout (level, first label, step of the labels, length, offset and size in bytes of
+the level in the payload) is part of the summary, so a coarse level can be read without the finer ones (e.g. with
+SUBSTR, see TimeSeries.overview).
+"""
+import numpy as np
+import pandas as pd
+
+from .fields import encode_array, decode_array
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+HOUR = 3600 * 10 ** 9
+
+# level name, bucket size in nanoseconds and alignment (weeks start on Monday, 1970-01-05)
+PYRAMID_LEVELS = (
+    ('hour', HOUR, 0),
+    ('day', 24 * HOUR, 0),
+    ('week', 7 * 24 * HOUR, 4 * 24 * HOUR),
+)
+
+
+def compute_summary(values):
+    """
+    :param values: Array of values
+    :return: Dictionary with count, nan_count, min, max, mean, std and the percentiles (p1, p5, ...).
+    """
+    values = np.asarray(values, dtype=float)
+    finite = values[~np.isnan(values)]
+
+    summary = {'count': len(values), 'nan_count': int(len(values) - len(finite))}
+
+    if len(finite) == 0:
+        return summary
+
+    summary.update({'min': float(finite.min()),
+                    'max': float(finite.max()),
+                    'mean': float(finite.mean()),
+                    'std': float(finite.std())})
+
+    for percentile, value in zip(PERCENTILES, np.percentile(finite, PERCENTILES)):
+        summary['p{percentile}'.format(percentile=percentile)] = float(value)
+
+    return summary
+
+
+def compute_pyramid(values, index):
+    """
+    :param values: Array of values
+    :param index: pandas Index of the values (DatetimeIndex or integer index)
+    :return: Tuple (layout, payload bytes)
+    """
+    values = np.asarray(values, dtype=float)
+
+    layout = []
+    levels = []
+    offset = 0
+
+    if len(values) == 0:
+        return layout, b''
+
+    is_datetime = isinstance(index, pd.DatetimeIndex)
+
+    for level, size, alignment in PYRAMID_LEVELS:
+        if is_datetime:
+            buckets = (index.asi8 - alignment) // size
+            label_start, label_step = int(buckets[0] * size + alignment), size
+
+        else:
+            points = size // HOUR
+            if points == 1:
+                continue
+
+            positions = np.asarray(index, dtype=np.int64)
+            buckets = positions // points
+            label_start, label_step = int(buckets[0] * points), points
+
+        buckets = buckets - buckets[0]
+        length = int(buckets[-1]) + 1
+
+        if length >= len(values):
+            # no reduction compared to the data itself
+            continue
+
+        statistics = pd.Series(values).groupby(buckets).agg(['min', 'max', 'mean']).reindex(np.arange(length))
+
+        encoded = encode_array(statistics.to_numpy().T.ravel())
+
+        levels.append(encoded)
+        layout.append({'level': level, 'start': label_start, 'step': label_step, 'length': length,
+                       'offset': offset, 'size': len(encoded), 'datetime': is_datetime})
+        offset += len(encoded)
+
+    return layout, b''.join(levels)
+
+
+def find_level(layout, level):
+    """
+    :param layout: Layout returned by compute_pyramid.
+    :param level: 'hour', 'day' or 'week'
+    :return: Entry of the level in the layout.
+    """
+    for entry in layout:
+        if entry['level'] == level:
+            return entry
+
+    raise KeyError('The pyramid has no level {level}'.format(level=level))
+
+
+def pyramid_level(layout, pyramid, level):
+    """
+    One level of the pyramid.
+    :param layout: Layout returned by compute_pyramid.
+    :param pyramid: Payload returned by compute_pyramid.
+    :param level: 'hour', 'day' or 'week'
+    :return: DataFrame with the columns min, max and mean indexed by the start of the buckets.
+    """
+    entry = find_level(layout, level)
+
+    return level_to_dataframe(entry, memoryview(pyramid)[entry['offset']:entry['offset'] + entry['size']])
+
+
+def level_to_dataframe(entry, data):
+    """
+    :param entry: Entry of the level in the layout (see find_level).
+    :param data: Encoded values of the level.
+    :return: DataFrame with the columns min, max and mean indexed by the start of the buckets.
+    """
+    length = entry['length']
+    statistics = decode_array(data).reshape(3, length)
+
+    labels = entry['start'] + entry['step'] * np.arange(length)
+    if entry['datetime']:
+        labels = pd.to_datetime(labels, utc=True)
+
+    return pd.DataFrame({'min': statistics[0], 'max': statistics[1], 'mean': statistics[2]}, index=labels)
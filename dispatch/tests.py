@@ -1,15 +1,44 @@
 import datetime
+import importlib
+import io
+import os
+import unittest
+import zlib
+import tempfile
+import threading
 import numpy as np
 import pandas as pd
+from unittest import mock
 
-from django.test import TestCase
+from django.apps import apps
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction, OperationalError
+from django.db.models import QuerySet
 
 from .models import TimeSeries, TimeSeriesIndex, ThermalPlant, CompressedJSONModel, ThermalPlantDispatch, create_thermal_plant_dispatch_model
+from .models import create_thermal_plant_dispatch_models
+from .models import ThermalPlantOptimizationRun, ThermalPlantOptimizationResult, run_thermal_plant_optimization
+from .models import ArrayFile, TimeSeriesBlob, CSVFileUpload, align, read_time_series
+from .models import remove_files_on_error
+from .parquet import PARQUET_AVAILABLE, export_time_series, export_run_result, write_frame, read_frame, read_metadata
+from .parquet import read_columns
+from .service import DispatchService, DispatchServiceError, make_server, submit_dispatch_job
+from .cache import ArrayCache, get_array_cache
+from .sqlite import BatchedWriter, get_pragmas
+from .fields import encode_array, decode_array, read_array_header, compress_serialize, ARRAY_FILTER_SAMPLE
 from .utils import to_dict
-from .dispatch_models.thermal_plant_v0 import ThermalPlantDispatchOptimizationModel
+from .time_index import encode_segments, decode_segments, locate
+from .resample import resample
+from .summary import compute_pyramid, find_level, level_to_dataframe, pyramid_level
+from .dispatch_models.thermal_plant_v0 import ThermalPlantDispatchOptimizationModel, OptimizationError
+from .dispatch_models.presolve import presolve_commitment
+from .dispatch_models.tuning import tune_window_length
+from .dispatch_models.solver_log import parse_cbc_log
 
 def create_dummy_time_series_data(length, price_avg=55, fuel_price_avg=24):
     index = [item for item in range(length)]
@@ -65,6 +94,92 @@ class ThermalPlantDispatchOptimizationModelTests(TestCase):
 
         print(result)
 
+    def test_relaxation_bound(self):
+        """
+        The LP relaxation of every window is an upper bound of the profit of the window.
+        :return:
+        """
+        index, wholesale_price, clear_fuel_price = create_dummy_time_series_data(60, price_avg=60, fuel_price_avg=25)
+
+        df = pd.DataFrame({'index': index, 'wholesale_price': wholesale_price, 'clean_fuel_price': clear_fuel_price})
+        df.set_index('index', inplace=True)
+
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+
+        opt_model = ThermalPlantDispatchOptimizationModel(plant_definition, df)
+
+        result = opt_model.optimize(number_of_batches=3, overlap=0.25, relaxation=True)
+        windows = opt_model.windows()
+
+        self.assertEqual(len(result), 60)
+        self.assertEqual(len(windows), 3)
+        self.assertEqual([window['start'] for window in windows], [0, 20, 40])
+        for window in windows:
+            self.assertGreaterEqual(window['lp_bound'], window['objective'] - 1e-6)
+
+        # screened windows are not linked to the previous window, so their bounds are at least as high
+        screened = opt_model.screen(number_of_batches=3, overlap=0.25)
+        self.assertAlmostEqual(windows[0]['lp_bound'], screened[0]['lp_bound'], places=4)
+        for window, screened_window in zip(windows, screened):
+            self.assertGreaterEqual(screened_window['lp_bound'], window['lp_bound'] - 1e-6)
+
+    def test_boundary_condition(self):
+        """
+        Windows start from the last state of the previous window, the initial condition only applies at index 0.
+        :return:
+        """
+        df = pd.DataFrame({'wholesale_price': np.full(96, 200.0), 'clean_fuel_price': np.full(96, 10.0)},
+                          index=pd.RangeIndex(96, name='index'))
+
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+
+        result = ThermalPlantDispatchOptimizationModel(plant_definition, df).optimize()
+
+        opt_model = ThermalPlantDispatchOptimizationModel(plant_definition, df)
+        batch_result = opt_model.optimize(number_of_batches=4)
+
+        self.assertEqual(batch_result['production'].iloc[0], 42.0)
+        self.assertTrue((batch_result['production'].iloc[24:] > 42.0).all())
+        self.assertTrue((batch_result['powerProdRMP'].diff().abs().iloc[1:]
+                         <= plant_definition['ramping_rate_RMP_MW'] + 1e-6).all())
+
+        profit = (result['Revenues'] - result['Costs']).sum()
+        self.assertAlmostEqual((batch_result['Revenues'] - batch_result['Costs']).sum(), profit, places=2)
+
+    def test_infeasible_window(self):
+        df = pd.DataFrame({'wholesale_price': np.full(24, 50.0), 'clean_fuel_price': np.full(24, 10.0)},
+                          index=pd.RangeIndex(24, name='index'))
+
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+        plant_definition['MIN'] = 50  # the initial production of 42 MW is below the minimum
+
+        with self.assertRaises(OptimizationError):
+            ThermalPlantDispatchOptimizationModel(plant_definition, df).optimize()
+
+    def test_tune_window_length(self):
+        index, wholesale_price, clear_fuel_price = create_dummy_time_series_data(96)
+
+        df = pd.DataFrame({'index': index, 'wholesale_price': wholesale_price, 'clean_fuel_price': clear_fuel_price})
+        df.set_index('index', inplace=True)
+
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+
+        opt_model = ThermalPlantDispatchOptimizationModel(plant_definition, df)
+
+        tuning = tune_window_length(opt_model, window_lengths=(24, 48), overlaps=(0, 0.25), target_gap=0.05)
+
+        self.assertIn(tuning['window_length'], (24, 48))
+        self.assertEqual(len(tuning['candidates']), 4)
+        self.assertLessEqual(tuning['gap'], 0.05)
+
+        result = opt_model.optimize(number_of_batches='auto')
+        self.assertEqual(len(result), 96)
+        self.assertIsNotNone(opt_model.tuning())
+
     def test_ramping(self):
         index_0, wholesale_price_0, clean_fuel_price_0 = create_dummy_time_series_data(24, price_avg=55, fuel_price_avg=20)
         index_1, wholesale_price_1, clean_fuel_price_1 = create_dummy_time_series_data(24, price_avg=30, fuel_price_avg=20)
@@ -92,6 +207,110 @@ class ThermalPlantDispatchOptimizationModelTests(TestCase):
             print(value)
 
 
+def create_extreme_spread_time_series_data(seed, blocks=4, block_length=24):
+    """
+    Alternates blocks of very high and very low margins, so that the presolve can fix commitment binaries.
+    """
+    random = np.random.RandomState(seed)
+
+    wholesale_price = []
+    clean_fuel_price = []
+    for block in range(blocks):
+        if (block + seed) % 2:
+            wholesale_price.extend(150 + 30 * random.rand(block_length))
+            clean_fuel_price.extend(10 + 5 * random.rand(block_length))
+        else:
+            wholesale_price.extend(5 + 10 * random.rand(block_length))
+            clean_fuel_price.extend(40 + 5 * random.rand(block_length))
+
+    df = pd.DataFrame({'wholesale_price': wholesale_price, 'clean_fuel_price': clean_fuel_price})
+    df.index.name = 'index'
+
+    return df
+
+
+class PresolveTests(TestCase):
+    def test_presolve_fixes_binaries(self):
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+
+        df = create_extreme_spread_time_series_data(0)
+
+        fixed = presolve_commitment(plant_definition, df['wholesale_price'].values, df['clean_fuel_price'].values)
+
+        # the first time step is never fixed
+        self.assertTrue(np.isnan(fixed['ONF'][0]))
+        self.assertGreater(np.sum(fixed['ONF'] == 1), 0)
+        self.assertGreater(np.sum(fixed['ONF'] == 0), 0)
+
+    def test_presolve_benchmark(self):
+        """
+        The presolved model must have the same objective as the full model.
+        :return:
+        """
+        user = create_dummy_user()
+        plant_definitions = [create_thermal_plant(user).to_dict()]
+
+        # a plant that can not ramp down within one time step
+        plant = create_thermal_plant(user)
+        plant.ramping_rate_RMP = 0.5
+        plant.ramping_rate_NRM = 0.05
+        plant.save()
+        plant_definitions.append(plant.to_dict())
+
+        for plant_definition in plant_definitions:
+            for seed in range(3):
+                df = create_extreme_spread_time_series_data(seed)
+
+                full_model = ThermalPlantDispatchOptimizationModel(plant_definition, df)
+                full_model.optimize()
+
+                presolved_model = ThermalPlantDispatchOptimizationModel(plant_definition, df)
+                presolved_model.optimize(presolve=True)
+
+                full_objective = full_model.windows()[0]['objective']
+                presolved_objective = presolved_model.windows()[0]['objective']
+
+                self.assertGreater(presolved_model.windows()[0]['fixed_binaries'], 0)
+                self.assertAlmostEqual(full_objective, presolved_objective, delta=1e-6 * abs(full_objective))
+
+
+CBC_LOG = """Welcome to the CBC MILP Solver
+Presolve 174 (-41) rows, 222 (-29) columns and 480 (-83) elements
+Cgl0004I processed model has 170 rows, 218 columns (81 integer (81 of which binary)) and 470 elements
+Cbc0001I Search completed - best objective -230203.2316605831, took 12 iterations and 3 nodes (0.01 seconds)
+
+Result - Optimal solution found
+
+Objective value:                230203.23166058
+Enumerated nodes:               3
+Total iterations:               12
+Time (CPU seconds):             0.02
+Time (Wallclock seconds):       0.03
+"""
+
+
+class SolverLogTests(TestCase):
+    def test_parse_cbc_log(self):
+        statistics = parse_cbc_log(CBC_LOG)
+
+        self.assertEqual(statistics['presolve_rows'], 174)
+        self.assertEqual(statistics['presolve_columns'], 222)
+        self.assertEqual(statistics['presolve_elements'], 480)
+        self.assertEqual(statistics['nodes'], 3)
+        self.assertEqual(statistics['iterations'], 12)
+        self.assertAlmostEqual(statistics['objective'], 230203.23166058)
+        self.assertAlmostEqual(statistics['solve_seconds'], 0.03)
+        self.assertEqual(statistics['result'], 'Optimal solution found')
+        self.assertIsNone(statistics['gap'])
+
+    def test_parse_empty_log(self):
+        statistics = parse_cbc_log('')
+
+        self.assertIsNone(statistics['presolve_rows'])
+        self.assertIsNone(statistics['nodes'])
+
+
 class ThermalPlantDispatchTests(TestCase):
     def test_create_thermal_plant_dispatch_instance(self):
         # create dummy user
@@ -121,6 +340,424 @@ class ThermalPlantDispatchTests(TestCase):
 
         print(type(thermal_plant_dispatch_setup.clean_fuel_price))
 
+    def test_create_batch(self):
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+
+        index, wholesale_price, clean_fuel_price = create_dummy_time_series_data(24)
+        scenarios = [(index, np.asarray(wholesale_price) + shift, clean_fuel_price) for shift in range(3)]
+
+        setups = create_thermal_plant_dispatch_models(user, 0, plant_definition, scenarios)
+
+        self.assertEqual(len(setups), 3)
+        self.assertEqual(len({setup.plant_id for setup in setups}), 1)
+        self.assertEqual(len({setup.time_series_index_id for setup in setups}), 1)
+
+        # three wholesale prices and one shared clean fuel price
+        self.assertEqual(TimeSeriesBlob.objects.count(), 4)
+
+        for setup, (_, wholesale_price, clean_fuel_price) in zip(setups, scenarios):
+            setup = ThermalPlantDispatch.objects.get(pk=setup.pk)
+            np.testing.assert_array_equal(setup.time_series()['wholesale_price'], wholesale_price)
+            np.testing.assert_array_equal(setup.time_series()['clean_fuel_price'], clean_fuel_price)
+            self.assertEqual(setup.wholesale_price.summary['count'], 24)
+
+    def test_create_edit(self):
+        user = create_dummy_user()
+        setup = create_dummy_dispatch_setup(user)
+
+        index, wholesale_price, clean_fuel_price = create_dummy_time_series_data(24)
+        edited = create_thermal_plant_dispatch_model(user, 1, setup.plant.to_dict(), index, wholesale_price,
+                                                     clean_fuel_price, pk=setup.pk)
+
+        self.assertEqual(edited.pk, setup.pk)
+        self.assertEqual(ThermalPlantDispatch.objects.count(), 1)
+        self.assertEqual(len(ThermalPlantDispatch.objects.get(pk=setup.pk).time_series()), 24)
+
+        # the replaced prices are deleted (their blobs on commit, see TimeSeriesBlobCollectionTests)
+        self.assertEqual(set(TimeSeries.objects.values_list('pk', flat=True)),
+                         {edited.wholesale_price_id, edited.clean_fuel_price_id})
+
+        # setups of other users and unknown setups can not be edited
+        other_user = User.objects.create_user(username='Other', password='123456')
+        for user_, pk in ((other_user, setup.pk), (user, setup.pk + 100)):
+            with self.assertRaises(ThermalPlantDispatch.DoesNotExist):
+                create_thermal_plant_dispatch_model(user_, 1, setup.plant.to_dict(), index, wholesale_price,
+                                                    clean_fuel_price, pk=pk)
+
+        self.assertEqual(ThermalPlantDispatch.objects.get().user, user)
+        self.assertEqual(TimeSeries.objects.count(), 2)
+
+    def test_create_atomic(self):
+        user = create_dummy_user()
+        plant_definition = create_thermal_plant(user).to_dict()
+        index, wholesale_price, clean_fuel_price = create_dummy_time_series_data(24)
+
+        with mock.patch.object(ThermalPlantDispatch, 'save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                create_thermal_plant_dispatch_model(user, 0, plant_definition, index, wholesale_price,
+                                                    clean_fuel_price)
+
+        self.assertFalse(TimeSeries.objects.exists())
+        self.assertFalse(TimeSeriesBlob.objects.exists())
+        self.assertEqual(ThermalPlant.objects.count(), 1)
+
+
+def create_dummy_dispatch_setup(user, length=48):
+    index, wholesale_price, clean_fuel_price = create_dummy_time_series_data(length, price_avg=100, fuel_price_avg=10)
+    plant_definition = create_thermal_plant(user).to_dict()
+
+    return create_thermal_plant_dispatch_model(user, 0, plant_definition, index, wholesale_price, clean_fuel_price)
+
+
+class ThermalPlantDispatchLoaderTests(TestCase):
+    def test_load_time_series(self):
+        user = create_dummy_user()
+        setups = [create_dummy_dispatch_setup(user) for _ in range(3)]
+
+        # one query for the setups and their time series, one for the chunks of the values
+        with self.assertNumQueries(2):
+            frames = ThermalPlantDispatch.objects.filter(user=user).load_time_series(start=10, end=20)
+
+        self.assertEqual(set(frames), {setup.pk for setup in setups})
+        for setup in setups:
+            self.assertTrue(frames[setup.pk].equals(setup.time_series(10, 20)))
+
+        wide = ThermalPlantDispatch.objects.filter(user=user).load_time_series(wide=True)
+        self.assertEqual(wide.shape, (48, 6))
+        self.assertTrue(wide[setups[0].pk]['wholesale_price'].equals(setups[0].time_series()['wholesale_price']))
+
+
+class DispatchServiceTests(TestCase):
+    def test_local_dispatch(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        response = submit_dispatch_job(dispatch_setup, url=None)
+
+        run = ThermalPlantOptimizationRun.objects.get(pk=response['run'])
+        self.assertEqual(run.dispatch_model, dispatch_setup)
+        self.assertEqual(len(run.load_result()), 48)
+
+    def test_dispatch_over_http(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        server = make_server(port=0, service=DispatchService(), close_connections=False)
+
+        # share the connection of the test case (in-memory database, open transaction) with the server thread
+        test_connection = connections['default']
+        test_connection.inc_thread_sharing()
+
+        def serve():
+            connections['default'] = test_connection
+            server.serve_forever()
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+
+        try:
+            url = 'http://{host}:{port}'.format(host=server.server_address[0], port=server.server_address[1])
+            response = submit_dispatch_job(dispatch_setup.pk, url=url, fallback=False, number_of_batches=2,
+                                           return_result=True)
+
+            with self.assertRaises(DispatchServiceError) as error:
+                submit_dispatch_job(dispatch_setup.pk, url=url, fallback=False, window_length=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+            test_connection.dec_thread_sharing()
+
+        self.assertTrue(ThermalPlantOptimizationRun.objects.filter(pk=response['run']).exists())
+        self.assertIn('production', response['result']['columns'])
+        self.assertEqual(error.exception.status, 400)
+
+    def test_optimize_view(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+        url = reverse('dispatch:optimize-thermal-plant-dispatch', args=[dispatch_setup.pk])
+
+        self.client.force_login(user)
+
+        self.assertEqual(self.client.get(url, {'number_of_batches': 2}).status_code, 405)
+        self.assertFalse(ThermalPlantOptimizationRun.objects.exists())
+
+        for options in ({'start': 'a'}, {'overlap': '1,5'}, {'number_of_batches': 0}, {'window_length': -4}):
+            response = self.client.post(url, options)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(options)), response.json()['error'])
+
+        # options that parse but do not describe valid windows of the 48 data points
+        for options in ({'window_length': 5}, {'start': 30, 'end': 20}, {'start': -5}, {'end': 49},
+                        {'number_of_batches': 1000}, {'overlap': 'nan'}, {'overlap': 1}):
+            response = self.client.post(url, options)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+
+        self.assertFalse(ThermalPlantOptimizationRun.objects.exists())
+
+        response = self.client.post(url, {'end': 36, 'number_of_batches': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ThermalPlantOptimizationRun.objects.get(pk=response.json()['run']).load_result()), 36)
+
+
+class ThermalPlantOptimizationRunTests(TestCase):
+    def test_run_with_relaxation(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, number_of_batches=2, relaxation=True)
+
+        self.assertEqual(run.windows.count(), 2)
+        self.assertGreaterEqual(run.lp_bound, run.objective - 1e-6)
+        self.assertGreaterEqual(run.integrality_gap, -1e-6)
+
+    def test_run_range(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user, length=96)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, start=24, end=72, number_of_batches=2)
+
+        self.assertEqual(len(result), 48)
+        self.assertEqual(result.index[0], 24)
+        self.assertEqual([(window.start, window.end) for window in run.windows.all()], [(24, 48), (48, 72)])
+
+    def test_columnar_result(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user, length=96)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, start=10, number_of_batches=2)
+        run.store_result(result, chunk_length=20)
+
+        self.assertEqual(run.result_chunks.count(), 5)
+
+        stored = ThermalPlantOptimizationRun.objects.get(pk=run.pk).load_result()
+        self.assertEqual(list(stored.index), list(result.index))
+        self.assertTrue(np.allclose(stored[result.columns].values.astype(float), result.values.astype(float),
+                                    equal_nan=True))
+        self.assertEqual(stored['ONF'].dtype, bool)
+
+        # only the chunks of the range are loaded, in one query
+        with self.assertNumQueries(1):
+            part = run.load_result(['production', 'Revenues'], start=25, end=45)
+
+        self.assertEqual(list(part.columns), ['production', 'Revenues'])
+        self.assertEqual(list(part.index), list(result.index[25:45]))
+        self.assertTrue(np.allclose(part['Revenues'], result['Revenues'].iloc[25:45]))
+
+    def test_solver_statistics(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, number_of_batches=2)
+
+        statistics = run.solver_statistics()
+
+        self.assertEqual(len(statistics), 2)
+        self.assertTrue((statistics['termination_condition'] == 'optimal').all())
+        self.assertTrue(statistics['nodes'].notnull().all())
+        self.assertTrue(statistics['presolve_rows'].notnull().all())
+        self.assertIn('Objective value', run.windows.first().solver_log)
+
+    def test_reuse_tuned_window_length(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        tuned_run, result = run_thermal_plant_optimization(user, dispatch_setup, number_of_batches='auto')
+
+        self.assertTrue(tuned_run.tuned)
+        self.assertIsNotNone(tuned_run.window_length)
+
+        # another setup with a plant of the same parameters reuses the window length
+        other_dispatch_setup = create_dummy_dispatch_setup(user)
+        self.assertEqual(ThermalPlantOptimizationRun.objects.tuned_for(other_dispatch_setup.plant).first(), tuned_run)
+
+        run, result = run_thermal_plant_optimization(user, other_dispatch_setup, number_of_batches='auto')
+
+        self.assertTrue(run.tuned)
+        self.assertEqual(run.window_length, tuned_run.window_length)
+        self.assertEqual(run.overlap, tuned_run.overlap)
+
+    def test_convert_legacy_results(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, start=5, number_of_batches=2)
+
+        # a run stored with one row per time step
+        run.result_chunks.all().delete()
+        ThermalPlantOptimizationResult.objects.bulk_create([
+            ThermalPlantOptimizationResult(run=run, production=row.production, consumption=row.consumption,
+                                           ramping_BSE=row.powerProdBSE, power_price=row.power_price,
+                                           fuel_price=row.fuel_price)
+            for row in result.itertuples()])
+
+        migration = importlib.import_module('dispatch.migrations.0033_convert_legacy_results')
+        migration.convert_legacy_results(apps, None)
+
+        self.assertFalse(ThermalPlantOptimizationResult.objects.exists())
+
+        columns = ['production', 'consumption', 'powerProdBSE', 'power_price', 'fuel_price']
+        pd.testing.assert_frame_equal(run.load_result(), result[columns].astype(float))
+        pd.testing.assert_frame_equal(run.result_reader()[['production']][10:20].to_dataframe(),
+                                      result[['production']].iloc[10:20].astype(float))
+
+    def test_failed_run(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        with mock.patch.object(ThermalPlantDispatchOptimizationModel, 'optimize', side_effect=OptimizationError):
+            with self.assertRaises(OptimizationError):
+                run_thermal_plant_optimization(user, dispatch_setup, number_of_batches=2)
+
+        with self.assertRaises(ValueError):
+            run_thermal_plant_optimization(user, dispatch_setup, start=40, end=60)
+
+        self.assertFalse(ThermalPlantOptimizationRun.objects.exists())
+
+    def test_window_length(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        # the requested length is stored, not the length of the first window (cut by a shorter range)
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, window_length=20, overlap=0.5)
+        self.assertEqual(run.window_length, 20)
+        self.assertEqual(run.windows.get(number=0).length, 30)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, window_length=200)
+        self.assertEqual(run.window_length, 200)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, number_of_batches=2)
+        self.assertIsNone(run.window_length)
+
+    def test_screening(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, number_of_batches=2, screening=True)
+
+        self.assertIsNone(result)
+        self.assertTrue(run.screening)
+        self.assertIsNotNone(run.lp_bound)
+        self.assertFalse(run.result_chunks.exists())
+
+
+class SQLiteTests(TransactionTestCase):
+    def test_pragmas(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+        with override_settings(DISPATCH_SQLITE_PRAGMAS={'busy_timeout': 100, 'mmap_size': None}):
+            pragmas = get_pragmas()
+
+        self.assertEqual(pragmas['busy_timeout'], 100)
+        self.assertNotIn('mmap_size', pragmas)
+        self.assertEqual(list(pragmas)[0], 'journal_mode')
+
+    def test_batched_writer(self):
+        with BatchedWriter(batch_size=2) as writer:
+            for value in range(5):
+                writer.add(CompressedJSONModel(value=[value]))
+
+        self.assertEqual(writer.written, 5)
+        self.assertEqual(writer.batches, 3)
+        self.assertEqual(sorted(model.value for model in CompressedJSONModel.objects.all()), [[0], [1], [2], [3], [4]])
+
+    def test_batched_writer_retry(self):
+        writer = BatchedWriter(retry_wait=0)
+        writer.add(CompressedJSONModel(value=[]))
+
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=[OperationalError('database is locked'), []]):
+            writer.flush()
+
+        self.assertEqual(writer.lock_retries, 1)
+        self.assertEqual(writer.written, 1)
+
+        # other errors are not retried
+        writer.add(CompressedJSONModel(value=[]))
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=OperationalError('no such table')):
+            with self.assertRaises(OperationalError):
+                writer.flush()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ResultReaderTests(TestCase):
+    def setUp(self):
+        self.user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(self.user, length=96)
+
+        self.run, result = run_thermal_plant_optimization(self.user, dispatch_setup, start=10, number_of_batches=2)
+        self.run.store_result(result, chunk_length=20)
+        self.result = self.run.load_result()
+
+    def test_select_and_slice(self):
+        reader = self.run.result_reader()
+
+        self.assertEqual(reader.columns, list(self.result.columns))
+        self.assertEqual(len(reader), len(self.result))
+        self.assertTrue(reader.index.equals(self.result.index))
+
+        # one query for the layout, one for the bytes of the two columns of the overlapping chunks
+        with self.assertNumQueries(2):
+            part = self.run.result_reader()[['production', 'Revenues']][25:45].to_dataframe()
+
+        pd.testing.assert_frame_equal(part, self.result[['production', 'Revenues']].iloc[25:45])
+
+        labels = self.result.index
+        pd.testing.assert_frame_equal(reader['ONF'].between(labels[3], labels[30]).to_dataframe(),
+                                      self.result[['ONF']].iloc[3:31])
+
+        with self.assertRaises(KeyError):
+            reader['unknown'].to_dataframe()
+
+    def test_downsample(self):
+        reader = self.run.result_reader(['production', 'ONF'])[5:]
+        full = self.result[['production', 'ONF']].iloc[5:].astype(float)
+        buckets = np.arange(len(full)) // 7
+
+        for how in ('mean', 'min', 'max', 'first'):
+            downsampled = reader.downsample(step=7, how=how).to_dataframe()
+
+            expected = getattr(full.groupby(buckets), how)()
+            self.assertEqual(len(downsampled), len(expected))
+            self.assertTrue(downsampled.index.equals(full.index[::7]))
+            self.assertTrue(np.allclose(downsampled.values.astype(float), expected.values))
+
+        self.assertLessEqual(len(reader.downsample(max_points=10)), 10)
+
+        pd.testing.assert_frame_equal(reader.downsample().to_dataframe(), reader.to_dataframe())
+
+        for options in ({'max_points': 0}, {'step': 0}, {'step': -2}):
+            with self.assertRaises(ValueError):
+                reader.downsample(**options)
+
+    def test_result_file(self):
+        self.run.result_chunks.all().delete()
+        self.run.store_result_file(self.result.astype(float))
+
+        reader = self.run.result_reader()
+        self.assertEqual(reader.layout['source'], 'file')
+        pd.testing.assert_frame_equal(reader[['production']][10:50].to_dataframe(),
+                                      self.result[['production']].iloc[10:50])
+
+    def test_view(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('dispatch:thermal-plant-optimization-run-result', args=[self.run.pk]),
+                                   {'columns': 'production,ONF', 'points': 10})
+
+        data = response.json()
+        self.assertEqual(set(data['columns']), {'production', 'ONF'})
+        self.assertLessEqual(len(data['index']), 10)
+
+        url = reverse('dispatch:thermal-plant-optimization-run-result', args=[self.run.pk])
+        for parameters in ({'start': 'x'}, {'end': '1.5'}, {'points': 0}, {'points': 'all'}, {'how': 'median'},
+                           {'columns': 'unknown'}):
+            self.assertEqual(self.client.get(url, parameters).status_code, 400)
+
 
 class CompressedJSONModelTests(TestCase):
     def test_create_field(self):
@@ -136,6 +773,165 @@ class CompressedJSONModelTests(TestCase):
         self.assertEqual(value, retrieved_instance.value)
 
 
+class CompressedArrayFieldTests(TestCase):
+    def test_encode_decode(self):
+        values = 55 + 7 * np.random.rand(1000)
+
+        for dtype in ('float64', 'float32'):
+            for codec in ('zlib', 'none'):
+                data = encode_array(values, dtype=dtype, codec=codec)
+
+                header = read_array_header(data)
+                self.assertEqual(header['length'], len(values))
+                self.assertEqual(header['codec'], codec)
+
+                decoded = decode_array(data)
+                self.assertEqual(decoded.dtype, np.dtype(dtype))
+                self.assertTrue(np.array_equal(decoded, values.astype(dtype)))
+
+    def test_precision_round_trip(self):
+        values = 20 + 100 * np.random.rand(1000)
+        values[[3, 500]] = np.nan
+        finite = ~np.isnan(values)
+
+        decoded = decode_array(encode_array(values, dtype='float32'))
+        self.assertTrue(np.all(np.abs(decoded[finite] - values[finite]) <= 2 ** -24 * np.abs(values[finite])))
+
+        for decimals in (0, 2, 4):
+            data = encode_array(values, dtype='int32', decimals=decimals, codec='none')
+            self.assertEqual(len(data), 16 + 4 * len(values))
+            self.assertEqual(read_array_header(data)['decimals'], decimals)
+
+            decoded = decode_array(data)
+            self.assertEqual(decoded.dtype, np.float64)
+            self.assertTrue(np.isnan(decoded[~finite]).all())
+            self.assertLessEqual(np.abs(decoded[finite] - values[finite]).max(), 0.5 * 10.0 ** -decimals + 1e-12)
+
+        with self.assertRaises(ValueError):
+            encode_array([1e6], dtype='int32', decimals=4)
+
+        binaries = np.random.randint(0, 2, 1001).astype(float)
+        binaries[0] = 1 - 1e-9  # as returned by the solver
+        data = encode_array(binaries, dtype='bool', codec='none')
+        self.assertEqual(len(data), 16 + 126)
+        self.assertEqual(decode_array(data).dtype, bool)
+        self.assertTrue(np.array_equal(decode_array(data), np.round(binaries)))
+
+        with self.assertRaises(ValueError):
+            encode_array([0, 0.5], dtype='bool')
+
+    def test_filters(self):
+        ramp = np.concatenate([np.zeros(500), np.linspace(0, 80, 17), np.full(700, 80.0), [np.nan, -0.0, np.inf]])
+        noise = 40 + np.random.randn(1000)
+
+        for values in (ramp, noise, np.zeros(0), np.array([2e9, -2e9, 2e9])):
+            for dtype in ('float64', 'float32', 'int32'):
+                if dtype == 'int32':
+                    values = np.where(np.isinf(values), np.nan, values)
+
+                expected = decode_array(encode_array(values, dtype=dtype, codec='none'))
+
+                for filters in (('delta',), ('rle',), ('delta', 'rle'), 'auto'):
+                    data = encode_array(values, dtype=dtype, filters=filters)
+                    decoded = decode_array(data)
+
+                    self.assertEqual(decoded.dtype, expected.dtype)
+                    self.assertEqual(expected.tobytes(), decoded.tobytes())
+
+        # constant stretches are stored once
+        self.assertLess(len(encode_array(ramp, codec='none', filters=('rle',))), len(ramp) * 8 / 20)
+        self.assertLess(len(encode_array(ramp, filters=('rle',))), len(encode_array(ramp)))
+        self.assertEqual(read_array_header(encode_array(ramp, filters=('delta', 'rle')))['filters'], ['delta', 'rle'])
+
+        # auto keeps the smallest encoding
+        for values in (ramp, noise):
+            self.assertEqual(len(encode_array(values, filters='auto')),
+                             min(len(encode_array(values, filters=filters)) for filters in
+                                 ((), ('delta',), ('rle',), ('delta', 'rle'))))
+
+    def test_filter_selection(self):
+        # long arrays: the filters are chosen on a sample, the whole array is compressed once
+        smooth = 50 + 30 * np.sin(np.arange(100000) / 500)
+        noise = 40 + np.random.randn(100000)
+
+        with mock.patch('dispatch.fields.zlib.compress', side_effect=zlib.compress) as compress:
+            data = encode_array(smooth, dtype='int32', decimals=2, filters='auto')
+
+        # the four candidates of the int32 sample, then the whole array
+        compressed = [len(call[0][0]) for call in compress.call_args_list]
+        self.assertEqual(len(compressed), 5)
+        self.assertEqual(compressed[:2], [ARRAY_FILTER_SAMPLE * 4] * 2)
+        self.assertLessEqual(max(compressed[2:4]), ARRAY_FILTER_SAMPLE * 8)
+        self.assertGreater(compressed[4], ARRAY_FILTER_SAMPLE * 8)
+        self.assertIn('delta', read_array_header(data)['filters'])
+        self.assertTrue(np.allclose(decode_array(data), smooth, atol=0.005))
+
+        self.assertEqual(read_array_header(encode_array(noise, filters='auto'))['filters'], [])
+        self.assertEqual(decode_array(encode_array(noise, filters='auto')).tobytes(), noise.tobytes())
+
+    def test_decode_legacy(self):
+        values = [float(item) for item in range(10)]
+
+        self.assertEqual(decode_array(compress_serialize(values)).tolist(), values)
+        self.assertEqual(len(decode_array(b'')), 0)
+
+    def test_time_series_data(self):
+        user = User.objects.create_user(username='Dummy', password='123456')
+        time_series_index = create_integer_time_series_index(0)
+        values = 55 + 7 * np.random.rand(100)
+
+        create_time_series('price', len(values), user, time_series_index, data=list(values))
+        create_time_series('legacy', 10, user, time_series_index, data=compress_serialize(list(range(10))))
+
+        self.assertTrue(np.array_equal(TimeSeries.objects.get(name='price').data, values))
+        self.assertEqual(TimeSeries.objects.get(name='legacy').data.tolist(), list(range(10)))
+        self.assertEqual(len(TimeSeries.objects.get(name='price').to_dataframe()), 100)
+
+        # legacy values are stored in the binary format
+        raw = TimeSeries.objects.values_list('data', flat=True).get(name='legacy').raw
+        self.assertIsNotNone(read_array_header(raw))
+
+    def test_encode_legacy_migration(self):
+        user = User.objects.create_user(username='Dummy', password='123456')
+        time_series = create_time_series('legacy', 10, user, create_integer_time_series_index(0))
+
+        # update() stores the legacy bytes as they are
+        TimeSeries.objects.filter(pk=time_series.pk).update(data=compress_serialize(list(range(10))))
+        self.assertIsNone(read_array_header(TimeSeries.objects.values_list('data', flat=True).get().raw))
+
+        migration = importlib.import_module('dispatch.migrations.0029_encode_legacy_time_series')
+        migration.encode_legacy_time_series(apps, None)
+
+        data = TimeSeries.objects.values_list('data', flat=True).get()
+        self.assertIsNotNone(read_array_header(data.raw))
+        self.assertEqual(data.tolist(), list(range(10)))
+
+    def test_lazy_decode(self):
+        user = User.objects.create_user(username='Dummy', password='123456')
+        time_series_index = create_integer_time_series_index(0)
+        values = 55 + 7 * np.random.rand(100)
+
+        create_time_series('price', len(values), user, time_series_index, data=list(values))
+        raw = TimeSeries.objects.values_list('data', flat=True).get().raw
+
+        # listing does not load the data
+        listed = TimeSeries.objects.for_listing().get()
+        self.assertIn('data', listed.get_deferred_fields())
+
+        # the data is decoded on first access only and saved without re-encoding
+        time_series = TimeSeries.objects.get()
+        self.assertFalse(time_series.data.decoded)
+        self.assertEqual(len(time_series.data), 100)
+        self.assertFalse(time_series.data.decoded)
+
+        time_series.name = 'renamed'
+        time_series.save()
+        self.assertEqual(TimeSeries.objects.values_list('data', flat=True).get().raw, raw)
+
+        self.assertTrue(np.array_equal(time_series.data, values))
+        self.assertTrue(time_series.data.decoded)
+
+
 # ThermalPlantTests
 def create_thermal_plant(user):
     d = {'user': user,
@@ -182,6 +978,64 @@ class ThermalPlantTests(TestCase):
 
         # todo: what to test here? that all fields are there? that they have certain values?
 
+    def test_fingerprint(self):
+        user = create_dummy_user()
+        plant = create_thermal_plant(user)
+
+        definition = plant.to_parameters()
+        self.assertEqual(len(plant.fingerprint), 64)
+        self.assertEqual(ThermalPlant.create_fingerprint(definition), plant.fingerprint)
+
+        # independent of the name, int vs. float and -0.0
+        definition.update(capacity=100.0, shutdown_costs=-0.0)
+        self.assertEqual(ThermalPlant.create_fingerprint(dict(definition, name='Other')), plant.fingerprint)
+
+        definition['efficiency'] = 0.51
+        self.assertNotEqual(ThermalPlant.create_fingerprint(definition), plant.fingerprint)
+
+        plant.efficiency = 0.51
+        plant.save()
+        self.assertEqual(plant.fingerprint, ThermalPlant.create_fingerprint(definition))
+
+    def test_reuse_plant(self):
+        user = create_dummy_user()
+        first = create_dummy_dispatch_setup(user)
+        second = create_dummy_dispatch_setup(user)
+
+        self.assertEqual(first.plant, second.plant)
+        self.assertEqual(ThermalPlantDispatch.objects.values('plant').distinct().count(), 1)
+
+        other_user = User.objects.create_user(username='Other', password='123456')
+        other = create_dummy_dispatch_setup(other_user)
+        self.assertNotEqual(other.plant, first.plant)
+
+        # the name and the shared flag of the definition are kept
+        definition = to_dict(first.plant)
+        for changes in ({'name': 'Renamed'}, {'shared': True}):
+            setup = create_thermal_plant_dispatch_model(user, 0, dict(definition, **changes), [0, 1], [1, 2], [3, 4])
+
+            self.assertNotEqual(setup.plant, first.plant)
+            self.assertEqual(setup.plant.fingerprint, first.plant.fingerprint)
+            for name, value in changes.items():
+                self.assertEqual(getattr(setup.plant, name), value)
+
+            again = create_thermal_plant_dispatch_model(user, 0, dict(definition, **changes), [0, 1], [1, 2], [3, 4])
+            self.assertEqual(again.plant, setup.plant)
+
+    def test_reusable_for(self):
+        user = create_dummy_user()
+        other_user = User.objects.create_user(username='Other', password='123456')
+        plant = create_thermal_plant(user)
+        other_plant = create_thermal_plant(other_user)
+
+        self.assertEqual(list(ThermalPlant.objects.reusable_for(user)), [plant])
+        self.assertEqual(list(ThermalPlant.objects.reusable_for(user, shared=True)), [plant])
+
+        other_plant.shared = True
+        other_plant.save()
+        self.assertEqual(list(ThermalPlant.objects.reusable_for(user, shared=True).order_by('pk')),
+                         [plant, other_plant])
+
 
 # Create your tests here.
 def create_dummy_user():
@@ -268,6 +1122,171 @@ class TimeSeriesIndexTests(TestCase):
         self.assertIs(all(index == created_index), True)
 
 
+    def test_create_if_not_exists(self):
+        index = create_datetime_index(10)
+
+        first = TimeSeriesIndex().create_if_not_exists(index)
+        second = TimeSeriesIndex().create_if_not_exists(index)
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(TimeSeriesIndex.objects.count(), 1)
+        self.assertTrue(first.key.startswith('datetime:'))
+
+        # a concurrent request created the same index between lookup and insert
+        with mock.patch.object(TimeSeriesIndex, 'does_exist', return_value=None):
+            third = TimeSeriesIndex().create_if_not_exists(index)
+
+        self.assertEqual(third.pk, first.pk)
+        self.assertEqual(TimeSeriesIndex.objects.count(), 1)
+
+
+    def test_index_pool(self):
+        start = datetime.datetime(1990, 1, 1, 0, tzinfo=datetime.timezone.utc)
+        interval = datetime.timedelta(minutes=15)
+
+        time_series_index = create_time_series_index(start, interval)
+        index = time_series_index.create_index(35040)
+
+        self.assertIsInstance(index, pd.DatetimeIndex)
+        self.assertEqual(str(index.tz), 'UTC')
+        self.assertEqual(index[-1], start + 35039 * interval)
+
+        # the same index object is shared by all lookups of the same definition and length
+        self.assertIs(TimeSeriesIndex.objects.get(pk=time_series_index.pk).create_index(35040), index)
+
+        integer_index = create_integer_time_series_index(5).create_index(10)
+        self.assertIsInstance(integer_index, pd.RangeIndex)
+        self.assertEqual(list(integer_index), list(range(5, 15)))
+
+    def test_segments(self):
+        values = np.array([0, 10, 20, 30, 60, 90, 91, 92])
+
+        segments = encode_segments(values)
+
+        self.assertEqual(segments, [[0, 10, 3], [30, 30, 2], [90, 1, 3]])
+        self.assertTrue(np.array_equal(decode_segments(segments), values))
+        self.assertEqual(locate(segments, 60), 4)
+        self.assertEqual(locate(segments, 91), 6)
+        self.assertIsNone(locate(segments, 15))
+        self.assertIsNone(locate(segments, 100))
+
+    def test_irregular_datetime_index(self):
+        # hourly data with a gap of one day
+        index = list(pd.date_range('2019-03-01', periods=48, freq='H', tz='UTC')) + \
+            list(pd.date_range('2019-03-04', periods=24, freq='H', tz='UTC'))
+
+        time_series_index = TimeSeriesIndex().create_if_not_exists(index)
+
+        self.assertEqual(time_series_index.index_type, 3)
+        self.assertEqual(len(time_series_index.segments), 3)
+
+        created_index = TimeSeriesIndex.objects.get(pk=time_series_index.pk).create_index(len(index))
+        self.assertTrue(created_index.equals(pd.DatetimeIndex(index)))
+        self.assertEqual(time_series_index.locate(index[50]), 50)
+        self.assertIsNone(time_series_index.locate(pd.Timestamp('2019-03-03', tz='UTC')))
+
+        # a regular index is one segment
+        self.assertEqual(TimeSeriesIndex().create_from_data(index[:48]).index_type, 2)
+
+    def test_invalid_index(self):
+        index = list(pd.date_range('2019-10-27', periods=4, freq='H', tz='UTC'))
+
+        # duplicated hour (e.g. local time at the end of DST)
+        with self.assertRaises(ValidationError):
+            TimeSeriesIndex().create_from_data(index[:2] + index[1:])
+
+        with self.assertRaises(ValidationError):
+            TimeSeriesIndex().create_from_data([0, 2, 4])
+
+    def test_single_datetime_index(self):
+        timestamp = pd.Timestamp('2019-03-01 12:00', tz='UTC')
+
+        time_series_index = TimeSeriesIndex().create_if_not_exists([timestamp])
+
+        self.assertEqual(time_series_index.index_type, 3)
+        self.assertIsNone(time_series_index.step())
+        self.assertTrue(time_series_index.create_index(1).equals(pd.DatetimeIndex([timestamp])))
+        self.assertEqual(time_series_index.locate(timestamp), 0)
+        self.assertEqual(TimeSeriesIndex().create_if_not_exists([timestamp]).pk, time_series_index.pk)
+
+        # indices saved as regular datetime indices without interval are converted
+        time_series_index.delete()
+        legacy = TimeSeriesIndex.objects.create(index_type=2, datetime_start=timestamp.to_pydatetime(),
+                                                datetime_interval=datetime.timedelta(0))
+
+        migration = importlib.import_module('dispatch.migrations.0032_single_datetime_indices')
+        migration.convert_single_datetime_indices(apps, None)
+
+        legacy = TimeSeriesIndex.objects.get(pk=legacy.pk)
+        self.assertEqual(legacy.index_type, 3)
+        self.assertEqual(legacy.key, TimeSeriesIndex().create_from_data([timestamp]).create_key())
+        self.assertTrue(legacy.create_index(1).equals(pd.DatetimeIndex([timestamp])))
+
+class TimeSeriesBlobCollectionTests(TransactionTestCase):
+    def tearDown(self):
+        # committed indices are memorized, the tables are flushed after every test
+        TimeSeriesIndex._memo.clear()
+
+    def test_collect(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = np.random.rand(300)
+
+        first = TimeSeries(user=user, name='price', index=integer_index, chunk_length=100)
+        first.write(values, storage=TimeSeries.STORAGE_SHARED)
+        second = TimeSeries(user=user, name='price', index=integer_index, chunk_length=100)
+        second.write(values, storage=TimeSeries.STORAGE_SHARED)
+        self.assertEqual(TimeSeriesBlob.objects.count(), 3)
+
+        # rewritten values: the blobs still used by the second series are kept
+        first.write(values + 1, storage=TimeSeries.STORAGE_SHARED)
+        self.assertEqual(TimeSeriesBlob.objects.count(), 6)
+
+        second.write(values + 1, storage=TimeSeries.STORAGE_SHARED)
+        self.assertEqual(TimeSeriesBlob.objects.count(), 3)
+
+        # nothing is deleted if the transaction rolls back
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                TimeSeries.objects.all().delete()
+                raise RuntimeError
+
+        self.assertEqual(TimeSeriesBlob.objects.count(), 3)
+
+        TimeSeries.objects.get(pk=first.pk).delete()
+        self.assertEqual(TimeSeriesBlob.objects.count(), 3)
+        TimeSeries.objects.all().delete()
+        self.assertFalse(TimeSeriesBlob.objects.exists())
+
+    def test_edit_setup(self):
+        user = create_dummy_user()
+        setup = create_dummy_dispatch_setup(user)
+        self.assertEqual(TimeSeriesBlob.objects.count(), 2)
+
+        index, wholesale_price, clean_fuel_price = create_dummy_time_series_data(24)
+        create_thermal_plant_dispatch_model(user, 1, setup.plant.to_dict(), index, np.asarray(wholesale_price) + 1,
+                                            np.asarray(clean_fuel_price) + 1, pk=setup.pk)
+
+        self.assertEqual(TimeSeriesBlob.objects.count(), 2)
+        self.assertFalse(TimeSeriesBlob.objects.unreferenced().exists())
+
+
+class TimeSeriesIndexMemoTests(TransactionTestCase):
+    def tearDown(self):
+        TimeSeriesIndex._memo.clear()
+
+    def test_memorized_lookup(self):
+        index = list(range(10, 20))
+
+        time_series_index = TimeSeriesIndex().create_if_not_exists(index)
+
+        # committed indices are resolved without a query
+        with self.assertNumQueries(0):
+            self.assertEqual(TimeSeriesIndex().create_if_not_exists(index).pk, time_series_index.pk)
+
+        time_series_index.delete()
+        self.assertIsNone(TimeSeriesIndex().does_exist(index))
+
 class TimeSeriesTests(TestCase):
     def test_create_time_series_index(self):
         """
@@ -309,3 +1328,521 @@ class TimeSeriesTests(TestCase):
         print(time_series.create_index())
         print(expected_result)
         self.assertIs(np.array_equal(time_series.create_index(), expected_result), True)
+
+    def test_shared_storage(self):
+        user = create_dummy_user()
+        first = create_dummy_dispatch_setup(user)
+        second = create_thermal_plant_dispatch_model(user, 0, first.plant.to_dict(),
+                                                     list(range(48)),
+                                                     first.wholesale_price.read(),
+                                                     first.clean_fuel_price.read())
+
+        # identical uploads reference the same blobs
+        self.assertEqual(TimeSeriesBlob.objects.count(), 2)
+        self.assertEqual(first.wholesale_price.chunks.get().blob, second.wholesale_price.chunks.get().blob)
+        self.assertEqual(first.wholesale_price.content_hash, second.wholesale_price.content_hash)
+        self.assertNotEqual(first.wholesale_price.content_hash, first.clean_fuel_price.content_hash)
+
+        time_series = TimeSeries.objects.get(pk=second.wholesale_price.pk)
+        self.assertTrue(np.array_equal(time_series.read(), first.wholesale_price.read()))
+
+        self.assertFalse(TimeSeriesBlob.objects.unreferenced().exists())
+        first.delete()
+        second.delete()
+        TimeSeries.objects.all().delete()
+        self.assertEqual(TimeSeriesBlob.objects.unreferenced().count(), 2)
+
+    def test_shared_chunks(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = np.random.rand(1000)
+
+        first = TimeSeries(user=user, name='price', index=integer_index, chunk_length=100)
+        first.write(values, storage=TimeSeries.STORAGE_SHARED)
+
+        # the second series differs in its last chunk only
+        changed = values.copy()
+        changed[950] += 1
+        second = TimeSeries(user=user, name='price', index=integer_index, chunk_length=100)
+        second.write(changed, storage=TimeSeries.STORAGE_SHARED)
+
+        self.assertEqual(TimeSeriesBlob.objects.count(), 11)
+        self.assertNotEqual(first.content_hash, second.content_hash)
+
+        # only the chunks of the range are loaded
+        second = TimeSeries.objects.get(pk=second.pk)
+        with self.assertNumQueries(1):
+            np.testing.assert_array_equal(second.read(130, 260), values[130:260])
+
+        np.testing.assert_array_equal(second.read(), changed)
+        np.testing.assert_array_equal(read_time_series([first, second], 940, 960)[1], changed[940:960])
+
+    def test_content_hash(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = [1.0, 2.0, 3.0]
+
+        assigned = create_time_series('price', 3, user, integer_index, data=values)
+        written = TimeSeries(user=user, name='price', index=integer_index)
+        written.write(values)
+
+        self.assertEqual(assigned.content_hash, written.content_hash)
+
+        legacy = create_time_series('legacy', 3, user, integer_index, data=compress_serialize(values))
+        self.assertEqual(legacy.content_hash, written.content_hash)
+
+    def test_precision(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = 20 + 100 * np.random.rand(10000)
+
+        for storage in (TimeSeries.STORAGE_INLINE, TimeSeries.STORAGE_CHUNKED, TimeSeries.STORAGE_SHARED):
+            time_series = TimeSeries(user=user, name='price', index=integer_index)
+            time_series.write(values, storage=storage, precision=TimeSeries.PRECISION_SCALED, decimals=2)
+
+            stored = TimeSeries.objects.get(pk=time_series.pk)
+            self.assertEqual(stored.precision, TimeSeries.PRECISION_SCALED)
+            self.assertLessEqual(np.abs(stored.read() - values).max(), 0.005 + 1e-12)
+            self.assertLessEqual(np.abs(stored.read(100, 200) - values[100:200]).max(), 0.005 + 1e-12)
+            self.assertEqual(stored.summary['count'], len(values))
+
+        commitment = TimeSeries(user=user, name='ONF', index=integer_index)
+        commitment.write(np.random.randint(0, 2, 100), precision=TimeSeries.PRECISION_BOOL)
+        self.assertEqual(TimeSeries.objects.get(pk=commitment.pk).read().dtype, bool)
+
+    def test_chunked_read(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = np.random.rand(1000)
+
+        time_series = TimeSeries(user=user, name='price', index=integer_index, chunk_length=64)
+        time_series.write(values)
+
+        self.assertEqual(time_series.storage, TimeSeries.STORAGE_CHUNKED)
+        self.assertEqual(time_series.chunks.count(), 16)
+
+        time_series = TimeSeries.objects.get(pk=time_series.pk)
+        self.assertTrue(np.array_equal(time_series.read(), values))
+        self.assertTrue(np.array_equal(time_series.read(100, 300), values[100:300]))
+        self.assertTrue(np.array_equal(time_series.read(-10), values[-10:]))
+        self.assertEqual(len(time_series.read(500, 500)), 0)
+
+        # only the chunks of the range are loaded in one query
+        with self.assertNumQueries(1):
+            time_series.read(130, 140)
+
+        df = time_series.to_dataframe(100, 300)
+        self.assertEqual(df.index[0], 100)
+        self.assertTrue(np.array_equal(df['price'].values, values[100:300]))
+
+        # rewriting a short series stores it inline again
+        time_series.write(values[:10])
+        self.assertEqual(time_series.storage, TimeSeries.STORAGE_INLINE)
+        self.assertFalse(time_series.chunks.exists())
+        self.assertTrue(np.array_equal(TimeSeries.objects.get(pk=time_series.pk).read(2, 5), values[2:5]))
+
+
+HOUR = 3600 * 10 ** 9
+
+
+class ResampleTests(TestCase):
+    def test_resample_values(self):
+        quarter_hours = np.arange(8) * HOUR // 4
+        values = np.arange(8, dtype=float)
+
+        labels, hourly = resample(values, quarter_hours, HOUR, 'mean')
+        self.assertEqual(labels.tolist(), [0, HOUR])
+        self.assertEqual(hourly.tolist(), [1.5, 5.5])
+
+        self.assertEqual(resample(values, quarter_hours, HOUR, 'first')[1].tolist(), [0, 4])
+        self.assertEqual(resample(values, quarter_hours, HOUR, 'ffill')[1].tolist(), [0, 4])
+
+        # upsampling repeats the values
+        labels, upsampled = resample([10, 20], [0, HOUR], HOUR // 4, 'mean')
+        self.assertEqual(len(labels), 8)
+        self.assertEqual(upsampled.tolist(), [10] * 4 + [20] * 4)
+        self.assertTrue(np.isnan(resample([10, 20], [0, HOUR], HOUR // 4, 'first')[1][1:4]).all())
+
+        # a value covers the interval up to the next index value
+        values, index_values = [1, 2, 3], np.array([0, 1, 4]) * HOUR
+        self.assertEqual(resample(values, index_values, HOUR, 'mean')[1][:5].tolist(), [1, 2, 2, 2, 3])
+        self.assertEqual(resample(values, index_values, HOUR, 'ffill')[1][:5].tolist(), [1, 2, 2, 2, 3])
+        self.assertTrue(np.isnan(resample(values, index_values, HOUR, 'first')[1][2:4]).all())
+
+        # missing values are skipped by mean, buckets of missing values only are NaN
+        values = [1, np.nan, np.nan, np.nan, np.nan, 3, np.nan, np.nan]
+        np.testing.assert_array_equal(resample(values, quarter_hours, HOUR // 2, 'mean')[1], [1, np.nan, 3, np.nan])
+
+        with self.assertRaises(ValueError):
+            resample(values, index_values, HOUR, 'median')
+
+    def test_time_series_resample(self):
+        user = create_dummy_user()
+        start = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+        time_series = TimeSeries(user=user, name='power', index=create_time_series_index(
+            start, datetime.timedelta(minutes=15)))
+        time_series.write(np.arange(96, dtype=float))
+
+        hourly = time_series.resample('h')
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(hourly.index[1], pd.Timestamp('2019-01-01 01:00', tz='UTC'))
+        self.assertEqual(hourly.iloc[0], 1.5)
+        self.assertEqual(time_series.resample('D').tolist(), [47.5])
+
+        # computed once per series, frequency and method
+        cache = get_array_cache()
+        hits = cache.hits
+        time_series.resample('h')
+        self.assertEqual(cache.hits, hits + 1)
+
+        time_series.write(np.ones(96))
+        self.assertEqual(time_series.resample('h').tolist(), [1.0] * 24)
+
+    def test_align(self):
+        user = create_dummy_user()
+        start = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+        setup = create_dummy_dispatch_setup(user)
+
+        power = TimeSeries(user=user, name='wholesale_price', index=create_time_series_index(
+            start, datetime.timedelta(minutes=15)))
+        power.write(np.arange(96, dtype=float))
+
+        fuel = TimeSeries(user=user, name='clean_fuel_price', index=create_time_series_index(
+            start + datetime.timedelta(hours=1), datetime.timedelta(hours=1)))
+        fuel.write(np.arange(24, dtype=float))
+
+        aligned = align(power, fuel)
+        self.assertEqual(list(aligned.columns), ['wholesale_price', 'clean_fuel_price'])
+        self.assertEqual(len(aligned), 92)  # the common range starts with the fuel prices
+        self.assertEqual(aligned['clean_fuel_price'].iloc[:5].tolist(), [0, 0, 0, 0, 1])
+        self.assertEqual(aligned['wholesale_price'].iloc[0], 4)
+
+        self.assertEqual(len(align(power, fuel, freq='h')), 23)
+
+        with self.assertRaises(ValueError):
+            align(power, setup.wholesale_price)
+
+        # setups with mixed resolutions are aligned to the index of the setup
+        setup.time_series_index = power.index
+        setup.wholesale_price = power
+        setup.clean_fuel_price = fuel
+        setup.save()
+
+        setup = ThermalPlantDispatch.objects.get(pk=setup.pk)
+        self.assertEqual(len(setup.time_series()), 96)
+
+        # positions refer to the index of the setup, the fuel prices start an hour later
+        time_series = setup.time_series(0, 8)
+        self.assertTrue(time_series['clean_fuel_price'].iloc[:4].isna().all())
+        self.assertEqual(time_series['clean_fuel_price'].iloc[4:].tolist(), [0] * 4)
+        self.assertEqual(time_series.index[0], pd.Timestamp('2019-01-01', tz='UTC'))
+
+        # only the values of the range are read
+        read = TimeSeries.read
+        with mock.patch.object(TimeSeries, 'read', autospec=True, side_effect=read) as patched:
+            time_series = setup.time_series(40, 48)
+
+        self.assertEqual(time_series['clean_fuel_price'].tolist(), [9] * 4 + [10] * 4)
+        self.assertEqual(time_series['wholesale_price'].tolist(), list(range(40, 48)))
+        self.assertTrue(all(call[0][2] - call[0][1] <= 9 for call in patched.call_args_list))
+
+        # the bulk loader aligns the same way
+        frames = ThermalPlantDispatch.objects.filter(pk=setup.pk).load_time_series(40, 48)
+        pd.testing.assert_frame_equal(frames[setup.pk], time_series)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ArrayFileTests(TransactionTestCase):
+    def tearDown(self):
+        TimeSeriesIndex._memo.clear()
+
+    def test_time_series_file_storage(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = np.random.rand(1000)
+
+        time_series = TimeSeries(user=user, name='price', index=integer_index)
+        time_series.write(values, storage=TimeSeries.STORAGE_FILE)
+
+        array_file = time_series.array_file
+        self.assertTrue(os.path.exists(array_file.full_path))
+        self.assertEqual(array_file.get_shape(), (1000,))
+        self.assertTrue(array_file.verify())
+
+        time_series = TimeSeries.objects.get(pk=time_series.pk)
+        part = time_series.read(100, 200)
+        self.assertIsInstance(part, np.memmap)
+        self.assertTrue(np.array_equal(part, values[100:200]))
+
+        # the file is removed with the time series
+        time_series.delete()
+        self.assertFalse(ArrayFile.objects.exists())
+        self.assertFalse(os.path.exists(array_file.full_path))
+
+    def test_rollback(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = np.random.rand(100)
+
+        time_series = TimeSeries(user=user, name='price', index=integer_index)
+        time_series.write(values, storage=TimeSeries.STORAGE_FILE)
+        array_file = ArrayFile.objects.get()
+
+        # the file of a deleted row is kept until the deletion is committed
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                TimeSeries.objects.filter(pk=time_series.pk).delete()
+                raise RuntimeError
+
+        self.assertTrue(np.array_equal(TimeSeries.objects.get(pk=time_series.pk).read(), values))
+
+        # a file written by a block that rolls back is removed, the previous file is kept
+        with self.assertRaises(RuntimeError):
+            with remove_files_on_error(), transaction.atomic():
+                time_series.write(values * 2, storage=TimeSeries.STORAGE_FILE)
+                written = time_series.array_file
+                raise RuntimeError
+
+        self.assertFalse(os.path.exists(written.full_path))
+        self.assertTrue(np.array_equal(TimeSeries.objects.get(pk=time_series.pk).read(), values))
+
+        # the same if write() itself fails
+        time_series = TimeSeries.objects.get(pk=time_series.pk)
+        with mock.patch.object(ArrayFile, 'delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                time_series.write(values * 3, storage=TimeSeries.STORAGE_FILE)
+
+        self.assertEqual(time_series.array_file_id, array_file.pk)
+        self.assertEqual(ArrayFile.objects.get(), array_file)
+        self.assertEqual(os.listdir(os.path.dirname(array_file.full_path)), [os.path.basename(array_file.full_path)])
+
+    def test_run_result_file(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user, length=96)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, start=24, number_of_batches=2,
+                                                     result_file=True)
+
+        stored = ThermalPlantOptimizationRun.objects.get(pk=run.pk).load_result_file(['production', 'power_price'])
+
+        self.assertEqual(list(stored.index), list(result.index))
+        self.assertTrue(np.allclose(stored['production'], result['production']))
+        self.assertTrue(np.allclose(stored['power_price'], result['power_price']))
+
+
+class ArrayCacheTests(TestCase):
+    def test_lru_eviction(self):
+        cache = ArrayCache(max_bytes=3 * 800)
+
+        for key in range(3):
+            cache.put((key,), np.zeros(100))
+
+        self.assertIsNotNone(cache.get((0,)))
+
+        # key 1 is the least recently used one
+        cache.put((3,), np.zeros(100))
+
+        self.assertIsNone(cache.get((1,)))
+        self.assertIsNotNone(cache.get((0,)))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 3 * 800)
+
+        # too large arrays are not cached
+        cache.put((4,), np.zeros(1000))
+        self.assertIsNone(cache.get((4,)))
+
+    def test_caller_array_stays_writable(self):
+        cache = ArrayCache(max_bytes=8000)
+
+        values = np.arange(10, dtype=float)
+        cached = cache.put((1,), values)
+
+        self.assertTrue(values.flags.writeable)
+        self.assertFalse(cached.flags.writeable)
+
+        values[0] = 99
+        self.assertEqual(cache.get((1,))[0], 0)
+
+        # read-only arrays are cached as they are
+        values.flags.writeable = False
+        self.assertIs(cache.put((2,), values), values)
+
+        # inline data assigned by the user stays writable when the series is read through the cache
+        get_array_cache().clear()
+        user = create_dummy_user()
+        time_series = create_time_series('price', 10, user, create_integer_time_series_index(0))
+        data = np.random.rand(10)
+        time_series.data = data
+
+        self.assertFalse(time_series.read().flags.writeable)
+        self.assertTrue(data.flags.writeable)
+
+    def test_time_series_read(self):
+        cache = get_array_cache()
+        cache.clear()
+
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+        values = np.random.rand(100)
+
+        time_series = TimeSeries(user=user, name='price', index=integer_index)
+        time_series.write(values)
+
+        time_series = TimeSeries.objects.get(pk=time_series.pk)
+        time_series.read()
+        self.assertEqual(cache.stats()['misses'], 1)
+
+        # a new instance of the same series is served from the cache
+        self.assertTrue(np.array_equal(TimeSeries.objects.get(pk=time_series.pk).read(10, 20), values[10:20]))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+        # saving drops the cached values
+        time_series.write(values * 2)
+        self.assertEqual(cache.stats()['entries'], 0)
+        self.assertTrue(np.array_equal(TimeSeries.objects.get(pk=time_series.pk).read(), values * 2))
+
+        with self.assertRaises(ValueError):
+            time_series.read()[0] = 1
+
+
+class TimeSeriesSummaryTests(TestCase):
+    def test_summary_and_pyramid(self):
+        user = create_dummy_user()
+        start = datetime.datetime(2019, 1, 7, 0, tzinfo=datetime.timezone.utc)  # Monday
+        time_series_index = create_time_series_index(start, datetime.timedelta(minutes=15))
+        values = np.random.rand(4 * 24 * 14)
+
+        time_series = TimeSeries(user=user, name='price', index=time_series_index)
+        time_series.write(values, storage=TimeSeries.STORAGE_CHUNKED)
+
+        time_series = TimeSeries.objects.for_listing().get(pk=time_series.pk)
+        self.assertEqual(time_series.summary['count'], len(values))
+        self.assertAlmostEqual(time_series.summary['mean'], values.mean())
+        self.assertAlmostEqual(time_series.summary['p50'], np.median(values))
+
+        # the overview does not load the values
+        with self.assertNumQueries(1):
+            daily = time_series.overview('day')
+
+        self.assertEqual(len(daily), 14)
+        self.assertEqual(daily.index[1], pd.Timestamp('2019-01-08', tz='UTC'))
+        self.assertAlmostEqual(daily['max'].iloc[1], values[96:192].max())
+        self.assertAlmostEqual(daily['mean'].iloc[1], values[96:192].mean())
+
+        self.assertEqual(len(time_series.overview('hour')), 24 * 14)
+        self.assertEqual(len(time_series.overview('week')), 2)
+
+        pd.testing.assert_frame_equal(time_series.overview('week'),
+                                      TimeSeries.objects.get(pk=time_series.pk).overview('week'))
+
+    def test_pyramid_levels(self):
+        index = pd.date_range('2019-01-07', periods=4 * 24 * 365, freq='15min', tz='UTC')
+        values = np.random.rand(len(index))
+
+        layout, pyramid = compute_pyramid(values, index)
+
+        # levels are encoded separately, a coarse level is a small part of the payload
+        week = find_level(layout, 'week')
+        self.assertLess(week['size'], len(pyramid) / 50)
+
+        data = pyramid[week['offset']:week['offset'] + week['size']]
+        weekly = level_to_dataframe(week, data)
+        pd.testing.assert_frame_equal(weekly, pyramid_level(layout, pyramid, 'week'))
+        self.assertAlmostEqual(weekly['max'].iloc[0], values[:4 * 24 * 7].max())
+
+    def test_inline_save(self):
+        user = create_dummy_user()
+        integer_index = create_integer_time_series_index(0)
+
+        time_series = create_time_series('price', 48, user, integer_index, data=list(range(48)))
+        time_series = TimeSeries.objects.get(pk=time_series.pk)
+
+        self.assertEqual(time_series.summary['max'], 47)
+        self.assertEqual(list(time_series.overview('day')['min']), [0, 24])
+
+
+@unittest.skipUnless(PARQUET_AVAILABLE, 'pyarrow is not installed')
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ParquetTests(TestCase):
+    def test_export_time_series(self):
+        user = create_dummy_user()
+        start = datetime.datetime(2019, 3, 31, 0, tzinfo=datetime.timezone.utc)
+        time_series_index = create_time_series_index(start, datetime.timedelta(minutes=15))
+        values = np.random.rand(200)
+
+        time_series = TimeSeries(user=user, name='price', index=time_series_index, unit='EUR/MWh')
+        time_series.write(values)
+
+        target = io.BytesIO()
+        export_time_series(time_series, target)
+        target.seek(0)
+
+        df = read_frame(target)
+        self.assertTrue(df.equals(time_series.to_dataframe()))
+        self.assertEqual(str(df.index.tz), 'UTC')
+
+        target.seek(0)
+        self.assertEqual(read_metadata(target)['unit'], 'EUR/MWh')
+
+    def test_export_run_result(self):
+        user = create_dummy_user()
+        dispatch_setup = create_dummy_dispatch_setup(user)
+
+        run, result = run_thermal_plant_optimization(user, dispatch_setup, number_of_batches=2)
+
+        target = io.BytesIO()
+        export_run_result(run, target, columns=['production', 'Revenues'])
+        target.seek(0)
+
+        df = read_frame(target)
+        self.assertEqual(list(df.columns), ['production', 'Revenues'])
+        self.assertTrue(np.allclose(df['Revenues'], result['Revenues']))
+
+    def test_upload(self):
+        user = create_dummy_user()
+        index = pd.date_range('2019-01-01', periods=48, freq='H', tz='UTC', name='index')
+        df = pd.DataFrame({'wholesale_price': np.random.rand(48), 'clean_fuel_price': np.random.rand(48)}, index=index)
+
+        content = io.BytesIO()
+        write_frame(df, content)
+
+        upload = CSVFileUpload(user=user, file=SimpleUploadedFile('prices.parquet', content.getvalue()))
+        upload.full_clean()
+        upload.save()
+
+        uploaded = CSVFileUpload.objects.get(pk=upload.pk).to_dataframe()
+        self.assertTrue(uploaded['index'].equals(df.reset_index()['index']))
+
+        time_series_index = TimeSeriesIndex().create_if_not_exists(uploaded['index'])
+        self.assertEqual(time_series_index.index_type, 2)
+
+        with self.assertRaises(ValidationError):
+            CSVFileUpload(user=user, file=SimpleUploadedFile('prices.parquet', b'no parquet')).full_clean()
+
+    def test_upload_unnamed_index(self):
+        user = create_dummy_user()
+        prices = {'wholesale_price': np.random.rand(48), 'clean_fuel_price': np.random.rand(48)}
+
+        # stored as __index_level_0__ and as RangeIndex in the pandas metadata only
+        for index in (pd.date_range('2019-01-01', periods=48, freq='H', tz='UTC'), pd.RangeIndex(48)):
+            df = pd.DataFrame(prices, index=index)
+
+            content = io.BytesIO()
+            write_frame(df, content)
+            content.seek(0)
+            self.assertEqual(read_columns(content), ['index', 'wholesale_price', 'clean_fuel_price'])
+
+            upload = CSVFileUpload(user=user, file=SimpleUploadedFile('prices.parquet', content.getvalue()))
+            upload.full_clean()
+            upload.save()
+
+            uploaded = CSVFileUpload.objects.get(pk=upload.pk).to_dataframe()
+            self.assertTrue(np.array_equal(uploaded['index'], index))
+
+        # without an index column
+        df = pd.DataFrame(prices)
+        content = io.BytesIO()
+        df.to_parquet(content, index=False)
+
+        with self.assertRaises(ValidationError):
+            CSVFileUpload(user=user, file=SimpleUploadedFile('prices.parquet', content.getvalue())).full_clean()
@@ -0,0 +1,143 @@
+"""
+Validation and compact encoding of time series indices.
+
+Index data is converted to int64 (integers as they are, datetimes as nanoseconds since the epoch in UTC) and checked
+vectorized: it has to be strictly increasing. The spacing is stored as run-length encoded segments
+(start, interval, count): a regular index is one segment, a gap or a change of the interval starts a new segment.
+Creating the index and locating a value only loop over the segments, never over the data points.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_integer_dtype
+
+INTEGER = 'integer'
+DATETIME = 'datetime'
+
+
+def to_int64(index):
+    """
+    Converts index data to int64 values.
+    :param index: List, array or pandas Index of integers or datetimes (naive datetimes are taken as UTC).
+    :return: Tuple (kind, values) with kind INTEGER or DATETIME.
+    """
+    if len(index) == 0:
+        raise ValueError('The index is empty.')
+
+    if isinstance(index, pd.Index) and index.dtype == object:
+        index = list(index)
+
+    try:
+        index = pd.Index(index)
+    except (TypeError, ValueError) as e:
+        raise ValueError('The index can not be interpreted: {error}'.format(error=e))
+
+    if index.dtype == object:
+        # e.g. datetimes with different time zones
+        try:
+            index = pd.DatetimeIndex(pd.to_datetime(list(index), utc=True))
+        except (TypeError, ValueError):
+            raise ValueError('The index must consist of integers or datetimes.')
+
+    if is_datetime64_any_dtype(index.dtype):
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+
+        return DATETIME, index.tz_convert('UTC').asi8
+
+    if is_integer_dtype(index.dtype):
+        return INTEGER, index.to_numpy(dtype=np.int64)
+
+    raise ValueError('The index must consist of integers or datetimes, not {dtype}.'.format(dtype=index.dtype))
+
+
+def spacing_histogram(values):
+    """
+    Number of occurrences of every spacing between consecutive values.
+    :param values: int64 array
+    :return: Dictionary spacing -> count
+    """
+    spacing, counts = np.unique(np.diff(values), return_counts=True)
+
+    return dict(zip(spacing.tolist(), counts.tolist()))
+
+
+def validate(values):
+    """
+    Checks that the values are strictly increasing (e.g. no duplicated hours of a DST change).
+    :param values: int64 array
+    :return:
+    """
+    steps = np.diff(values)
+
+    if (steps <= 0).any():
+        position = int(np.flatnonzero(steps <= 0)[0]) + 1
+        raise ValueError('The index must be strictly increasing, value {position} is not.'.format(position=position))
+
+
+def encode_segments(values):
+    """
+    Run-length encodes the values.
+    :param values: Strictly increasing int64 array
+    :return: List of [start, interval, count] segments.
+    """
+    values = np.asarray(values, dtype=np.int64)
+
+    if len(values) == 1:
+        return [[int(values[0]), 0, 1]]
+
+    steps = np.diff(values)
+
+    # positions where the spacing changes start a new segment
+    begins = np.concatenate([[0], np.flatnonzero(steps[1:] != steps[:-1]) + 1])
+    counts = np.diff(np.concatenate([begins, [len(steps)]]))
+    counts[-1] += 1  # the last value belongs to the last segment
+
+    return np.stack([values[begins], steps[begins], counts], axis=1).tolist()
+
+
+def decode_segments(segments, length=None):
+    """
+    Values of run-length encoded segments.
+    :param segments: List of [start, interval, count] segments.
+    :param length: Number of values to return, default all.
+    :return: int64 array
+    """
+    segments = np.asarray(segments, dtype=np.int64).reshape(-1, 3)
+    starts, intervals, counts = segments[:, 0], segments[:, 1], segments[:, 2]
+
+    # position of every value within its segment
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    values = np.repeat(starts, counts) + np.repeat(intervals, counts) * offsets
+
+    return values[:length]
+
+
+def locate(segments, value):
+    """
+    Position of a value in run-length encoded segments.
+    :param segments: List of [start, interval, count] segments.
+    :param value: int64 value
+    :return: Position or None if the value is not part of the index.
+    """
+    segments = np.asarray(segments, dtype=np.int64).reshape(-1, 3)
+    starts, intervals, counts = segments[:, 0], segments[:, 1], segments[:, 2]
+
+    segment = int(np.searchsorted(starts, value, side='right')) - 1
+
+    if segment < 0:
+        return None
+
+    offset = value - starts[segment]
+
+    if intervals[segment] == 0:
+        step = 0 if offset == 0 else None
+    elif offset % intervals[segment] == 0:
+        step = offset // intervals[segment]
+    else:
+        step = None
+
+    if step is None or step >= counts[segment]:
+        return None
+
+    return int(counts[:segment].sum() + step)
@@ -9,5 +9,9 @@ urlpatterns = [
     path('thermal_plant/', include([
         path('create/', views.create_themal_plant, name='create-thermal-plant')
     ])),
-    path('create_plant_csv/', views.create_thermal_plant_upload_csv, name='create-plant-upload-csv')
+    path('create_plant_csv/', views.create_thermal_plant_upload_csv, name='create-plant-upload-csv'),
+    path('thermal_plant_dispatch/<int:pk>/optimize/', views.optimize_thermal_plant_dispatch,
+         name='optimize-thermal-plant-dispatch'),
+    path('thermal_plant_optimization_run/<int:pk>/result/', views.thermal_plant_optimization_run_result,
+         name='thermal-plant-optimization-run-result'),
 ]
\ No newline at end of file
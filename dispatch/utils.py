@@ -1,3 +1,5 @@
+import hashlib
+import json
 from itertools import chain
 
 
@@ -12,4 +14,14 @@ def to_dict(model_instance):
     for field in meta.many_to_many:
         data[field.name] = [rel.id for rel in field.value_from_object(model_instance)]
 
-    return data
\ No newline at end of file
+    return data
+
+def fingerprint(parameters):
+    """
+    Canonical hash of numeric parameters, independent of the order of the keys, of int vs. float values and of -0.0.
+    :param parameters: Dictionary name -> number
+    :return: Hex digest (64 characters)
+    """
+    canonical = json.dumps({name: float(value) + 0.0 for name, value in parameters.items()}, sort_keys=True)
+
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
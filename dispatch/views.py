@@ -1,12 +1,17 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.views import generic
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+import numpy as np
 
 from .forms import CSVFileUploadForm, ThermalPlantForm
-from .models import CSVFileUpload, ThermalPlant, create_thermal_plant_dispatch_model
+from .models import CSVFileUpload, ThermalPlant, ThermalPlantDispatch, create_thermal_plant_dispatch_model
+from .models import ThermalPlantOptimizationRun
+from .service import submit_dispatch_job, DispatchServiceError
 from .utils import to_dict
 
 
@@ -87,12 +92,13 @@ def create_thermal_plant_upload_csv(request):
         df = csv.to_dataframe()
 
         # todo: serialize numpy array (int, float, datetime)
-        time_series_index_data = df['index'].values.tolist()
+        time_series_index_data = df['index']  # keeps the dtype (e.g. tz-aware datetimes of Parquet files)
         wholesale_price = df['wholesale_price'].values.tolist()
         clean_fuel_price = df['clean_fuel_price'].values.tolist()
 
         print(time_series_index_data, wholesale_price, clean_fuel_price)
 
+        # an existing plant of the user is reused only if parameters, name and shared flag of the form are equal
         create_thermal_plant_dispatch_model(request.user, 0, plant_definition, time_series_index_data, wholesale_price, clean_fuel_price, pk=None)
 
     return render(request, 'dispatch/plant_csv.html', {'plant_form': plant_form, 'csv_form': csv_form})
@@ -130,3 +136,89 @@ def create_themal_plant(request):
             return HttpResponseRedirect(reverse('dispatch:create-thermal-plant'))
 
     return render(request, 'dispatch/thermal_plant_create.html', {'form': form})
+
+
+def parse_options(data, casts):
+    """
+    Casts the given (non-empty) parameters of a request.
+    :param data: QueryDict, request.GET or request.POST
+    :param casts: Iterable of (key, cast), cast is called with the string value
+    :return: Dict of the cast values
+    :raises ValueError: If a value cannot be cast, the message names the parameter
+    """
+    options = {}
+    for key, cast in casts:
+        if data.get(key):
+            try:
+                options[key] = cast(data[key])
+            except (TypeError, ValueError):
+                raise ValueError('Invalid value {value!r} for {key}'.format(value=data[key], key=key))
+
+    return options
+
+
+def positive_int(value):
+    value = int(value)
+    if value < 1:
+        raise ValueError(value)
+
+    return value
+
+
+@login_required
+@require_POST
+def optimize_thermal_plant_dispatch(request, pk):
+    """
+    Forwards the optimization of a dispatch setup to the optimization service. The options (start, end,
+    number_of_batches, overlap, window_length) are read from the POST data, invalid values (also a range outside of
+    the setup or windows shorter than windows.MIN_WINDOW_LENGTH) give a 400 response.
+    """
+    dispatch_model = get_object_or_404(ThermalPlantDispatch, pk=pk, user=request.user)
+
+    def batches(value):
+        return value if value == 'auto' else positive_int(value)
+
+    try:
+        options = parse_options(request.POST, (('start', int), ('end', int), ('number_of_batches', batches),
+                                               ('overlap', float), ('window_length', positive_int)))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        response = submit_dispatch_job(dispatch_model, user=request.user, **options)
+    except ValueError as e:
+        # invalid range or window options of an in-process job
+        return JsonResponse({'error': str(e)}, status=400)
+    except DispatchServiceError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+
+    return JsonResponse(response)
+
+
+@login_required
+def thermal_plant_optimization_run_result(request, pk):
+    """
+    Result of a run for plots: the requested columns (comma separated) of a range (positions start and end), downsampled
+    to at most points rows. Only the chunks and columns of the range are read. Invalid parameters give a 400 response.
+    """
+    run = get_object_or_404(ThermalPlantOptimizationRun, pk=pk, user=request.user)
+
+    try:
+        options = parse_options(request.GET, (('start', int), ('end', int), ('points', positive_int)))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    reader = run.result_reader()
+    if request.GET.get('columns'):
+        reader = reader[request.GET['columns'].split(',')]
+
+    try:
+        reader = reader[options.get('start'):options.get('end')].downsample(max_points=options.get('points', 1000),
+                                                                            how=request.GET.get('how', 'mean'))
+        result = reader.to_dataframe()
+    except (KeyError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({'index': [str(label) for label in result.index],
+                         'columns': {name: [None if np.isnan(value) else value for value in result[name].astype(float)]
+                                     for name in result.columns}})